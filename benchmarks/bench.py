@@ -0,0 +1,215 @@
+"""
+Interpreter benchmarks, run from the root of the repository:
+
+    python -m benchmarks.bench                         # run every workload on every engine
+    python -m benchmarks.bench --save baseline.json    # ... and save the results
+    python -m benchmarks.bench --compare baseline.json # fail if anything got > 5% slower
+    python -m benchmarks.bench --compare               # ... than benchmarks/baseline.json
+
+Each workload is a small contract exercising one kind of instruction. For every
+engine, it reports the instructions executed per second (best of --repeat timings)
+and the peak traced memory while running it once: the highest amount of memory
+allocated at once according to tracemalloc, in KiB, not a number of allocations.
+
+benchmarks/baseline.json holds the reference results, measured on the machine the
+harness was developed on. Timings do not carry over between machines: to look for
+regressions on another one, save a baseline there from the base revision first.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Callable, Sequence, Union
+
+from src.opcodesInstructions import *
+from src.run import run, ENGINES
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def assemble_with_labels(items: Sequence[Union[Instruction, int, str]]) -> bytes:
+    """
+    assemble() with labels: "name:" marks a position (and emits a JUMPDEST there), and
+    "@name" pushes its offset (as a PUSH2)
+    """
+    labels, offset = {}, 0
+    for item in items:
+        if isinstance(item, str) and item.endswith(":"):
+            labels[item[:-1]] = offset
+            offset += 1
+        elif isinstance(item, str):
+            offset += 3
+        elif isinstance(item, Instruction):
+            offset += 1
+        else:
+            offset += len(int_to_bytes(item))
+
+    resolved = []
+    for item in items:
+        if isinstance(item, str) and item.endswith(":"):
+            resolved.append(JUMPDEST)
+        elif isinstance(item, str):
+            resolved += [PUSH2, *labels[item[1:]].to_bytes(2, "big")]
+        else:
+            resolved.append(item)
+
+    return assemble(resolved, print_bin=False)
+
+
+def loop(iterations: int, body: list, prologue=(), epilogue=(STOP,)) -> bytes:
+    """
+    Runs body iterations times, with the loop counter on top of the stack. body must leave
+    the stack as it found it.
+    """
+    return assemble_with_labels([
+        *prologue,
+        PUSH2, *iterations.to_bytes(2, "big"),
+        "loop:",
+        *body,
+        PUSH1, 1, SWAP1, SUB, DUP1, "@loop", JUMPI,
+        *epilogue,
+    ])
+
+
+# name -> function returning the code to run
+WORKLOADS: dict[str, Callable[[], bytes]] = {
+    # an accumulator below the counter: acc = (acc * 3 + 7) ** 2
+    "arithmetic": lambda: loop(2000, [SWAP1, PUSH1, 3, MUL, PUSH1, 7, ADD, DUP1, MUL, SWAP1], prologue=[PUSH1, 1]),
+    # acc = acc + (acc ** 3 % 13), then acc = acc + (acc * 5 % 7)
+    "arithmetic-family": lambda: loop(1000, [
+        SWAP1, DUP1, PUSH1, 3, SWAP1, EXP, PUSH1, 13, SWAP1, MOD, ADD,
+        PUSH1, 7, PUSH1, 5, DUP3, MULMOD, ADD, SWAP1,
+    ], prologue=[PUSH1, 1]),
+    # keccak(c . 1), the slot of a mapping entry, with a different key every iteration
+    "sha3": lambda: loop(1000, [DUP1, PUSH1, 0, MSTORE, PUSH1, 64, PUSH1, 0, SHA3, PUSH1, 64, MSTORE], prologue=[
+        PUSH1, 1, PUSH1, 32, MSTORE,
+    ]),
+    # memory[c] = c, then memory[c] = memory[c]
+    "memory": lambda: loop(2000, [DUP1, DUP1, MSTORE, DUP1, MLOAD, DUP2, MSTORE, PUSH1, 0, MLOAD, PUSH1, 0, MSTORE]),
+    "stack": lambda: loop(2000, [
+        PUSH1, 1, PUSH1, 2, PUSH1, 3, DUP3, DUP3, SWAP2, SWAP1, ADD, ADD, ADD, ADD, PUSH1, 0, MSTORE,
+    ]),
+    "jumps": lambda: loop(2000, ["@a", JUMP, "b:", "@c", JUMP, "a:", "@b", JUMP, "c:"]),
+    # memory[32 * c] = c, then return the whole 64 KiB
+    "return": lambda: loop(
+        2000, [DUP1, DUP1, PUSH1, 32, MUL, MSTORE],
+        epilogue=[PUSH2, *(32 * 2001).to_bytes(2, "big"), PUSH1, 0, RETURN],
+    ),
+}
+
+
+@dataclass
+class Result:
+    instructions: int
+    seconds: float
+    instructions_per_second: float
+    # peak tracemalloc traced memory, see the module docstring
+    peak_traced_kib: float
+
+
+def count_instructions(code: bytes) -> int:
+    count = 0
+
+    def prehook(context, instruction):
+        nonlocal count
+        count += 1
+
+    run(code, prehook=prehook)
+    return count
+
+
+def measure(code: bytes, engine: str, instructions: int, repeat=5) -> Result:
+    run(code, engine=engine)  # warm up the analysis and compilation caches
+
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(code, engine=engine)
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run(code, engine=engine)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Result(
+        instructions=instructions,
+        seconds=seconds,
+        instructions_per_second=instructions / seconds,
+        peak_traced_kib=peak / 1024,
+    )
+
+
+def run_benchmarks(workloads=None, engines=ENGINES, repeat=5) -> dict[str, Result]:
+    """results by "workload/engine" """
+    results = {}
+    for name in workloads or WORKLOADS:
+        code = WORKLOADS[name]()
+        instructions = count_instructions(code)
+        for engine in engines:
+            results[f"{name}/{engine}"] = measure(code, engine, instructions, repeat=repeat)
+    return results
+
+
+def compare(results: dict[str, Result], baseline: dict[str, dict], threshold=0.05) -> list[str]:
+    """
+    Returns the benchmarks whose instructions per second dropped by more than threshold
+    compared to baseline (as saved by --save)
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]["instructions_per_second"]
+        if result.instructions_per_second < before * (1 - threshold):
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", action="append", choices=sorted(WORKLOADS), help="only run these workloads")
+    parser.add_argument("--engine", action="append", choices=ENGINES, help="only run these engines")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="save the results as a baseline to this file")
+    parser.add_argument("--compare", nargs="?", const=BASELINE,
+                        help="compare with the baseline saved in this file (default: benchmarks/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=0.05, help="regression threshold (default: 5%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.workload, args.engine or ENGINES, repeat=args.repeat)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    print(f"{'benchmark':<28} {'instructions':>12} {'best ms':>10} {'instr/s':>12} {'peak traced KiB':>16} {'vs baseline':>12}")
+    for key, result in results.items():
+        change = ""
+        if key in baseline:
+            change = f"{result.instructions_per_second / baseline[key]['instructions_per_second'] - 1:+.1%}"
+        print(
+            f"{key:<28} {result.instructions:>12} {result.seconds * 1000:>10.2f} "
+            f"{result.instructions_per_second:>12,.0f} {result.peak_traced_kib:>16.1f} {change:>12}"
+        )
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({key: asdict(result) for key, result in results.items()}, file, indent=2)
+
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nregressions over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
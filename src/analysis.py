@@ -0,0 +1,274 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from .executionContext import JumpDestinations, valid_jump_destinations
+from .gas import STATIC_GAS
+from .opcodesInstructions import INSTRUCTION_BY_OPCODE, Instruction, PUSH1, PUSH32, STOP, JUMP, JUMPI, RETURN, SSTORE
+
+# how many distinct code blobs we keep decoded programs around for
+PROGRAM_CACHE_SIZE = 1024
+
+# opcodes after which execution does not simply continue with the next instruction
+BLOCK_TERMINATORS = frozenset([STOP.opcode, JUMP.opcode, JUMPI.opcode, RETURN.opcode])
+
+# opcodes that look at the gas left, after which a block ends too: the static gas of the
+# instructions following them must not have been charged yet when they run
+GAS_CHECKPOINTS = frozenset([SSTORE.opcode])
+
+# (items read off the stack, items left in their place) by opcode. DUPn reads n items and
+# leaves n + 1, SWAPn reads and leaves n + 1, so that the height an instruction needs
+# is always its first element.
+STACK_EFFECTS = {
+    0x00: (0, 0),       # STOP
+    **{opcode: (2, 1) for opcode in range(0x01, 0x08)},  # ADD ... SMOD
+    0x08: (3, 1),       # ADDMOD
+    0x09: (3, 1),       # MULMOD
+    0x0A: (2, 1),       # EXP
+    0x0B: (2, 1),       # SIGNEXTEND
+    **{opcode: (2, 1) for opcode in range(0x10, 0x15)},  # LT ... EQ
+    0x15: (1, 1),       # ISZERO
+    0x16: (2, 1),       # AND
+    0x17: (2, 1),       # OR
+    0x18: (2, 1),       # XOR
+    0x19: (1, 1),       # NOT
+    **{opcode: (2, 1) for opcode in range(0x1A, 0x1E)},  # BYTE ... SAR
+    0x20: (2, 1),       # SHA3
+    0x30: (0, 1),       # ADDRESS
+    0x31: (1, 1),       # BALANCE
+    0x32: (0, 1),       # ORIGIN
+    0x33: (0, 1),       # CALLER
+    0x34: (0, 1),       # CALLVALUE
+    0x35: (1, 1),       # CALLDATALOAD
+    0x36: (0, 1),       # CALLDATASIZE
+    0x37: (3, 0),       # CALLDATACOPY
+    0x38: (0, 1),       # CODESIZE
+    0x39: (3, 0),       # CODECOPY
+    0x3A: (0, 1),       # GASPRICE
+    0x3B: (1, 1),       # EXTCODESIZE
+    0x3C: (4, 0),       # EXTCODECOPY
+    0x3D: (0, 1),       # RETURNDATASIZE
+    0x3E: (3, 0),       # RETURNDATACOPY
+    0x3F: (1, 1),       # EXTCODEHASH
+    0x40: (1, 1),       # BLOCKHASH
+    **{opcode: (0, 1) for opcode in range(0x41, 0x49)},  # COINBASE ... BASEFEE
+    0x50: (1, 0),       # POP
+    0x51: (1, 1),       # MLOAD
+    0x52: (2, 0),       # MSTORE
+    0x53: (2, 0),       # MSTORE8
+    0x54: (1, 1),       # SLOAD
+    0x55: (2, 0),       # SSTORE
+    0x56: (1, 0),       # JUMP
+    0x57: (2, 0),       # JUMPI
+    0x58: (0, 1),       # PC
+    0x59: (0, 1),       # MSIZE
+    0x5A: (0, 1),       # GAS
+    0x5B: (0, 0),       # JUMPDEST
+    0x5F: (0, 1),       # PUSH0
+    **{opcode: (0, 1) for opcode in range(0x60, 0x80)},  # PUSH1 ... PUSH32
+    **{0x80 + i: (i + 1, i + 2) for i in range(16)},  # DUP1 ... DUP16
+    **{0x90 + i: (i + 2, i + 2) for i in range(16)},  # SWAP1 ... SWAP16
+    **{0xA0 + topics: (topics + 2, 0) for topics in range(5)},  # LOG0 ... LOG4
+    0xF0: (3, 1),       # CREATE
+    0xF1: (7, 1),       # CALL
+    0xF2: (7, 1),       # CALLCODE
+    0xF3: (2, 0),       # RETURN
+    0xF4: (6, 1),       # DELEGATECALL
+    0xF5: (4, 1),       # CREATE2
+    0xFA: (6, 1),       # STATICCALL
+    0xFD: (2, 0),       # REVERT
+    0xFE: (0, 0),       # INVALID
+    0xFF: (1, 0),       # SELFDESTRUCT
+}
+
+
+@dataclass(frozen=True)
+class BasicBlock:
+    """
+    A straight-line run of instructions: control only enters at the first one and only
+    leaves after the last one (a JUMPDEST always starts a new block, and JUMP, JUMPI,
+    STOP, RETURN or an unknown opcode always ends one, as do GAS_CHECKPOINTS).
+    """
+    # the pc of every instruction in the block, in execution order
+    pcs: tuple[int, ...]
+
+    # where execution continues when falling off the end of the block
+    end: int
+
+    # the static gas of all the instructions in the block, charged at once when entering it
+    static_gas: int
+
+    # how many items must be on the stack when entering the block for none of its
+    # instructions to underflow
+    stack_required: int
+
+    # how much higher than on entry the stack gets while running the block, none of its
+    # instructions can overflow if entry height + stack_growth <= max depth
+    stack_growth: int
+
+    @property
+    def start(self) -> int:
+        return self.pcs[0]
+
+    def __len__(self) -> int:
+        return len(self.pcs)
+
+
+@dataclass(frozen=True)
+class Program:
+    """
+    A code blob decoded once ahead of execution.
+
+    Every table is indexed by pc, so the interpreter never has to re-slice the code
+    or look up INSTRUCTION_BY_OPCODE while running. Every offset is decoded (not only
+    the ones reachable by a linear sweep) so that execution from any pc matches
+    what decode_opcode would have produced at that offset.
+    """
+    code: bytes
+
+    # the instruction at each pc, None for unknown opcodes
+    instructions: Sequence[Optional[Instruction]]
+
+    # the PUSH argument at each pc, None for instructions without an immediate
+    immediates: Sequence[Optional[int]]
+
+    # where the pc goes after executing the instruction at each pc (without jumping)
+    next_pcs: Sequence[int]
+
+    jumpdests: JumpDestinations
+
+    # the basic blocks found by a linear sweep from pc 0, in code order
+    blocks: tuple[BasicBlock, ...]
+
+    # the static gas of the block starting at each pc, 0 for pcs that do not start a block
+    block_gas: Sequence[int]
+
+    # the block starting at each pc, None for pcs that do not start a block
+    block_at: Sequence[Optional[BasicBlock]]
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+
+def decode_program(code: bytes) -> Program:
+    """
+    Decodes every offset of code into its instruction, PUSH immediate and next pc.
+    """
+    instructions = []
+    immediates = []
+    next_pcs = []
+    for pc, opcode in enumerate(code):
+        instructions.append(INSTRUCTION_BY_OPCODE.get(opcode))
+
+        if PUSH1.opcode <= opcode <= PUSH32.opcode:
+            num_bytes = opcode - PUSH1.opcode + 1
+
+            # same semantics as ExecutionContext.read_code: a truncated PUSH argument
+            # is whatever bytes are left in the code buffer
+            immediates.append(int.from_bytes(code[pc + 1: pc + 1 + num_bytes], byteorder="big"))
+            next_pcs.append(pc + 1 + num_bytes)
+        else:
+            immediates.append(None)
+            next_pcs.append(pc + 1)
+
+    jumpdests = valid_jump_destinations(code)
+    blocks = basic_blocks(instructions, next_pcs, jumpdests)
+
+    block_gas = [0] * len(code)
+    block_at = [None] * len(code)
+    for block in blocks:
+        block_gas[block.start] = block.static_gas
+        block_at[block.start] = block
+
+    return Program(
+        code=code,
+        instructions=tuple(instructions),
+        immediates=tuple(immediates),
+        next_pcs=tuple(next_pcs),
+        jumpdests=jumpdests,
+        blocks=blocks,
+        block_gas=tuple(block_gas),
+        block_at=tuple(block_at),
+    )
+
+
+def basic_blocks(instructions: Sequence[Optional[Instruction]], next_pcs: Sequence[int], jumpdests: JumpDestinations) -> tuple[BasicBlock, ...]:
+    """
+    Splits the instruction boundaries reached by a linear sweep from pc 0 into basic blocks.
+    """
+    blocks = []
+    pcs = []
+    pc = 0
+    while pc < len(instructions):
+        if pc in jumpdests and pcs:
+            blocks.append(_basic_block(instructions, pcs, end=pc))
+            pcs = []
+
+        pcs.append(pc)
+        instruction = instructions[pc]
+        pc = next_pcs[pc]
+
+        if instruction is None or instruction.opcode in BLOCK_TERMINATORS or instruction.opcode in GAS_CHECKPOINTS:
+            blocks.append(_basic_block(instructions, pcs, end=pc))
+            pcs = []
+
+    if pcs:
+        blocks.append(_basic_block(instructions, pcs, end=pc))
+
+    return tuple(blocks)
+
+
+def _basic_block(instructions: Sequence[Optional[Instruction]], pcs: list[int], end: int) -> BasicBlock:
+    static_gas = 0
+    height = stack_required = stack_growth = 0
+    for pc in pcs:
+        instruction = instructions[pc]
+        if instruction is None:
+            continue
+
+        static_gas += STATIC_GAS[instruction.opcode]
+
+        items_read, items_left = STACK_EFFECTS[instruction.opcode]
+        stack_required = max(stack_required, items_read - height)
+        height += items_left - items_read
+        stack_growth = max(stack_growth, height)
+
+    return BasicBlock(
+        pcs=tuple(pcs),
+        end=end,
+        static_gas=static_gas,
+        stack_required=stack_required,
+        stack_growth=stack_growth,
+    )
+
+
+# an analysisCache.AnalysisCache consulted before analyzing code, see set_disk_cache
+_disk_cache = None
+
+
+def set_disk_cache(cache) -> None:
+    """
+    Makes analyze() look for programs in cache (an analysisCache.AnalysisCache) and store
+    the ones it analyzes there, None stops using it.
+    """
+    global _disk_cache
+    _disk_cache = cache
+    _cached_program.cache_clear()
+
+
+@lru_cache(maxsize=PROGRAM_CACHE_SIZE)
+def _cached_program(code: bytes) -> Program:
+    if _disk_cache is not None:
+        return _disk_cache.get(code)
+    return decode_program(code)
+
+
+def analyze(code: bytes) -> Program:
+    """
+    Returns the decoded program for code, re-using the result of previous calls.
+
+    Programs are kept in an LRU cache keyed by the code bytes (so by their hash, which
+    bytes objects compute once and then remember), bounded to PROGRAM_CACHE_SIZE entries,
+    in front of the disk cache when there is one.
+    """
+    return _cached_program(bytes(code))
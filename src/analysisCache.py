@@ -0,0 +1,233 @@
+"""
+A persistent, on-disk cache of analyzed programs, shared by every process using the
+same directory, so that a freshly started worker does not have to analyze again the
+code it already saw in a previous life:
+
+    analysis.set_disk_cache(AnalysisCache("/var/cache/pyevm"))
+
+Each program is stored in its own file named after code_hash(code), as the tables
+Program is made of, in a compact binary format read through mmap:
+
+    header      MAGIC, FORMAT_VERSION, instruction set fingerprint, code size,
+                number of PUSH instructions, of blocks, of pcs in all the blocks,
+                checksum of everything after the header
+    next_pcs    uint32 per byte of code
+    push_pcs    uint32 per PUSH instruction, whose immediates are re-read from the code
+    blocks      (number of pcs, end, static gas, stack required, stack growth) per block
+    block pcs   uint32 per pc of every block, in block order
+    jumpdests   the JumpDestinations bitmap
+
+All integers are little-endian. Files written for another FORMAT_VERSION or another
+instruction set (registered opcodes, static gas, stack effects) are treated as missing
+and overwritten, and so are corrupted files (whose checksum does not match) and files
+that cannot be read (permissions, a directory in the way, ...). Failing to write a file
+only costs the next process an analysis. Hashing the code and the file are the only
+work a hit needs besides reading it, so both use blake2b rather than keccak256, which
+the pure Python backend computes slower than analyzing the code again.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from typing import Optional
+
+from .analysis import BLOCK_TERMINATORS, GAS_CHECKPOINTS, STACK_EFFECTS, BasicBlock, Program, decode_program
+from .executionContext import JumpDestinations
+from .gas import STATIC_GAS
+from .opcodesInstructions import INSTRUCTION_BY_OPCODE, PUSH1, PUSH32
+
+MAGIC = b"PYEVMPRG"
+FORMAT_VERSION = 2
+FILE_SUFFIX = ".program"
+
+HEADER = struct.Struct("<8sI16sIIII16s")
+BLOCK = struct.Struct("<IIQII")
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def instruction_set_fingerprint() -> bytes:
+    """
+    A digest of everything the analysis depends on besides the code itself
+    """
+    description = repr((
+        sorted((opcode, instruction.name) for opcode, instruction in INSTRUCTION_BY_OPCODE.items()),
+        sorted(STATIC_GAS.items()),
+        sorted(STACK_EFFECTS.items()),
+        sorted(BLOCK_TERMINATORS),
+        sorted(GAS_CHECKPOINTS),
+    ))
+    return hashlib.blake2b(description.encode(), digest_size=16).digest()
+
+
+def code_hash(code: bytes) -> bytes:
+    """
+    The key of code in the cache, cheap enough to compute on every lookup
+    """
+    return hashlib.blake2b(code, digest_size=16).digest()
+
+
+def _pack_uint32s(values) -> bytes:
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def _unpack_uint32s(data: memoryview) -> tuple:
+    if _LITTLE_ENDIAN:
+        with data.cast("I") as values:
+            return tuple(values)
+    return struct.unpack(f"<{len(data) // 4}I", data)
+
+
+def _checksum(payload) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+def serialize(program: Program, fingerprint: bytes) -> bytes:
+    code = program.code
+    push_pcs = [pc for pc, opcode in enumerate(code) if PUSH1.opcode <= opcode <= PUSH32.opcode]
+    block_pcs = [pc for block in program.blocks for pc in block.pcs]
+
+    payload = b"".join([
+        _pack_uint32s(program.next_pcs),
+        _pack_uint32s(push_pcs),
+        *(
+            BLOCK.pack(len(block), block.end, block.static_gas, block.stack_required, block.stack_growth)
+            for block in program.blocks
+        ),
+        _pack_uint32s(block_pcs),
+        bytes(program.jumpdests.bitmap),
+    ])
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, fingerprint, len(code), len(push_pcs), len(program.blocks), len(block_pcs),
+        _checksum(payload),
+    )
+    return header + payload
+
+
+def deserialize(code: bytes, data: memoryview, fingerprint: bytes) -> Optional[Program]:
+    """
+    Returns the program serialized in data for code, None if data is not a valid
+    serialization of it for this FORMAT_VERSION and instruction set (or is corrupted).
+    """
+    if len(data) < HEADER.size:
+        return None
+
+    magic, version, file_fingerprint, code_size, num_pushes, num_blocks, num_block_pcs, checksum = \
+        HEADER.unpack_from(data)
+    bitmap_size = (code_size + 7) // 8
+    expected_size = HEADER.size + 4 * (code_size + num_pushes + num_block_pcs) + BLOCK.size * num_blocks + bitmap_size
+    if (magic, version, file_fingerprint, code_size) != (MAGIC, FORMAT_VERSION, fingerprint, len(code)) \
+            or len(data) != expected_size or checksum != _checksum(data[HEADER.size:]):
+        return None
+
+    offset = HEADER.size
+    next_pcs = _unpack_uint32s(data[offset: offset + 4 * code_size])
+    offset += 4 * code_size
+    push_pcs = _unpack_uint32s(data[offset: offset + 4 * num_pushes])
+    offset += 4 * num_pushes
+    block_records = list(BLOCK.iter_unpack(data[offset: offset + BLOCK.size * num_blocks]))
+    offset += BLOCK.size * num_blocks
+    block_pcs = _unpack_uint32s(data[offset: offset + 4 * num_block_pcs])
+    offset += 4 * num_block_pcs
+    jumpdests = JumpDestinations(bytes(data[offset:]), code_size)
+
+    immediates = [None] * code_size
+    for pc in push_pcs:
+        immediates[pc] = int.from_bytes(code[pc + 1: next_pcs[pc]], "big")
+
+    blocks = []
+    block_gas = [0] * code_size
+    block_at = [None] * code_size
+    start = 0
+    for num_pcs, end, static_gas, stack_required, stack_growth in block_records:
+        first_pc = block_pcs[start]
+        block = block_at[first_pc] = BasicBlock(
+            pcs=block_pcs[start: start + num_pcs],
+            end=end,
+            static_gas=static_gas,
+            stack_required=stack_required,
+            stack_growth=stack_growth,
+        )
+        blocks.append(block)
+        block_gas[first_pc] = static_gas
+        start += num_pcs
+
+    return Program(
+        code=code,
+        instructions=tuple(map(INSTRUCTION_BY_OPCODE.get, code)),
+        immediates=tuple(immediates),
+        next_pcs=next_pcs,
+        jumpdests=jumpdests,
+        blocks=tuple(blocks),
+        block_gas=tuple(block_gas),
+        block_at=tuple(block_at),
+    )
+
+
+class AnalysisCache:
+    """
+    The programs cached in directory (created if needed). Files are written atomically,
+    so several processes can share a directory.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.fingerprint = instruction_set_fingerprint()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, digest: bytes) -> str:
+        return os.path.join(self.directory, digest.hex() + FILE_SUFFIX)
+
+    def load(self, code: bytes, digest: bytes = None) -> Optional[Program]:
+        """
+        Returns the cached program for code, None when it is not cached (or was cached
+        for another format version or instruction set, or its file cannot be read)
+        """
+        path = self.path(digest or code_hash(code))
+        try:
+            with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                with memoryview(data) as view:
+                    return deserialize(code, view, self.fingerprint)
+        except (OSError, ValueError):
+            # ValueError: mmap of an empty file
+            return None
+
+    def store(self, program: Program, digest: bytes = None) -> None:
+        path = self.path(digest or code_hash(program.code))
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(serialize(program, self.fingerprint))
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+    def get(self, code: bytes, digest: bytes = None) -> Program:
+        """
+        Returns the program for code, from the cache if it is there, otherwise analyzing
+        code and caching the result
+        """
+        digest = digest or code_hash(code)
+        program = self.load(code, digest)
+        if program is not None:
+            self.hits += 1
+            return program
+
+        self.misses += 1
+        program = decode_program(code)
+        try:
+            self.store(program, digest)
+        except OSError:
+            # e.g. a read-only directory or a full disk, the cache is only an optimization
+            pass
+        return program
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(FILE_SUFFIX):
+                os.unlink(os.path.join(self.directory, name))
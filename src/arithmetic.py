@@ -0,0 +1,102 @@
+"""
+256-bit arithmetic kernels for the arithmetic instructions (0x01 - 0x0B).
+
+Values are Python ints in [0, 2**256). Results are wrapped with a bitmask instead of
+`% 2 ** 256` (which computes the power and a division on every call), and the common
+cases get a fast path: both operands non-negative for the signed operations, small
+bases and exponents for EXP.
+"""
+from .generics import MAX_UINT256
+
+# 2 ** 255, the sign bit of a two's complement 256-bit value
+SIGN_BIT = 1 << 255
+WORD_MODULUS = 1 << 256
+
+
+def uint_to_int(x: int) -> int:
+    """the signed value of the 256-bit two's complement x"""
+    return x - WORD_MODULUS if x & SIGN_BIT else x
+
+
+def int_to_uint(x: int) -> int:
+    """the 256-bit two's complement representation of x"""
+    return x & MAX_UINT256
+
+
+def add(a: int, b: int) -> int:
+    return (a + b) & MAX_UINT256
+
+
+def mul(a: int, b: int) -> int:
+    return (a * b) & MAX_UINT256
+
+
+def sub(a: int, b: int) -> int:
+    return (a - b) & MAX_UINT256
+
+
+def div(a: int, b: int) -> int:
+    return a // b if b else 0
+
+
+def sdiv(a: int, b: int) -> int:
+    if not b:
+        return 0
+    if not (a | b) & SIGN_BIT:
+        return a // b
+
+    a, b = uint_to_int(a), uint_to_int(b)
+    # the quotient is rounded towards zero, not floored
+    quotient = abs(a) // abs(b)
+    return int_to_uint(-quotient if (a < 0) != (b < 0) else quotient)
+
+
+def mod(a: int, b: int) -> int:
+    return a % b if b else 0
+
+
+def smod(a: int, b: int) -> int:
+    if not b:
+        return 0
+    if not (a | b) & SIGN_BIT:
+        return a % b
+
+    a, b = uint_to_int(a), uint_to_int(b)
+    # the result has the sign of the dividend
+    remainder = abs(a) % abs(b)
+    return int_to_uint(-remainder if a < 0 else remainder)
+
+
+def addmod(a: int, b: int, n: int) -> int:
+    # not wrapped at 2 ** 256 before the modulo
+    return (a + b) % n if n else 0
+
+
+def mulmod(a: int, b: int, n: int) -> int:
+    return (a * b) % n if n else 0
+
+
+def exp(a: int, b: int) -> int:
+    if b < 2:
+        return a if b else 1
+    if a < 2:
+        return a
+    if a == 2:
+        return 1 << b if b < 256 else 0
+    return pow(a, b, WORD_MODULUS)
+
+
+def exp_byte_size(b: int) -> int:
+    """the size of the exponent in bytes, EXP costs G_EXP_BYTE for each"""
+    return (b.bit_length() + 7) // 8
+
+
+def signextend(b: int, x: int) -> int:
+    """extends the sign of the (b + 1)-th lowest byte of x to the whole word"""
+    if b >= 31:
+        return x
+
+    sign_bit = 1 << (8 * b + 7)
+    if x & sign_bit:
+        return x | (MAX_UINT256 - (sign_bit - 1))
+    return x & (sign_bit - 1)
@@ -0,0 +1,121 @@
+"""
+Runs the same code over many calldata inputs.
+
+The code is analyzed (and compiled, for engine="compiled") once, and every input is
+executed in a context reused from a ContextPool. Inputs can also be fanned out over a
+pool of worker processes, each of which analyzes the code once when it starts.
+"""
+import multiprocessing
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from .analysis import analyze
+from .executionContext import ContextPool
+from .generics import *
+from .run import run, ENGINES
+from . import compiler
+
+# what an execution can fail with, reported per input instead of aborting the batch
+EXECUTION_ERRORS = (
+    InvalidStackItem, StackOverFlow, StackUnderFlow, InvalidMemoryAccess, InvalidMemoryValue,
+    OutOfGas, EVMException, ExecutionLimitReached,
+)
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    # position of the calldata in the inputs
+    index: int
+    return_data: bytes
+    # None when the execution succeeded
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _BatchRunner:
+    def __init__(self, code: bytes, engine: str, max_steps: int, gas_limit: int) -> None:
+        self.code = bytes(code)
+        self.engine = engine
+        self.max_steps = max_steps
+        self.gas_limit = gas_limit
+        self.pool = ContextPool(max_size=1)
+
+        # warm up the analysis (and compilation) caches, every run after this one hits them
+        analyze(self.code)
+        if engine == "compiled":
+            compiler.compiled(self.code)
+
+    def __call__(self, index: int, calldata: bytes) -> BatchResult:
+        try:
+            return_data = run(
+                self.code,
+                engine=self.engine,
+                max_steps=self.max_steps,
+                gas_limit=self.gas_limit,
+                pool=self.pool,
+                calldata=bytes(calldata),
+            )
+        except EXECUTION_ERRORS as error:
+            return BatchResult(index=index, return_data=bytes(), error=error)
+
+        return BatchResult(index=index, return_data=return_data)
+
+
+# the runner of a worker process, set up once by _init_worker
+_worker_runner = None
+
+
+def _init_worker(code: bytes, engine: str, max_steps: int, gas_limit: int) -> None:
+    global _worker_runner
+    _worker_runner = _BatchRunner(code, engine, max_steps, gas_limit)
+
+
+def _run_in_worker(job: tuple) -> BatchResult:
+    result = _worker_runner(*job)
+    if isinstance(result.error, (EVMException, ExecutionLimitReached)):
+        # the context stays in the worker, only the error itself is sent back
+        result.error.context = None
+    return result
+
+
+def run_batch(
+    code: bytes,
+    inputs: Iterable[bytes],
+    engine="fast",
+    max_steps=0,
+    gas_limit=0,
+    processes: Optional[int] = 1,
+    chunksize=64,
+) -> Iterator[BatchResult]:
+    """
+    Executes code once per calldata in inputs, yielding a BatchResult per input, in the
+    order of inputs, as soon as it is available. inputs can be any iterable, including
+    one that is too large to fit in memory.
+
+    Failed executions do not stop the batch, their error is reported in the result.
+
+    With processes > 1 (or None, for one process per CPU) the inputs are sent to worker
+    processes in chunks of chunksize. Errors coming back from a worker do not carry the
+    context they were raised in (error.context is None).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+
+    if processes == 1:
+        return _run_batch_in_process(_BatchRunner(code, engine, max_steps, gas_limit), inputs)
+
+    return _run_batch_in_workers(code, inputs, engine, max_steps, gas_limit, processes, chunksize)
+
+
+def _run_batch_in_process(runner: _BatchRunner, inputs: Iterable[bytes]) -> Iterator[BatchResult]:
+    for index, calldata in enumerate(inputs):
+        yield runner(index, calldata)
+
+
+def _run_batch_in_workers(code, inputs, engine, max_steps, gas_limit, processes, chunksize) -> Iterator[BatchResult]:
+    initargs = (bytes(code), engine, max_steps, gas_limit)
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+        yield from pool.imap(_run_in_worker, enumerate(inputs), chunksize)
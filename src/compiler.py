@@ -0,0 +1,403 @@
+"""
+Compiles the basic blocks of a Program into Python functions.
+
+Each basic block is turned into Python source where the straight-line stack operations
+are resolved at compile time: PUSH, DUP, SWAP and arithmetic results live in local
+variables, and the real stack is only popped for values that were on it when the
+block was entered, and only pushed to once, when the block exits. The source for all
+the blocks of a program is compiled with a single compile() call.
+
+Instructions the compiler does not know about split a block into several compiled
+segments and are executed one at a time through the fastEngine handler table, as is
+every segment whose stack requirements are not met on entry, so that errors (stack
+underflow / overflow, max_steps) are raised at exactly the same instruction as the
+reference engine would.
+"""
+import sys
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
+
+from .analysis import BasicBlock, Program, PROGRAM_CACHE_SIZE, analyze
+from .executionContext import ExecutionContext, JumpDestinations
+from .fastEngine import HALT, HANDLERS
+from .gas import G_EXP_BYTE
+from .generics import *
+from .opcodesInstructions import *
+from . import arithmetic
+
+
+@dataclass(frozen=True)
+class CompiledSegment:
+    # run(stack: list, memory: Memory, ctx: ExecutionContext) -> next pc or HALT
+    run: Callable
+    # how many items must be on the stack when entering the segment
+    stack_required: int
+    # how much higher than on entry the stack gets while running the segment
+    stack_growth: int
+    num_instructions: int
+    source: str
+
+
+@dataclass(frozen=True)
+class CompiledProgram:
+    program: Program
+
+    # compiled segments by start pc, stored as (run, stack_required, stack_growth, num_instructions)
+    # tuples for the interpreter loop
+    entries: dict[int, tuple]
+
+    segments: dict[int, CompiledSegment]
+
+
+_BINARY_OPS = {
+    ADD.opcode: "({a} + {b}) & MAX_UINT256",
+    MUL.opcode: "({a} * {b}) & MAX_UINT256",
+    SUB.opcode: "({a} - {b}) & MAX_UINT256",
+    DIV.opcode: "div({a}, {b})",
+    SDIV.opcode: "sdiv({a}, {b})",
+    MOD.opcode: "mod({a}, {b})",
+    SMOD.opcode: "smod({a}, {b})",
+    SIGNEXTEND.opcode: "signextend({a}, {b})",
+}
+
+_TERNARY_OPS = {
+    ADDMOD.opcode: "addmod({a}, {b}, {c})",
+    MULMOD.opcode: "mulmod({a}, {b}, {c})",
+}
+
+# the arithmetic kernels the compiled source calls
+_ARITHMETIC = ("div", "sdiv", "mod", "smod", "addmod", "mulmod", "exp", "exp_byte_size", "signextend")
+
+COMPILABLE = frozenset([
+    *_BINARY_OPS,
+    *_TERNARY_OPS,
+    EXP.opcode,
+    SHA3.opcode, CALLDATALOAD.opcode, CALLDATASIZE.opcode, CALLDATACOPY.opcode,
+    STOP.opcode, RETURN.opcode, JUMP.opcode, JUMPI.opcode, JUMPDEST.opcode, PC.opcode,
+    MLOAD.opcode, MSTORE.opcode, MSTORE8.opcode, MSIZE.opcode, SLOAD.opcode, SSTORE.opcode,
+    *range(PUSH1.opcode, PUSH32.opcode + 1),
+    *range(DUP1.opcode, DUP16.opcode + 1),
+    *range(SWAP1.opcode, SWAP16.opcode + 1),
+])
+
+
+class _SegmentBuilder:
+    """
+    Tracks a symbolic view of the top of the stack while emitting a segment's source.
+
+    items holds Python expressions (local names or int literals) for the top of the
+    stack, bottom first. The first `materialized` of them were popped off the real stack.
+    """
+
+    def __init__(self, start: int) -> None:
+        self.start = start
+        self.lines = []
+        self.items = []
+        self.materialized = 0
+        self.max_growth = 0
+        self.num_locals = 0
+        self.num_instructions = 0
+
+    def _new_local(self) -> str:
+        self.num_locals += 1
+        return f"v{self.num_locals}"
+
+    def emit(self, line: str) -> None:
+        self.lines.append("    " + line)
+
+    def require(self, n: int) -> None:
+        """make sure the top n items of the stack are symbolic"""
+        while len(self.items) < n:
+            name = self._new_local()
+            self.emit(f"{name} = pop()")
+            self.items.insert(0, name)
+            self.materialized += 1
+
+    def pop(self) -> str:
+        self.require(1)
+        return self.items.pop()
+
+    def push(self, expr: str) -> None:
+        if not (expr.isidentifier() or expr.isdigit()):
+            name = self._new_local()
+            self.emit(f"{name} = {expr}")
+            expr = name
+        self.items.append(expr)
+        self.max_growth = max(self.max_growth, len(self.items) - self.materialized)
+
+    def flush(self) -> None:
+        """write the symbolic stack back to the real stack"""
+        if len(self.items) == 1:
+            self.emit(f"stack.append({self.items[0]})")
+        elif self.items:
+            self.emit(f"stack.extend(({', '.join(self.items)}))")
+
+    def jump(self, target: str, pc: int, jumpdests: JumpDestinations) -> None:
+        if target.isdigit():
+            # PUSH followed by JUMP, we can check the destination right now
+            if int(target) in jumpdests:
+                self.emit(f"return {target}")
+                return
+        else:
+            self.emit(f"if {target} in jumpdests:")
+            self.emit(f"    return {target}")
+        self.emit(f"ctx.pc = {pc + 1}")
+        self.emit(f"raise InvalidJumpDestination(target_pc={target}, context=ctx)")
+
+    def source(self) -> str:
+        header = [f"def segment_{self.start}(stack, memory, ctx):"]
+        if self.materialized:
+            header.append("    pop = stack.pop")
+        return "\n".join(header + self.lines)
+
+
+def _compile_segment(program: Program, pcs: list[int], end: int) -> _SegmentBuilder:
+    builder = _SegmentBuilder(pcs[0])
+    builder.num_instructions = len(pcs)
+
+    for pc in pcs:
+        instruction = program.instructions[pc]
+        opcode = instruction.opcode
+
+        if program.immediates[pc] is not None:
+            builder.push(str(program.immediates[pc]))
+
+        elif opcode in _BINARY_OPS:
+            a = builder.pop()
+            b = builder.pop()
+            builder.push(_BINARY_OPS[opcode].format(a=a, b=b))
+
+        elif opcode in _TERNARY_OPS:
+            a, b, c = builder.pop(), builder.pop(), builder.pop()
+            builder.push(_TERNARY_OPS[opcode].format(a=a, b=b, c=c))
+
+        elif opcode == EXP.opcode:
+            a, exponent = builder.pop(), builder.pop()
+            builder.emit(f"ctx.consume_gas({G_EXP_BYTE} * exp_byte_size({exponent}))")
+            builder.push(f"exp({a}, {exponent})")
+
+        elif opcode == SHA3.opcode:
+            offset, length = builder.pop(), builder.pop()
+            builder.push(f"sha3(ctx, {offset}, {length})")
+
+        elif opcode == CALLDATALOAD.opcode:
+            builder.push(f"ctx.calldata.load_word({builder.pop()})")
+
+        elif opcode == CALLDATASIZE.opcode:
+            builder.push("len(ctx.calldata)")
+
+        elif opcode == CALLDATACOPY.opcode:
+            dest_offset, offset, length = builder.pop(), builder.pop(), builder.pop()
+            builder.emit(f"calldatacopy(ctx, {dest_offset}, {offset}, {length})")
+
+        elif DUP1.opcode <= opcode <= DUP16.opcode:
+            n = opcode - DUP1.opcode + 1
+            builder.require(n)
+            builder.push(builder.items[-n])
+
+        elif SWAP1.opcode <= opcode <= SWAP16.opcode:
+            n = opcode - SWAP1.opcode + 1
+            builder.require(n + 1)
+            items = builder.items
+            items[-1], items[-n - 1] = items[-n - 1], items[-1]
+
+        elif opcode == JUMPDEST.opcode:
+            pass
+
+        elif opcode == PC.opcode:
+            # same value as the reference engine, which reads ctx.pc after decoding the opcode
+            builder.push(str(pc + 1))
+
+        elif opcode == MSIZE.opcode:
+            builder.push("32 * memory.active_words()")
+
+        elif opcode == MLOAD.opcode:
+            builder.push(f"memory.load_word({builder.pop()})")
+
+        elif opcode == MSTORE.opcode:
+            offset, value = builder.pop(), builder.pop()
+            builder.emit(f"memory.store_word({offset}, {value})")
+
+        elif opcode == MSTORE8.opcode:
+            offset, value = builder.pop(), builder.pop()
+            builder.emit(f"memory.store({offset}, {value} & 0xFF)")
+
+        elif opcode == SLOAD.opcode:
+            builder.push(f"sload(ctx, {builder.pop()})")
+
+        elif opcode == SSTORE.opcode:
+            slot, value = builder.pop(), builder.pop()
+            builder.emit(f"sstore(ctx, {slot}, {value})")
+
+        elif opcode == STOP.opcode:
+            builder.flush()
+            builder.emit(f"ctx.pc = {pc + 1}")
+            builder.emit("ctx.stop()")
+            builder.emit("return HALT")
+            return builder
+
+        elif opcode == RETURN.opcode:
+            offset, length = builder.pop(), builder.pop()
+            builder.flush()
+            builder.emit(f"ctx.pc = {pc + 1}")
+            builder.emit(f"ctx.set_return_data({offset}, {length})")
+            builder.emit("return HALT")
+            return builder
+
+        elif opcode == JUMP.opcode:
+            target = builder.pop()
+            builder.flush()
+            builder.jump(target, pc, program.jumpdests)
+            return builder
+
+        elif opcode == JUMPI.opcode:
+            target, cond = builder.pop(), builder.pop()
+            builder.flush()
+            builder.emit(f"if {cond}:")
+            builder.lines, outer = [], builder.lines
+            builder.jump(target, pc, program.jumpdests)
+            builder.lines = outer + ["    " + line for line in builder.lines]
+            builder.emit(f"return {pc + 1}")
+            return builder
+
+        else:
+            raise AssertionError(f"{instruction} is not compilable")
+
+    builder.flush()
+    builder.emit(f"return {end}")
+    return builder
+
+
+def _segments(program: Program, block: BasicBlock):
+    """
+    Yields (pcs, end) for the runs of compilable instructions in block.
+    """
+    pcs = []
+    for pc in block.pcs:
+        instruction = program.instructions[pc]
+        if instruction is not None and instruction.opcode in COMPILABLE:
+            pcs.append(pc)
+            continue
+
+        if pcs:
+            yield pcs, pc
+            pcs = []
+
+    if pcs:
+        yield pcs, block.end
+
+
+def compile_program(program: Program) -> CompiledProgram:
+    builders = [
+        _compile_segment(program, pcs, end)
+        for block in program.blocks
+        for pcs, end in _segments(program, block)
+    ]
+
+    source = "\n\n".join(builder.source() for builder in builders)
+    namespace = {
+        "MAX_UINT256": MAX_UINT256,
+        "HALT": HALT,
+        "InvalidJumpDestination": InvalidJumpDestination,
+        "jumpdests": program.jumpdests,
+        "sha3": sha3,
+        "calldatacopy": calldatacopy,
+        "sload": sload,
+        "sstore": sstore,
+        **{name: getattr(arithmetic, name) for name in _ARITHMETIC},
+    }
+    exec(compile(source, f"<compiled {len(program)} bytes>", "exec"), namespace)
+
+    segments = {}
+    for builder in builders:
+        segments[builder.start] = CompiledSegment(
+            run=namespace[f"segment_{builder.start}"],
+            stack_required=builder.materialized,
+            stack_growth=builder.max_growth,
+            num_instructions=builder.num_instructions,
+            source=builder.source(),
+        )
+
+    entries = {
+        pc: (segment.run, segment.stack_required, segment.stack_growth, segment.num_instructions)
+        for pc, segment in segments.items()
+    }
+    return CompiledProgram(program=program, entries=entries, segments=segments)
+
+
+@lru_cache(maxsize=PROGRAM_CACHE_SIZE)
+def _cached_compiled_program(code: bytes) -> CompiledProgram:
+    return compile_program(analyze(code))
+
+
+def compiled(code: bytes) -> CompiledProgram:
+    """
+    Returns the compiled form of code, cached the same way as analyze() caches programs.
+    """
+    return _cached_compiled_program(bytes(code))
+
+
+def execute(context: ExecutionContext, compiled_program: CompiledProgram, max_steps=0) -> None:
+    """
+    Runs context to completion from its current pc, running compiled segments where
+    possible and stepping through fastEngine.HANDLERS everywhere else.
+    """
+    pc = context.pc
+    if pc < 0:
+        raise InvalidCodeOffset({"code": context.code, "pc": pc})
+
+    program = compiled_program.program
+    entries = compiled_program.entries
+    code = program.code
+    code_size = len(program)
+    immediates, next_pcs = program.immediates, program.next_pcs
+    handlers = HANDLERS
+    stack = context.stack.stack
+    memory = context.memory
+    max_depth = context.stack.max_depth
+    gas_meter = context.gas_meter
+    block_gas = program.block_gas if gas_meter is not None else None
+    step_limit = max_steps if max_steps > 0 else sys.maxsize
+    num_steps = 0
+
+    try:
+        while pc != HALT:
+            # every block starts either a segment or a single step, so this charges each block once
+            if block_gas is not None and 0 <= pc < code_size and block_gas[pc]:
+                gas_meter.consume(block_gas[pc])
+
+            entry = entries.get(pc)
+            if entry is not None:
+                run_segment, stack_required, stack_growth, num_instructions = entry
+                height = len(stack)
+                if (height >= stack_required
+                        and height + stack_growth <= max_depth
+                        and num_steps + num_instructions <= step_limit):
+                    pc = run_segment(stack, memory, context)
+                    num_steps += num_instructions
+                    continue
+
+            # one instruction at a time, exactly like fastEngine.execute
+            if pc >= code_size:
+                context.pc = pc
+                context.stop()
+                break
+
+            immediate = immediates[pc]
+            if immediate is None:
+                pc = handlers[code[pc]](stack, memory, context, pc)
+            else:
+                if len(stack) >= max_depth:
+                    raise StackOverFlow()
+                stack.append(immediate)
+                pc = next_pcs[pc]
+
+            num_steps += 1
+            if num_steps > step_limit:
+                context.pc = pc
+                raise ExecutionLimitReached(context=context)
+
+    except IndexError:
+        context.pc = pc + 1
+        raise StackUnderFlow() from None
@@ -0,0 +1,100 @@
+"""
+Turns bytecode into text, one instruction per line:
+
+    0000: PUSH1 0x80
+    0002: PUSH1 0x40
+    0004: MSTORE
+    ...
+
+Bytes following an instruction that ends execution (STOP, JUMP, RETURN, REVERT, INVALID,
+SELFDESTRUCT) can only be reached through a JUMPDEST, so until the next valid JUMPDEST
+they are shown as DATA (typically the metadata appended by compilers). Opcodes the EVM
+does not define are shown as UNKNOWN and a PUSH running past the end of the code is
+marked as truncated.
+
+The output can be assembled back into the exact same bytes with
+opcodesInstructions.assemble. iter_disassembly yields lines as it goes, so that even
+multi-megabyte code can be streamed without holding all of its text in memory:
+
+    python -m src.disasm code.hex
+"""
+import argparse
+import sys
+from typing import Iterator, Union
+
+from .opcodesInstructions import JUMPDEST, OPCODE_NAMES, OPCODES_BY_NAME, PUSH1, PUSH32
+
+# at most this many bytes on each DATA line
+DATA_LINE_SIZE = 32
+
+# opcodes after which execution does not continue with the next byte, and which do not
+# jump anywhere either: what follows until the next JUMPDEST is not code
+TERMINATORS = frozenset(OPCODES_BY_NAME[name] for name in ("STOP", "JUMP", "RETURN", "REVERT", "INVALID", "SELFDESTRUCT"))
+
+# number of argument bytes, by opcode
+_ARGUMENT_SIZES = [opcode - PUSH1.opcode + 1 if PUSH1.opcode <= opcode <= PUSH32.opcode else 0 for opcode in range(256)]
+
+# mnemonic, by opcode
+_NAMES = [OPCODE_NAMES.get(opcode) for opcode in range(256)]
+
+
+def iter_disassembly(code: Union[bytes, bytearray, memoryview]) -> Iterator[str]:
+    code = bytes(code)
+    code_size = len(code)
+    argument_sizes, names = _ARGUMENT_SIZES, _NAMES
+    jumpdest = JUMPDEST.opcode
+
+    pc = 0
+    while pc < code_size:
+        opcode = code[pc]
+        name = names[opcode]
+        argument_size = argument_sizes[opcode]
+
+        if name is None:
+            yield f"{pc:04x}: UNKNOWN 0x{opcode:02x}"
+        elif argument_size:
+            argument = code[pc + 1: pc + 1 + argument_size]
+            if len(argument) == argument_size:
+                yield f"{pc:04x}: {name} 0x{argument.hex()}"
+            else:
+                yield f"{pc:04x}: {name} 0x{argument.hex()} # truncated"
+        else:
+            yield f"{pc:04x}: {name}"
+        pc += 1 + argument_size
+
+        if opcode in TERMINATORS:
+            # skip to the next JUMPDEST, stepping over PUSH arguments as the jump destination analysis does
+            start = pc
+            while pc < code_size and code[pc] != jumpdest:
+                pc += 1 + argument_sizes[code[pc]]
+            pc = min(pc, code_size)
+
+            for offset in range(start, pc, DATA_LINE_SIZE):
+                yield f"{offset:04x}: DATA 0x{code[offset: min(offset + DATA_LINE_SIZE, pc)].hex()}"
+
+
+def disassemble(code: Union[bytes, bytearray, memoryview]) -> list[str]:
+    return list(iter_disassembly(code))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="disassemble EVM bytecode")
+    parser.add_argument("file", help="file with the bytecode, as hex (optionally 0x prefixed) or raw bytes")
+    args = parser.parse_args(argv)
+
+    with open(args.file, "rb") as file:
+        content = file.read()
+    try:
+        text = content.decode("ascii").strip()
+        code = bytes.fromhex(text[2:] if text.startswith("0x") else text)
+    except ValueError:
+        code = content
+
+    write = sys.stdout.write
+    for line in iter_disassembly(code):
+        write(line + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,119 @@
+from contextlib import contextmanager
+from functools import lru_cache
+
 from .stack import Stack, InvalidCodeOffset, UnknownOpcode, InvalidMemoryAccess
-from .memory import Memory
-from .opcodesInstructions import *
+from .memory import Memory, PagedMemory
+from .gas import GasMeter
+from .storage import Storage, InvalidStorageSlot, InvalidStorageValue
+
+class Calldata:
+    """
+    The input data of an execution, as a memoryview over the caller's buffer: reading
+    from it (see load_word and copy_to) never copies the whole data. Reads past the end
+    are zero-padded.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data=bytes()) -> None:
+        self.data = memoryview(data).toreadonly()
+
+    def load_word(self, offset: int) -> int:
+        if offset >= len(self.data):
+            return 0
+
+        word = self.data[offset: offset + 32]
+        return int.from_bytes(word, "big") << (8 * (32 - len(word)))
+
+    def copy_to(self, memory: Memory, dest_offset: int, offset: int, length: int) -> None:
+        """
+        Writes calldata[offset:offset + length] to memory at dest_offset
+        """
+        chunk = self.data[offset: offset + length] if offset < len(self.data) else b""
+        memory.store_range(dest_offset, chunk, length)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __bytes__(self) -> bytes:
+        return bytes(self.data)
+
+    def __eq__(self, other) -> bool:
+        return self.data == (other.data if isinstance(other, Calldata) else other)
+
+    __hash__ = None
+
+    def __reduce__(self):
+        # memoryviews can not be pickled
+        return Calldata, (bytes(self.data),)
+
+    def __str__(self) -> str:
+        return self.data.hex()
+
+    def __repr__(self) -> str:
+        return str(self)
+
 
 class ExecutionContext:
-    def __init__(self, code=bytes(), pc=0, stack=Stack(), memory=Memory()) -> None:
+    def __init__(self, code=bytes(), pc=0, stack=None, memory=None, jumpdests=None, gas_meter=None, calldata=bytes(),
+                 storage=None) -> None:
         self.code = code
         self.pc = pc
-        self.stack = stack
-        self.memory = memory
+        # a default argument would be a single Stack / Memory shared by every context
+        self.stack = stack if stack is not None else Stack()
+        self.memory = memory if memory is not None else Memory(gas_meter=gas_meter)
+        self.stopped = False
+        self.return_data = bytes()
+        self.jumpdests = jumpdests if jumpdests is not None else valid_jump_destinations(code)
+        self.gas_meter = gas_meter
+        self.calldata = calldata if isinstance(calldata, Calldata) else Calldata(calldata)
+        # outlives the execution, pass the same Storage to run several transactions on the same state
+        self.storage = storage if storage is not None else Storage()
+
+    def reset(self, code=bytes(), jumpdests=None, gas_meter=None, calldata=bytes(), storage=None) -> None:
+        """
+        Puts the context back in the state of a freshly created one running code, reusing
+        its stack and memory buffers instead of allocating new ones (but not its storage,
+        which may belong to the previous caller).
+        """
+        self.code = code
+        self.pc = 0
+        self.stack.reset()
+        self.memory.reset(gas_meter=gas_meter)
         self.stopped = False
-        self.return_data = bytes
+        self.return_data = bytes()
+        self.jumpdests = jumpdests if jumpdests is not None else valid_jump_destinations(code)
+        self.gas_meter = gas_meter
+        self.calldata = calldata if isinstance(calldata, Calldata) else Calldata(calldata)
+        self.storage = storage if storage is not None else Storage()
+
+    def fork(self) -> "ExecutionContext":
+        """
+        Returns a context in the same state, to continue from there without affecting this
+        one (e.g. a speculative run). Its memory and storage are copy-on-write layers over
+        the ones of this context, which must not change while the fork is in use; only the
+        stack is copied. See Storage.merge to keep the storage writes of the fork.
+        """
+        gas_meter = None
+        if self.gas_meter is not None:
+            gas_meter = GasMeter(self.gas_meter.gas_limit)
+            gas_meter.gas_left = self.gas_meter.gas_left
+
+        stack = Stack(max_depth=self.stack.max_depth)
+        stack.stack.extend(self.stack.stack)
+
+        child = ExecutionContext(
+            code=self.code,
+            pc=self.pc,
+            stack=stack,
+            memory=self.memory.fork(gas_meter=gas_meter),
+            jumpdests=self.jumpdests,
+            gas_meter=gas_meter,
+            calldata=self.calldata,
+            storage=self.storage.fork(),
+        )
+        child.stopped = self.stopped
+        child.return_data = self.return_data
+        return child
 
     def stop(self) -> None:
         self.stopped = True
@@ -24,6 +128,16 @@ class ExecutionContext:
         self.pc += num_bytes
         
         return value
+
+    def consume_gas(self, amount: int) -> None:
+        """
+        Charges a dynamic cost (one that depends on operands or state) when gas is metered
+        """
+        if self.gas_meter is not None:
+            self.gas_meter.consume(amount)
+
+    def set_program_counter(self, pc: int) -> None:
+        self.pc = pc
     
     def set_return_data(self, offset: int, length: int) -> None:
         self.stopped = True
@@ -36,15 +150,104 @@ class ExecutionContext:
         return str(self)
 
 
-def valid_jump_destinations(code: bytes) -> set[int]:
-    jumpdests = set()
-    for i in range(len(code)):
+class ContextPool:
+    """
+    Reuses execution contexts, with their stack and memory buffers, across runs:
+
+        with pool.context(code, gas_meter=gas_meter) as context:
+            ...
+
+    A context handed out by the pool is always reset first, so nothing from a previous
+    run (stack items, memory, return data, gas meter, calldata, storage) leaks into the next one.
+    At most max_size idle contexts are kept around. With paged_memory, the contexts use
+    a PagedMemory instead of a Memory.
+
+    context() only gives the context back when the block exits normally: an exception
+    raised by the execution (e.g. InvalidJumpDestination) keeps a reference to it, so it
+    must not be reset under the caller's feet.
+    """
+
+    def __init__(self, max_size=64, paged_memory=False) -> None:
+        self.max_size = max_size
+        self.paged_memory = paged_memory
+        self.free = []
+
+    def acquire(self, code=bytes(), jumpdests=None, gas_meter=None, calldata=bytes(), storage=None) -> ExecutionContext:
+        if not self.free:
+            memory = PagedMemory(gas_meter=gas_meter) if self.paged_memory else None
+            return ExecutionContext(code=code, memory=memory, jumpdests=jumpdests, gas_meter=gas_meter, calldata=calldata,
+                                    storage=storage)
+
+        context = self.free.pop()
+        context.reset(code=code, jumpdests=jumpdests, gas_meter=gas_meter, calldata=calldata, storage=storage)
+        return context
+
+    def release(self, context: ExecutionContext) -> None:
+        if len(self.free) < self.max_size:
+            self.free.append(context)
+
+    @contextmanager
+    def context(self, code=bytes(), jumpdests=None, gas_meter=None, calldata=bytes(), storage=None):
+        context = self.acquire(code=code, jumpdests=jumpdests, gas_meter=gas_meter, calldata=calldata, storage=storage)
+        yield context
+        self.release(context)
+
+    def __len__(self) -> int:
+        return len(self.free)
+
+
+class JumpDestinations:
+    """
+    The valid JUMPDEST offsets of a code blob, as a bitmap with one bit per byte of code.
+
+    Checking a jump target is a single bit test: `target_pc in jumpdests`.
+    """
+    __slots__ = ("bitmap", "code_size")
+
+    def __init__(self, bitmap: bytes, code_size: int) -> None:
+        self.bitmap = bitmap
+        self.code_size = code_size
+
+    def __contains__(self, pc: int) -> bool:
+        return 0 <= pc < self.code_size and (self.bitmap[pc >> 3] >> (pc & 7)) & 1 == 1
+
+    def __iter__(self):
+        return (pc for pc in range(self.code_size) if pc in self)
+
+    def __len__(self) -> int:
+        return sum(bin(byte).count("1") for byte in self.bitmap)
+
+    def __str__(self) -> str:
+        return str(set(self))
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def valid_jump_destinations(code: bytes) -> JumpDestinations:
+    """
+    Returns the offsets of the JUMPDEST instructions in code, skipping PUSH arguments
+    (a 0x5B byte inside a PUSH argument is data, not a JUMPDEST).
+
+    The result only depends on the code, so it is computed once per distinct code and
+    shared by every context running it.
+    """
+    return _cached_jump_destinations(bytes(code))
+
+
+@lru_cache(maxsize=1024)
+def _cached_jump_destinations(code: bytes) -> JumpDestinations:
+    from .opcodesInstructions import JUMPDEST, PUSH1, PUSH32
+
+    bitmap = bytearray((len(code) + 7) // 8)
+    i = 0
+    while i < len(code):
         current_opcode = code[i]
         if current_opcode == JUMPDEST.opcode:
-            i += current_opcode - PUSH1.opcode + 1
+            bitmap[i >> 3] |= 1 << (i & 7)
         elif PUSH1.opcode <= current_opcode <= PUSH32.opcode:
-            i += current_opcode - PUSH1.opcode + 2
-        
+            i += current_opcode - PUSH1.opcode + 1
+
         i += 1
 
-        return jumpdests
+    return JumpDestinations(bytes(bitmap), len(code))
@@ -0,0 +1,413 @@
+"""
+An alternative execution engine for a pre-decoded Program.
+
+Instead of looking up Instruction.execute and going through ctx.stack.pop() on every
+step, it dispatches through a flat 256-entry handler table indexed by opcode. Each
+handler receives the backing list of the stack and the memory as locals:
+
+    handler(stack: list, memory: Memory, ctx: ExecutionContext, pc: int) -> next pc
+
+and returns the pc to continue at, or HALT once it has stopped the context.
+
+Opcodes without a dedicated handler fall back to their Instruction.execute, so the
+engine stays complete as instructions are added to opcodesInstructions.
+
+When entering a basic block whose stack height requirements (computed by the analysis
+pass) are met, the engine switches to UNCHECKED_HANDLERS, whose handlers push without
+checking for overflow. Otherwise every push is checked, so that errors are raised at
+the same instruction as with the reference engine.
+
+With hooks, the handlers of the hooked opcodes are wrapped to run them (see
+hooked_handler_table), and every push is checked since hooks may change the stack.
+"""
+import sys
+
+from .analysis import STACK_EFFECTS, Program
+from .executionContext import ExecutionContext
+from .gas import G_EXP_BYTE
+from .generics import *
+from . import arithmetic
+from .hooks import Hooks
+from .opcodesInstructions import INSTRUCTION_BY_OPCODE, Instruction, PUSH1, PUSH32, calldatacopy, sha3, sload, sstore
+
+HALT = -1
+
+
+def _overflow_check(stack: list, ctx: ExecutionContext) -> None:
+    if len(stack) >= ctx.stack.max_depth:
+        raise StackOverFlow()
+
+
+def _stop(stack, memory, ctx, pc):
+    ctx.pc = pc + 1
+    ctx.stop()
+    return HALT
+
+
+def _add(stack, memory, ctx, pc):
+    stack.append((stack.pop() + stack.pop()) & MAX_UINT256)
+    return pc + 1
+
+
+def _mul(stack, memory, ctx, pc):
+    stack.append((stack.pop() * stack.pop()) & MAX_UINT256)
+    return pc + 1
+
+
+def _sub(stack, memory, ctx, pc):
+    a = stack.pop()
+    stack.append((a - stack.pop()) & MAX_UINT256)
+    return pc + 1
+
+
+def _binary(op: callable) -> callable:
+    def handler(stack, memory, ctx, pc):
+        stack.append(op(stack.pop(), stack.pop()))
+        return pc + 1
+
+    return handler
+
+
+def _ternary(op: callable) -> callable:
+    def handler(stack, memory, ctx, pc):
+        stack.append(op(stack.pop(), stack.pop(), stack.pop()))
+        return pc + 1
+
+    return handler
+
+
+def _exp(stack, memory, ctx, pc):
+    a, exponent = stack.pop(), stack.pop()
+    ctx.consume_gas(G_EXP_BYTE * arithmetic.exp_byte_size(exponent))
+    stack.append(arithmetic.exp(a, exponent))
+    return pc + 1
+
+
+def _sha3(stack, memory, ctx, pc):
+    offset = stack.pop()
+    stack.append(sha3(ctx, offset, stack.pop()))
+    return pc + 1
+
+
+def _calldataload(stack, memory, ctx, pc):
+    stack.append(ctx.calldata.load_word(stack.pop()))
+    return pc + 1
+
+
+def _calldatasize(stack, memory, ctx, pc):
+    stack.append(len(ctx.calldata))
+    return pc + 1
+
+
+def _calldatacopy(stack, memory, ctx, pc):
+    dest_offset, offset = stack.pop(), stack.pop()
+    calldatacopy(ctx, dest_offset, offset, stack.pop())
+    return pc + 1
+
+
+def _mload(stack, memory, ctx, pc):
+    stack.append(memory.load_word(stack.pop()))
+    return pc + 1
+
+
+def _mstore(stack, memory, ctx, pc):
+    offset = stack.pop()
+    memory.store_word(offset, stack.pop())
+    return pc + 1
+
+
+def _mstore8(stack, memory, ctx, pc):
+    offset = stack.pop()
+    memory.store(offset, stack.pop() & 0xFF)
+    return pc + 1
+
+
+def _sload(stack, memory, ctx, pc):
+    stack.append(sload(ctx, stack.pop()))
+    return pc + 1
+
+
+def _sstore(stack, memory, ctx, pc):
+    slot = stack.pop()
+    sstore(ctx, slot, stack.pop())
+    return pc + 1
+
+
+def _return(stack, memory, ctx, pc):
+    offset = stack.pop()
+    length = stack.pop()
+    ctx.pc = pc + 1
+    ctx.set_return_data(offset, length)
+    return HALT
+
+
+def _jump(stack, memory, ctx, pc):
+    target_pc = stack.pop()
+    if target_pc not in ctx.jumpdests:
+        ctx.pc = pc + 1
+        raise InvalidJumpDestination(target_pc=target_pc, context=ctx)
+    return target_pc
+
+
+def _jumpi(stack, memory, ctx, pc):
+    target_pc = stack.pop()
+    if stack.pop() == 0:
+        return pc + 1
+    if target_pc not in ctx.jumpdests:
+        ctx.pc = pc + 1
+        raise InvalidJumpDestination(target_pc=target_pc, context=ctx)
+    return target_pc
+
+
+def _pc(stack, memory, ctx, pc):
+    # same value as the reference engine, which reads ctx.pc after decoding the opcode
+    stack.append(pc + 1)
+    return pc + 1
+
+
+def _msize(stack, memory, ctx, pc):
+    stack.append(32 * memory.active_words())
+    return pc + 1
+
+
+def _jumpdest(stack, memory, ctx, pc):
+    return pc + 1
+
+
+def _dup(n: int) -> callable:
+    def handler(stack, memory, ctx, pc):
+        stack.append(stack[-n])
+        return pc + 1
+
+    return handler
+
+
+def _checked(handler: callable) -> callable:
+    def checked_handler(stack, memory, ctx, pc):
+        _overflow_check(stack, ctx)
+        return handler(stack, memory, ctx, pc)
+
+    return checked_handler
+
+
+def _swap(n: int) -> callable:
+    def handler(stack, memory, ctx, pc):
+        stack[-1], stack[-n - 1] = stack[-n - 1], stack[-1]
+        return pc + 1
+
+    return handler
+
+
+def _unknown(opcode: int) -> callable:
+    def handler(stack, memory, ctx, pc):
+        ctx.pc = pc + 1
+        raise UnknownOpcode({"opcode": opcode})
+
+    return handler
+
+
+def _fallback(instruction: Instruction) -> callable:
+    execute = instruction.execute
+
+    def handler(stack, memory, ctx, pc):
+        ctx.pc = pc + 1
+        execute(ctx)
+        return HALT if ctx.stopped else ctx.pc
+
+    return handler
+
+
+# handlers that push more items than they pop, they need an overflow check in unverified blocks
+_PUSHING = frozenset([0x36, 0x58, 0x59, *range(0x80, 0x90)])
+
+FAST_HANDLERS = {
+    0x00: _stop,
+    0x01: _add,
+    0x02: _mul,
+    0x03: _sub,
+    0x04: _binary(arithmetic.div),
+    0x05: _binary(arithmetic.sdiv),
+    0x06: _binary(arithmetic.mod),
+    0x07: _binary(arithmetic.smod),
+    0x08: _ternary(arithmetic.addmod),
+    0x09: _ternary(arithmetic.mulmod),
+    0x0A: _exp,
+    0x0B: _binary(arithmetic.signextend),
+    0x20: _sha3,
+    0x35: _calldataload,
+    0x36: _calldatasize,
+    0x37: _calldatacopy,
+    0x51: _mload,
+    0x52: _mstore,
+    0x53: _mstore8,
+    0x54: _sload,
+    0x55: _sstore,
+    0x56: _jump,
+    0x57: _jumpi,
+    0x58: _pc,
+    0x59: _msize,
+    0x5B: _jumpdest,
+    0xF3: _return,
+    **{0x80 + i: _dup(i + 1) for i in range(16)},
+    **{0x90 + i: _swap(i + 1) for i in range(16)},
+}
+
+
+def build_handler_table(checked=True) -> list:
+    """
+    Returns the 256-entry dispatch table for the instructions currently registered.
+    """
+    table = []
+    for opcode in range(256):
+        instruction = INSTRUCTION_BY_OPCODE.get(opcode)
+        if instruction is None:
+            table.append(_unknown(opcode))
+        elif opcode in FAST_HANDLERS:
+            handler = FAST_HANDLERS[opcode]
+            table.append(_checked(handler) if checked and opcode in _PUSHING else handler)
+        else:
+            table.append(_fallback(instruction))
+
+    return table
+
+
+HANDLERS = build_handler_table()
+UNCHECKED_HANDLERS = build_handler_table(checked=False)
+
+
+def _push(program: Program) -> callable:
+    immediates, next_pcs = program.immediates, program.next_pcs
+
+    def handler(stack, memory, ctx, pc):
+        _overflow_check(stack, ctx)
+        stack.append(immediates[pc])
+        return next_pcs[pc]
+
+    return handler
+
+
+def _hooked(handler: callable, instruction: Instruction, program: Program, prehooks: list, posthooks: list) -> callable:
+    next_pcs = program.next_pcs
+
+    def hooked_handler(stack, memory, ctx, pc):
+        ctx.pc = next_pcs[pc]
+        for hook in prehooks:
+            hook(ctx, instruction)
+
+        next_pc = handler(stack, memory, ctx, pc)
+
+        if next_pc != HALT:
+            ctx.pc = next_pc
+        for hook in posthooks:
+            hook(ctx, instruction)
+        return next_pc
+
+    return hooked_handler
+
+
+def hooked_handler_table(program: Program, hooks: Hooks) -> tuple[list, list]:
+    """
+    Returns (handlers, immediates) to run program with hooks: HANDLERS with the handlers
+    of the hooked opcodes wrapped, and the program's immediates without the ones of
+    hooked PUSH instructions, which go through their (wrapped) handler instead.
+    """
+    handlers = list(HANDLERS)
+    immediates = program.immediates
+    hooked = hooks.opcodes()
+
+    for opcode in hooked:
+        instruction = INSTRUCTION_BY_OPCODE.get(opcode)
+        if instruction is None:
+            continue
+
+        handler = _push(program) if PUSH1.opcode <= opcode <= PUSH32.opcode else HANDLERS[opcode]
+        handlers[opcode] = _hooked(
+            handler, instruction, program, hooks.prehooks.get(opcode, []), hooks.posthooks.get(opcode, [])
+        )
+
+    if any(PUSH1.opcode <= opcode <= PUSH32.opcode for opcode in hooked):
+        code = program.code
+        immediates = [
+            None if immediate is not None and code[pc] in hooked else immediate
+            for pc, immediate in enumerate(immediates)
+        ]
+
+    return handlers, immediates
+
+
+def execute(context: ExecutionContext, program: Program, max_steps=0, hooks: Hooks = None, steps_taken=0) -> None:
+    """
+    Runs context to completion from its current pc, dispatching through HANDLERS.
+
+    PUSH instructions are executed inline from the program's pre-decoded immediates.
+    The stack requirements of each basic block are verified when entering it, and when
+    the context has a gas meter, the block's static gas is charged.
+    context.pc is only written back when execution stops, raises or hits max_steps
+    (and before running hooks). steps_taken counts steps already executed towards
+    max_steps, when resuming an execution started by another engine.
+    """
+    pc = context.pc
+    if pc < 0:
+        raise InvalidCodeOffset({"code": context.code, "pc": pc})
+
+    code = program.code
+    code_size = len(program)
+    immediates, next_pcs, block_at = program.immediates, program.next_pcs, program.block_at
+    stack = context.stack.stack
+    push = stack.append
+    memory = context.memory
+    max_depth = context.stack.max_depth
+    gas_meter = context.gas_meter
+
+    # until we enter a block we verified, check everything
+    checked = True
+    handlers = HANDLERS
+    # hooks may change the stack behind the back of the verification, keep checking then
+    verify_blocks = not hooks
+    if hooks:
+        handlers, immediates = hooked_handler_table(program, hooks)
+
+    step_limit = max_steps if max_steps > 0 else sys.maxsize
+    num_steps = steps_taken
+
+    try:
+        while pc != HALT:
+            if pc >= code_size:
+                # section 9.4.1 of the yellow paper, the operation to be executed if pc is outside code is STOP
+                context.pc = pc
+                context.stop()
+                break
+
+            block = block_at[pc]
+            if block is not None:
+                if gas_meter is not None:
+                    gas_meter.consume(block.static_gas)
+
+                if verify_blocks:
+                    height = len(stack)
+                    checked = height < block.stack_required or height + block.stack_growth > max_depth
+                    handlers = HANDLERS if checked else UNCHECKED_HANDLERS
+
+            immediate = immediates[pc]
+            if immediate is None:
+                pc = handlers[code[pc]](stack, memory, context, pc)
+            else:
+                if checked and len(stack) >= max_depth:
+                    raise StackOverFlow()
+                push(immediate)
+                pc = next_pcs[pc]
+
+            num_steps += 1
+            if num_steps > step_limit:
+                if pc != HALT:
+                    # a halting handler already set it past the instruction
+                    context.pc = pc
+                raise ExecutionLimitReached(context=context)
+
+    except IndexError:
+        # popping or indexing past the bottom of the backing list leaves fewer items than the
+        # instruction reads, any other IndexError is not a stack error
+        if not checked or len(stack) >= STACK_EFFECTS.get(code[pc], (0, 0))[0]:
+            raise
+        context.pc = pc + 1
+        raise StackUnderFlow() from None
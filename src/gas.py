@@ -0,0 +1,139 @@
+from .generics import OutOfGas
+
+# yellow paper, appendix G (with the EIP-2929 access costs)
+G_ZERO = 0
+G_JUMPDEST = 1
+G_BASE = 2
+G_VERYLOW = 3
+G_LOW = 5
+G_MID = 8
+G_HIGH = 10
+G_EXP = 10
+G_EXP_BYTE = 50
+G_SHA3 = 30
+G_SHA3_WORD = 6
+G_COPY = 3
+G_BLOCKHASH = 20
+G_WARM_ACCESS = 100
+G_COLD_SLOAD = 2100
+G_SSTORE_SET = 20000
+G_SSTORE_RESET = 2900
+G_CALLSTIPEND = 2300
+G_SELFDESTRUCT = 5000
+G_CREATE = 32000
+G_LOG = 375
+G_LOG_TOPIC = 375
+G_LOG_DATA = 8
+G_MEMORY = 3
+G_QUADRATIC_MEMORY_DIVISOR = 512
+
+# the part of the cost of each opcode that does not depend on its operands, by opcode.
+# Costs that depend on operands or state (memory expansion, words hashed or copied,
+# cold accesses, ...) are charged by the instructions themselves while executing.
+STATIC_GAS = {
+    0x00: G_ZERO,       # STOP
+    0x01: G_VERYLOW,    # ADD
+    0x02: G_LOW,        # MUL
+    0x03: G_VERYLOW,    # SUB
+    0x04: G_LOW,        # DIV
+    0x05: G_LOW,        # SDIV
+    0x06: G_LOW,        # MOD
+    0x07: G_LOW,        # SMOD
+    0x08: G_MID,        # ADDMOD
+    0x09: G_MID,        # MULMOD
+    0x0A: G_EXP,        # EXP
+    0x0B: G_LOW,        # SIGNEXTEND
+    **{opcode: G_VERYLOW for opcode in range(0x10, 0x1E)},  # LT ... SAR
+    0x20: G_SHA3,       # SHA3
+    0x30: G_BASE,       # ADDRESS
+    0x31: G_WARM_ACCESS,  # BALANCE
+    0x32: G_BASE,       # ORIGIN
+    0x33: G_BASE,       # CALLER
+    0x34: G_BASE,       # CALLVALUE
+    0x35: G_VERYLOW,    # CALLDATALOAD
+    0x36: G_BASE,       # CALLDATASIZE
+    0x37: G_VERYLOW,    # CALLDATACOPY
+    0x38: G_BASE,       # CODESIZE
+    0x39: G_VERYLOW,    # CODECOPY
+    0x3A: G_BASE,       # GASPRICE
+    0x3B: G_WARM_ACCESS,  # EXTCODESIZE
+    0x3C: G_WARM_ACCESS,  # EXTCODECOPY
+    0x3D: G_BASE,       # RETURNDATASIZE
+    0x3E: G_VERYLOW,    # RETURNDATACOPY
+    0x3F: G_WARM_ACCESS,  # EXTCODEHASH
+    0x40: G_BLOCKHASH,  # BLOCKHASH
+    0x41: G_BASE,       # COINBASE
+    0x42: G_BASE,       # TIMESTAMP
+    0x43: G_BASE,       # NUMBER
+    0x44: G_BASE,       # PREVRANDAO
+    0x45: G_BASE,       # GASLIMIT
+    0x46: G_BASE,       # CHAINID
+    0x47: G_LOW,        # SELFBALANCE
+    0x48: G_BASE,       # BASEFEE
+    0x50: G_BASE,       # POP
+    0x51: G_VERYLOW,    # MLOAD
+    0x52: G_VERYLOW,    # MSTORE
+    0x53: G_VERYLOW,    # MSTORE8
+    0x54: G_WARM_ACCESS,  # SLOAD
+    0x55: G_ZERO,       # SSTORE, entirely dependent on the slot's state
+    0x56: G_MID,        # JUMP
+    0x57: G_HIGH,       # JUMPI
+    0x58: G_BASE,       # PC
+    0x59: G_BASE,       # MSIZE
+    0x5A: G_BASE,       # GAS
+    0x5B: G_JUMPDEST,   # JUMPDEST
+    0x5F: G_BASE,       # PUSH0
+    **{opcode: G_VERYLOW for opcode in range(0x60, 0xA0)},  # PUSH1 ... SWAP16
+    **{0xA0 + topics: G_LOG + topics * G_LOG_TOPIC for topics in range(5)},  # LOG0 ... LOG4
+    0xF0: G_CREATE,     # CREATE
+    0xF1: G_WARM_ACCESS,  # CALL
+    0xF2: G_WARM_ACCESS,  # CALLCODE
+    0xF3: G_ZERO,       # RETURN
+    0xF4: G_WARM_ACCESS,  # DELEGATECALL
+    0xF5: G_CREATE,     # CREATE2
+    0xFA: G_WARM_ACCESS,  # STATICCALL
+    0xFD: G_ZERO,       # REVERT
+    0xFE: G_ZERO,       # INVALID
+    0xFF: G_SELFDESTRUCT,  # SELFDESTRUCT
+}
+
+
+def memory_expansion_cost(active_words: int) -> int:
+    """
+    Total cost of having active_words words of memory active (C_mem in the yellow paper)
+    """
+    return G_MEMORY * active_words + active_words * active_words // G_QUADRATIC_MEMORY_DIVISOR
+
+
+def word_cost(per_word: int, num_bytes: int) -> int:
+    """
+    Cost of an operation charging per_word for every (started) 32-byte word of num_bytes,
+    e.g. word_cost(G_SHA3_WORD, length) for SHA3 or word_cost(G_COPY, length) for *COPY
+    """
+    return per_word * ((num_bytes + 31) // 32)
+
+
+class GasMeter:
+    """
+    The gas left for an execution. Everything that costs gas charges it here.
+    """
+
+    def __init__(self, gas_limit: int) -> None:
+        self.gas_limit = gas_limit
+        self.gas_left = gas_limit
+
+    def consume(self, amount: int) -> None:
+        if amount > self.gas_left:
+            raise OutOfGas({"required": amount, "available": self.gas_left})
+
+        self.gas_left -= amount
+
+    @property
+    def gas_used(self) -> int:
+        return self.gas_limit - self.gas_left
+
+    def __str__(self) -> str:
+        return f"{self.gas_left}/{self.gas_limit}"
+
+    def __repr__(self) -> str:
+        return str(self)
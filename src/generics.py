@@ -5,15 +5,29 @@ InvalidMemoryAccess = type("InvalidMemoryAccess", (Exception,), {})
 InvalidMemoryValue = type("InvalidMemoryValue", (Exception,), {})
 InvalidCodeOffset = type("InvalidCodeOffset", (Exception,), {})
 UnknownOpcode = type("UnknownOpcode", (Exception,), {})
+OutOfGas = type("OutOfGas", (Exception,), {})
+InvalidStorageSlot = type("InvalidStorageSlot", (Exception,), {})
+InvalidStorageValue = type("InvalidStorageValue", (Exception,), {})
+WorkerDied = type("WorkerDied", (Exception,), {})
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from typing import TYPE_CHECKING
 
-from .executionContext import ExecutionContext
+if TYPE_CHECKING:
+    from .executionContext import ExecutionContext
+
+
+def _reduce_dataclass_exception(self):
+    # the dataclass __init__ does not set Exception.args, so pickle (e.g. to send the
+    # exception back from a worker process) the fields instead
+    return type(self), tuple(getattr(self, field.name) for field in fields(self))
 
 
 @dataclass
 class EVMException(Exception):
-    context: ExecutionContext
+    context: "ExecutionContext"
+
+    __reduce__ = _reduce_dataclass_exception
 
 
 class UnknownOpcode(EVMException):
@@ -28,6 +42,13 @@ class InvalidCodeOffset(EVMException):
 class InvalidJumpDestination(EVMException):
     target_pc: int
 
+
+@dataclass
+class ExecutionLimitReached(Exception):
+    context: "ExecutionContext"
+
+    __reduce__ = _reduce_dataclass_exception
+
 MAX_UINT256 = 2**256-1
 MAX_UINT8 = 2**8-1
 MAX_STACK_DEPTH = 1024
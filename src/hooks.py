@@ -0,0 +1,77 @@
+"""
+Callbacks run around the execution of instructions, e.g. for tracing:
+
+    hooks = Hooks()
+    hooks.add_prehook(tracer.prehook, opcodes=[EQ, LT, GT])
+    run(code, hooks=hooks)
+
+A hook is called as hook(context, instruction). When a prehook runs, context.pc already
+points past the instruction (and its PUSH argument), like when Instruction.execute runs.
+A posthook runs after the instruction executed successfully, with context.pc set to
+the next instruction to execute.
+
+Hooks only cost something for the opcodes they are registered for: the engines run
+their regular loop when no hooks are registered, and only wrap the hooked opcodes
+otherwise.
+"""
+from typing import Callable, Iterable, Optional, Union
+
+from .executionContext import ExecutionContext
+from .opcodesInstructions import INSTRUCTION_BY_OPCODE, Instruction, PUSH1, PUSH32
+
+# hook(context: ExecutionContext, instruction: Instruction) -> None
+Hook = Callable
+
+
+class Hooks:
+    def __init__(self) -> None:
+        # hooks by opcode, in the order they were added
+        self.prehooks: dict[int, list[Hook]] = {}
+        self.posthooks: dict[int, list[Hook]] = {}
+
+    def add_prehook(self, hook: Hook, opcodes: Optional[Iterable[Union[Instruction, int]]] = None) -> None:
+        """
+        Runs hook before every instruction with one of opcodes, or before every instruction
+        when opcodes is None
+        """
+        _add(self.prehooks, hook, opcodes)
+
+    def add_posthook(self, hook: Hook, opcodes: Optional[Iterable[Union[Instruction, int]]] = None) -> None:
+        """
+        Runs hook after every instruction with one of opcodes, or after every instruction
+        when opcodes is None
+        """
+        _add(self.posthooks, hook, opcodes)
+
+    def copy(self) -> "Hooks":
+        hooks = Hooks()
+        hooks.prehooks = {opcode: list(opcode_hooks) for opcode, opcode_hooks in self.prehooks.items()}
+        hooks.posthooks = {opcode: list(opcode_hooks) for opcode, opcode_hooks in self.posthooks.items()}
+        return hooks
+
+    def opcodes(self) -> set[int]:
+        """the opcodes with at least one hook"""
+        return set(self.prehooks) | set(self.posthooks)
+
+    def __bool__(self) -> bool:
+        return bool(self.prehooks or self.posthooks)
+
+
+def _add(hooks: dict, hook: Hook, opcodes) -> None:
+    if opcodes is None:
+        opcodes = INSTRUCTION_BY_OPCODE
+
+    for opcode in opcodes:
+        if isinstance(opcode, Instruction):
+            opcode = opcode.opcode
+        hooks.setdefault(opcode, []).append(hook)
+
+
+def instruction_pc(context: ExecutionContext, instruction: Instruction) -> int:
+    """
+    The pc of the instruction a prehook is called for (context.pc is already past it)
+    """
+    pc = context.pc - 1
+    if PUSH1.opcode <= instruction.opcode <= PUSH32.opcode:
+        pc -= instruction.opcode - PUSH1.opcode + 1
+    return pc
@@ -0,0 +1,140 @@
+"""
+Keccak-256, as used by the SHA3 instruction (the original Keccak padding, not the one
+of the NIST SHA3-256 in hashlib).
+
+The backend is the first one available of:
+  - pycryptodome (Crypto.Hash.keccak)
+  - pysha3 (sha3.keccak_256)
+  - a pure Python implementation, always available but much slower
+
+Every backend hashes bytes-like objects, including memoryviews, without copying them.
+"""
+from functools import lru_cache
+from typing import Callable, Union
+
+# inputs up to this size are memoized, which covers the typical keccak(key . slot) of
+# mapping accesses (64 bytes); larger ones are hashed straight from memory
+MEMO_MAX_INPUT = 128
+MEMO_SIZE = 4096
+
+BytesLike = Union[bytes, bytearray, memoryview]
+
+_ROUND_CONSTANTS = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+
+# rotation offsets, by x + 5 * y
+_ROTATIONS = [
+    0, 1, 62, 28, 27,
+    36, 44, 6, 55, 20,
+    3, 10, 43, 25, 39,
+    41, 45, 15, 21, 8,
+    18, 2, 61, 56, 14,
+]
+
+_MASK_64 = (1 << 64) - 1
+_RATE = 136  # bytes, 1600 - 2 * 256 bits
+
+
+def _rotate(value: int, n: int) -> int:
+    return ((value << n) | (value >> (64 - n))) & _MASK_64 if n else value
+
+
+def _keccak_f(state: list) -> None:
+    for round_constant in _ROUND_CONSTANTS:
+        # theta
+        c = [state[x] ^ state[x + 5] ^ state[x + 10] ^ state[x + 15] ^ state[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rotate(c[(x + 1) % 5], 1) for x in range(5)]
+        for i in range(25):
+            state[i] ^= d[i % 5]
+
+        # rho and pi
+        b = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                b[y + 5 * ((2 * x + 3 * y) % 5)] = _rotate(state[x + 5 * y], _ROTATIONS[x + 5 * y])
+
+        # chi
+        for y in range(0, 25, 5):
+            row = b[y: y + 5]
+            for x in range(5):
+                state[y + x] = row[x] ^ (~row[(x + 1) % 5] & row[(x + 2) % 5])
+
+        # iota
+        state[0] ^= round_constant
+
+
+def keccak256_python(data: BytesLike) -> bytes:
+    data = memoryview(data).cast("B")
+    state = [0] * 25
+
+    num_full_blocks = len(data) // _RATE
+    for start in range(0, num_full_blocks * _RATE, _RATE):
+        block = data[start: start + _RATE]
+        for i in range(_RATE // 8):
+            state[i] ^= int.from_bytes(block[8 * i: 8 * i + 8], "little")
+        _keccak_f(state)
+
+    # the last, padded, block: 0x01 after the data and 0x80 in the last byte
+    last = bytearray(data[num_full_blocks * _RATE:])
+    last.append(0x01)
+    last.extend(bytes(_RATE - len(last)))
+    last[-1] |= 0x80
+    for i in range(_RATE // 8):
+        state[i] ^= int.from_bytes(last[8 * i: 8 * i + 8], "little")
+    _keccak_f(state)
+
+    return b"".join(lane.to_bytes(8, "little") for lane in state[:4])
+
+
+def _available_backends() -> dict[str, Callable[[BytesLike], bytes]]:
+    backends = {}
+    try:
+        from Crypto.Hash import keccak as pycryptodome_keccak
+
+        backends["pycryptodome"] = lambda data: pycryptodome_keccak.new(digest_bits=256, data=data).digest()
+    except ImportError:
+        pass
+
+    try:
+        import sha3 as pysha3
+
+        backends["pysha3"] = lambda data: pysha3.keccak_256(data).digest()
+    except ImportError:
+        pass
+
+    backends["python"] = keccak256_python
+    return backends
+
+
+BACKENDS = _available_backends()
+BACKEND = next(iter(BACKENDS))
+_keccak256 = BACKENDS[BACKEND]
+
+
+def use_backend(name: str) -> None:
+    """switches to another of the available BACKENDS"""
+    global BACKEND, _keccak256
+    if name not in BACKENDS:
+        raise ValueError(f"keccak backend {name!r} is not available, expected one of {list(BACKENDS)}")
+
+    BACKEND, _keccak256 = name, BACKENDS[name]
+    _memoized_keccak256.cache_clear()
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _memoized_keccak256(data: bytes) -> bytes:
+    return _keccak256(data)
+
+
+def keccak256(data: BytesLike) -> bytes:
+    if len(data) <= MEMO_MAX_INPUT:
+        # small enough that making it hashable for the memo costs less than hashing it again
+        return _memoized_keccak256(bytes(data))
+
+    return _keccak256(data)
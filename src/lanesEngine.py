@@ -0,0 +1,411 @@
+"""
+Runs one program over N lanes of inputs at once, SIMD-style.
+
+Every stack item is a NumPy array of shape (N, 4): one 256-bit value per lane, split
+into 4 uint64 limbs, least significant first. Memory is an (N, size) uint8 array, and
+so is calldata, zero-padded to the longest input.
+Control flow, gas and memory size are shared by all the lanes, so each instruction
+is executed once for all of them, and only the values differ:
+
+    results = run_lanes(code, stacks=[[1], [2], [3]])
+
+As soon as the lanes would stop sharing a path (a JUMPI taken by some lanes only, a
+memory offset or jump target that differs between lanes), an instruction not
+supported here, or an error (which is raised per lane), every lane is turned back into
+a regular ExecutionContext and finishes on its own with fastEngine.
+
+NumPy is an optional dependency, only needed by this module.
+"""
+from typing import Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import arithmetic, fastEngine
+from .fastEngine import HALT
+from .analysis import STACK_EFFECTS, Program, analyze
+from .batch import EXECUTION_ERRORS, BatchResult
+from .executionContext import ExecutionContext
+from .gas import G_COPY, GasMeter, memory_expansion_cost, word_cost
+from .generics import *
+from .memory import Memory, ceildiv
+from .stack import Stack
+from .opcodesInstructions import *
+
+# opcode -> arithmetic kernel, computed lane by lane on Python ints
+_PER_LANE_BINARY = {
+    DIV.opcode: arithmetic.div,
+    SDIV.opcode: arithmetic.sdiv,
+    MOD.opcode: arithmetic.mod,
+    SMOD.opcode: arithmetic.smod,
+    SIGNEXTEND.opcode: arithmetic.signextend,
+}
+_PER_LANE_TERNARY = {
+    ADDMOD.opcode: arithmetic.addmod,
+    MULMOD.opcode: arithmetic.mulmod,
+}
+
+MASK_32 = 0xFFFFFFFF
+
+
+def to_limbs(values: Sequence[int]) -> "np.ndarray":
+    return np.array([[(value >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range(4)] for value in values], dtype=np.uint64)
+
+
+def from_limbs(limbs: "np.ndarray") -> list[int]:
+    return [int(a) | int(b) << 64 | int(c) << 128 | int(d) << 192 for a, b, c, d in limbs.tolist()]
+
+
+def _add(a, b):
+    result = np.empty_like(a)
+    carry = np.zeros(len(a), dtype=np.uint64)
+    for i in range(4):
+        partial = a[:, i] + b[:, i]
+        total = partial + carry
+        carry = ((partial < a[:, i]) | (total < partial)).astype(np.uint64)
+        result[:, i] = total
+    return result
+
+
+def _sub(a, b):
+    result = np.empty_like(a)
+    borrow = np.zeros(len(a), dtype=np.uint64)
+    for i in range(4):
+        partial = a[:, i] - b[:, i]
+        total = partial - borrow
+        borrow = ((a[:, i] < b[:, i]) | (partial < borrow)).astype(np.uint64)
+        result[:, i] = total
+    return result
+
+
+def _mul(a, b):
+    # schoolbook multiplication on 8 32-bit halves, the products fit in 64 bits and the
+    # columns accumulate at most 16 32-bit halves each
+    a32 = [(a[:, i // 2] >> np.uint64(32 * (i % 2))) & np.uint64(MASK_32) for i in range(8)]
+    b32 = [(b[:, i // 2] >> np.uint64(32 * (i % 2))) & np.uint64(MASK_32) for i in range(8)]
+    columns = [np.zeros(len(a), dtype=np.uint64) for _ in range(9)]
+    for i in range(8):
+        for j in range(8 - i):
+            product = a32[i] * b32[j]
+            columns[i + j] += product & np.uint64(MASK_32)
+            columns[i + j + 1] += product >> np.uint64(32)
+
+    result = np.empty_like(a)
+    carry = np.zeros(len(a), dtype=np.uint64)
+    halves = []
+    for k in range(8):
+        total = columns[k] + carry
+        halves.append(total & np.uint64(MASK_32))
+        carry = total >> np.uint64(32)
+    for i in range(4):
+        result[:, i] = halves[2 * i] | (halves[2 * i + 1] << np.uint64(32))
+    return result
+
+
+def _to_bytes(value):
+    """(N, 4) limbs -> (N, 32) big-endian bytes"""
+    return np.ascontiguousarray(value[:, ::-1]).astype(">u8").view(np.uint8).reshape(len(value), 32)
+
+
+def _from_bytes(data):
+    """(N, 32) big-endian bytes -> (N, 4) limbs"""
+    return np.ascontiguousarray(data).view(">u8").astype(np.uint64)[:, ::-1].copy()
+
+
+def _uniform(value) -> Optional[int]:
+    """the value if it is the same in every lane, None otherwise"""
+    if not (value == value[0]).all():
+        return None
+    a, b, c, d = value[0].tolist()
+    return a | b << 64 | c << 128 | d << 192
+
+
+class _Diverged(Exception):
+    """the lanes can not go on together, fall back to running each on its own"""
+
+
+class _Lanes:
+    def __init__(self, program: Program, num_lanes: int, stack: list, inputs: Sequence[bytes], gas_limit: int) -> None:
+        self.program = program
+        self.num_lanes = num_lanes
+        self.stack = stack
+        self.inputs = inputs
+        self.memory = np.zeros((num_lanes, 0), dtype=np.uint8)
+        self.calldata = np.zeros((num_lanes, max(map(len, inputs))), dtype=np.uint8)
+        for lane, calldata in zip(self.calldata, inputs):
+            lane[:len(calldata)] = np.frombuffer(calldata, dtype=np.uint8)
+        self.calldata_size = to_limbs([len(calldata) for calldata in inputs])
+        self.expansion_cost = 0
+        self.gas_limit = gas_limit
+        self.gas_left = gas_limit
+        self.pc = 0
+        self.return_data = None
+        self._constants = {}
+
+    def constant(self, value: int):
+        array = self._constants.get(value)
+        if array is None:
+            array = self._constants[value] = np.tile(to_limbs([value]), (self.num_lanes, 1))
+            array.flags.writeable = False
+        return array
+
+    def consume_gas(self, amount: int) -> None:
+        if self.gas_limit:
+            if amount > self.gas_left:
+                raise _Diverged()
+            self.gas_left -= amount
+
+    def uniform_offset(self, value) -> int:
+        offset = _uniform(value)
+        if offset is None or offset > MAX_UINT256:
+            raise _Diverged()
+        return offset
+
+    def expand(self, end: int) -> None:
+        """makes sure memory[:end] is active, charging the expansion"""
+        if end <= self.memory.shape[1]:
+            return
+
+        words = ceildiv(end, 32)
+        cost = memory_expansion_cost(words)
+        self.consume_gas(cost - self.expansion_cost)
+        self.expansion_cost = cost
+        grown = np.zeros((self.num_lanes, 32 * words), dtype=np.uint8)
+        grown[:, :self.memory.shape[1]] = self.memory
+        self.memory = grown
+
+    def calldata_range(self, offset: int, length: int):
+        """calldata[:, offset:offset + length], zero-padded past the end"""
+        chunk = self.calldata[:, offset: offset + length]
+        if chunk.shape[1] == length:
+            return chunk
+        padded = np.zeros((self.num_lanes, length), dtype=np.uint8)
+        padded[:, :chunk.shape[1]] = chunk
+        return padded
+
+    def step(self, pc: int) -> int:
+        """executes the instruction at pc in every lane, returns the next pc"""
+        program = self.program
+        instruction = program.instructions[pc]
+        if instruction is None:
+            raise _Diverged()
+
+        opcode = instruction.opcode
+        stack = self.stack
+        items_read, items_left = STACK_EFFECTS[opcode]
+        if len(stack) < items_read or len(stack) - items_read + items_left > MAX_STACK_DEPTH:
+            raise _Diverged()
+
+        immediate = program.immediates[pc]
+        next_pc = program.next_pcs[pc]
+        if immediate is not None:
+            stack.append(self.constant(immediate))
+        elif opcode == ADD.opcode:
+            stack.append(_add(stack.pop(), stack.pop()))
+        elif opcode == MUL.opcode:
+            stack.append(_mul(stack.pop(), stack.pop()))
+        elif opcode == SUB.opcode:
+            stack.append(_sub(stack.pop(), stack.pop()))
+        elif opcode in _PER_LANE_BINARY:
+            op = _PER_LANE_BINARY[opcode]
+            a, b = from_limbs(stack.pop()), from_limbs(stack.pop())
+            stack.append(to_limbs([op(x, y) for x, y in zip(a, b)]))
+        elif opcode in _PER_LANE_TERNARY:
+            op = _PER_LANE_TERNARY[opcode]
+            a, b, n = from_limbs(stack.pop()), from_limbs(stack.pop()), from_limbs(stack.pop())
+            stack.append(to_limbs([op(x, y, z) for x, y, z in zip(a, b, n)]))
+        elif DUP1.opcode <= opcode <= DUP16.opcode:
+            stack.append(stack[-(opcode - DUP1.opcode + 1)])
+        elif SWAP1.opcode <= opcode <= SWAP16.opcode:
+            n = opcode - SWAP1.opcode + 1
+            stack[-1], stack[-n - 1] = stack[-n - 1], stack[-1]
+        elif opcode == JUMPDEST.opcode:
+            pass
+        elif opcode == PC.opcode:
+            stack.append(self.constant(pc + 1))
+        elif opcode == MSIZE.opcode:
+            stack.append(self.constant(self.memory.shape[1]))
+        elif opcode == MLOAD.opcode:
+            offset = self.uniform_offset(stack[-1])
+            self.expand(offset + 32)
+            stack.pop()
+            stack.append(_from_bytes(self.memory[:, offset: offset + 32]))
+        elif opcode == MSTORE.opcode:
+            offset = self.uniform_offset(stack[-1])
+            self.expand(offset + 32)
+            stack.pop()
+            self.memory[:, offset: offset + 32] = _to_bytes(stack.pop())
+        elif opcode == MSTORE8.opcode:
+            offset = self.uniform_offset(stack[-1])
+            self.expand(offset + 1)
+            stack.pop()
+            self.memory[:, offset] = (stack.pop()[:, 0] & np.uint64(0xFF)).astype(np.uint8)
+        elif opcode == CALLDATALOAD.opcode:
+            offset = _uniform(stack[-1])
+            if offset is not None:
+                stack.pop()
+                stack.append(_from_bytes(self.calldata_range(offset, 32)))
+            else:
+                # reading calldata has no shared effect, each lane can read its own offset
+                words = [
+                    int.from_bytes(calldata[offset: offset + 32].ljust(32, b"\0"), "big")
+                    for calldata, offset in zip(self.inputs, from_limbs(stack.pop()))
+                ]
+                stack.append(to_limbs(words))
+        elif opcode == CALLDATASIZE.opcode:
+            stack.append(self.calldata_size)
+        elif opcode == CALLDATACOPY.opcode:
+            dest_offset, offset, length = (self.uniform_offset(item) for item in stack[-1:-4:-1])
+            if length:
+                copy_cost = word_cost(G_COPY, length)
+                self.consume_gas(copy_cost)
+                try:
+                    self.expand(dest_offset + length)
+                except _Diverged:
+                    self.gas_left += copy_cost
+                    raise
+                self.memory[:, dest_offset: dest_offset + length] = self.calldata_range(offset, length)
+            del stack[-3:]
+        elif opcode == RETURN.opcode:
+            offset, length = self.uniform_offset(stack[-1]), self.uniform_offset(stack[-2])
+            if length:
+                self.expand(offset + length)
+            del stack[-2:]
+            self.return_data = [bytes(lane[offset: offset + length]) if length else bytes() for lane in self.memory]
+            return HALT
+        elif opcode == STOP.opcode:
+            self.return_data = [bytes()] * self.num_lanes
+            return HALT
+        elif opcode == JUMP.opcode:
+            target = self.uniform_offset(stack[-1])
+            if target not in program.jumpdests:
+                raise _Diverged()
+            stack.pop()
+            return target
+        elif opcode == JUMPI.opcode:
+            taken = (stack[-2] != 0).any(axis=1)
+            if taken.all():
+                target = self.uniform_offset(stack[-1])
+                if target not in program.jumpdests:
+                    raise _Diverged()
+                next_pc = target
+            elif taken.any():
+                raise _Diverged()
+            del stack[-2:]
+        else:
+            raise _Diverged()
+
+        return next_pc
+
+    def contexts(self) -> list[ExecutionContext]:
+        """one regular context per lane, in the state the lanes are in"""
+        stacks = [[] for _ in range(self.num_lanes)]
+        for item in self.stack:
+            for lane, value in zip(stacks, from_limbs(item)):
+                lane.append(value)
+
+        contexts = []
+        for i in range(self.num_lanes):
+            gas_meter = None
+            if self.gas_limit:
+                gas_meter = GasMeter(self.gas_limit)
+                gas_meter.gas_left = self.gas_left
+
+            stack = Stack()
+            stack.stack = stacks[i]
+            memory = Memory(gas_meter=gas_meter)
+            memory.memory = bytearray(self.memory[i].tobytes())
+            memory.expansion_cost = self.expansion_cost
+
+            contexts.append(ExecutionContext(
+                code=self.program.code,
+                pc=self.pc,
+                stack=stack,
+                memory=memory,
+                jumpdests=self.program.jumpdests,
+                gas_meter=gas_meter,
+                calldata=self.inputs[i],
+            ))
+        return contexts
+
+
+def run_lanes(code: bytes, inputs: Sequence[bytes] = None, stacks: Sequence[Sequence[int]] = None,
+              gas_limit=0, max_steps=0) -> list[BatchResult]:
+    """
+    Executes code once per lane and returns a BatchResult per lane, like batch.run_batch.
+
+    The lanes are given by their calldata (inputs), their initial stack (stacks, top
+    last, the same height for every lane) or both.
+    """
+    if np is None:
+        raise ImportError("run_lanes requires numpy")
+
+    if inputs is None and stacks is None:
+        raise ValueError("run_lanes needs inputs, stacks or both")
+
+    num_lanes = len(inputs) if inputs is not None else len(stacks)
+    inputs = [bytes(calldata) for calldata in inputs] if inputs is not None else [bytes()] * num_lanes
+    stacks = stacks if stacks is not None else [[]] * num_lanes
+    if len(inputs) != num_lanes or len(stacks) != num_lanes:
+        raise ValueError("inputs and stacks must have one entry per lane")
+    if len({len(stack) for stack in stacks}) > 1:
+        raise ValueError("the initial stacks must have the same height in every lane")
+    if num_lanes == 0:
+        return []
+
+    program = analyze(code)
+    height = len(stacks[0])
+    lanes = _Lanes(
+        program,
+        num_lanes,
+        [to_limbs([stack[i] for stack in stacks]) for i in range(height)],
+        inputs,
+        gas_limit,
+    )
+
+    num_steps = 0
+    pc = 0
+    code_size = len(program)
+    while True:
+        lanes.pc = pc
+        if pc >= code_size:
+            return [BatchResult(index=i, return_data=bytes()) for i in range(num_lanes)]
+
+        block = program.block_at[pc]
+        try:
+            if block is not None:
+                lanes.consume_gas(block.static_gas)
+            try:
+                pc = lanes.step(pc)
+            except _Diverged:
+                if block is not None and gas_limit:
+                    # the fallback charges the block again when it enters it
+                    lanes.gas_left += block.static_gas
+                raise
+        except _Diverged:
+            return _run_each(lanes, max_steps, num_steps)
+
+        num_steps += 1
+        if max_steps > 0 and num_steps > max_steps:
+            lanes.pc = pc
+            return [
+                BatchResult(index=i, return_data=bytes(), error=ExecutionLimitReached(context=context))
+                for i, context in enumerate(lanes.contexts())
+            ]
+
+        if pc == HALT:
+            return [BatchResult(index=i, return_data=return_data) for i, return_data in enumerate(lanes.return_data)]
+
+
+def _run_each(lanes: _Lanes, max_steps: int, steps_taken: int) -> list[BatchResult]:
+    results = []
+    for i, context in enumerate(lanes.contexts()):
+        try:
+            fastEngine.execute(context, lanes.program, max_steps=max_steps, steps_taken=steps_taken)
+        except EXECUTION_ERRORS as error:
+            results.append(BatchResult(index=i, return_data=bytes(), error=error))
+            continue
+        results.append(BatchResult(index=i, return_data=context.return_data))
+    return results
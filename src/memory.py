@@ -1,27 +1,58 @@
 from .stack import MAX_UINT256, MAX_UINT8, InvalidMemoryAccess, InvalidMemoryValue
 from .generics import is_valid_uint256, is_valid_uint8
-
-ZERO_WORD = [0] * 32
+from .gas import GasMeter, memory_expansion_cost
 
 # thanks, https://stackoverflow.com/questions/14822184/is-there-a-ceiling-equivalent-of-operator-in-python
 def ceildiv(a, b):
     return -(a // -b)
 
 class Memory:
-    def __init__(self) -> None:
-        self.memory = []
+    def __init__(self, gas_meter: GasMeter = None) -> None:
+        # always a whole number of 32-byte words
+        self.memory = bytearray()
+
+        # memory_expansion_cost(self.active_words()), kept up to date as memory grows
+        self.expansion_cost = 0
+
+        # when set, every expansion is charged to it before memory actually grows
+        self.gas_meter = gas_meter
+
+        # set while self.memory may be shared with a fork of this memory, or the memory it was forked from
+        self.copy_on_write = False
+
+    def reset(self, gas_meter: GasMeter = None) -> None:
+        """
+        Makes memory empty again (no active words), charging future expansions to gas_meter
+        """
+        if self.copy_on_write:
+            self.memory = bytearray()
+            self.copy_on_write = False
+        else:
+            self.memory.clear()
+        self.expansion_cost = 0
+        self.gas_meter = gas_meter
+
+    def fork(self, gas_meter: GasMeter = None) -> "Memory":
+        """
+        Returns a memory with the same content. Both share the buffer until their first
+        write (or expansion), which copies it first.
+        """
+        child = Memory(gas_meter=gas_meter)
+        child.memory = self.memory
+        child.expansion_cost = self.expansion_cost
+        child.copy_on_write = self.copy_on_write = True
+        return child
 
     def store(self, offset: int, value: int) -> None:
         if offset < 0 or offset >  MAX_UINT256:
             raise InvalidMemoryAccess({"offset": offset})
-    
+
         if value < 0 or value > MAX_UINT8:
             raise InvalidMemoryValue({"offset": offset, "value": value})
-        
-        # expand memory is needed
-        if offset >= len(self.memory):
-            self.memory.extend([0] * (offset - len(self.memory) + 1))
-        
+
+        self._expand_if_needed(offset)
+        if self.copy_on_write:
+            self._copy()
         self.memory[offset] = value
 
     def store_word(self, offset: int, value: int) -> None:
@@ -30,27 +61,62 @@ class Memory:
             raise InvalidMemoryValue({"offset": offset, "value": value})
 
         self._expand_if_needed(offset + 31)
-        for i in range(0, 32):
-            self.memory[offset + 31 - i] = value & (0xFF << (i * 8))
+        if self.copy_on_write:
+            self._copy()
+        self.memory[offset: offset + 32] = value.to_bytes(32, "big")
+
+    def store_range(self, offset: int, data, length: int) -> None:
+        """
+        Writes the bytes-like data at offset, followed by zeros up to length bytes
+        (e.g. for *COPY instructions reading past the end of their source)
+        """
+        _validate_offset(offset)
+        if length == 0:
+            return
+
+        self._expand_if_needed(offset + length - 1)
+        if self.copy_on_write:
+            self._copy()
+        end = offset + len(data)
+        self.memory[offset: end] = data
+        if len(data) < length:
+            self.memory[end: offset + length] = bytes(length - len(data))
 
     def load(self, offset: int) -> int:
         if offset < 0:
             raise InvalidMemoryAccess({"offset": offset})
-        if offset >= len(self.memory):
-            return 0
-        
+
+        self._expand_if_needed(offset)
         return self.memory[offset]
-    
+
     def load_word(self, offset: int) -> int:
-        return int.from_bytes(self.load_range(offset, 32), "big")
+        with self.view(offset, 32) as word:
+            return int.from_bytes(word, "big")
 
 
     def load_range(self, offset: int, length: int) -> bytes:
+        with self.view(offset, length) as data:
+            return bytes(data)
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """
+        Returns a read-only view of memory[offset:offset + length] without copying it,
+        expanding memory first if the range is not active yet.
+
+        Memory can not grow while a view is alive, so release it when done, e.g.:
+
+            with memory.view(offset, length) as data:
+                digest = keccak(data)
+        """
         if offset < 0:
             raise InvalidMemoryAccess({"offset": offset})
 
-        # we could use a slice here, but this lets us gets 0 bytes if we read past the end of concrete memory
-        return bytes(self.load(x) for x in range(offset, offset + length))
+        # reading 0 bytes does not touch memory, wherever the offset is
+        if length == 0:
+            return memoryview(b"")
+
+        self._expand_if_needed(offset + length - 1)
+        return memoryview(self.memory).toreadonly()[offset: offset + length]
 
     def active_words(self) -> int:
         return len(self.memory) // 32
@@ -68,20 +134,201 @@ class Memory:
         if offset < len(self.memory):
             return
 
-        active_words_after = max(self.active_words(), ceildiv(offset + 1, 32))
+        active_words_after = ceildiv(offset + 1, 32)
 
-        self.memory.extend(ZERO_WORD * (active_words_after - self.active_words()))
+        # only the difference with what the already active words cost gets charged
+        expansion_cost_after = memory_expansion_cost(active_words_after)
+        if self.gas_meter is not None:
+            self.gas_meter.consume(expansion_cost_after - self.expansion_cost)
+        self.expansion_cost = expansion_cost_after
+
+        if self.copy_on_write:
+            self._copy()
+        self.memory.extend(bytes(32 * active_words_after - len(self.memory)))
 
         assert len(self.memory) % 32 == 0
 
+    def _copy(self) -> None:
+        self.memory = bytearray(self.memory)
+        self.copy_on_write = False
+
+    def __len__(self) -> int:
+        return len(self.memory)
 
     def __str__(self) -> str:
-        return str(self.memory)
+        return self.memory.hex()
 
     def __repr__(self) -> str:
         return str(self)
-    
+
 
 def _validate_offset(offset: int) -> None:
     if not is_valid_uint256(offset):
         raise InvalidMemoryAccess({"offset": offset})
+
+
+PAGE_SIZE = 4096
+_ZERO_PAGE = bytes(PAGE_SIZE)
+
+
+class PagedMemory:
+    """
+    A Memory that only allocates the 4 KiB pages actually written to, for code touching
+    a few far apart offsets: an MSTORE8 at offset 2**20 makes 2**20 + 32 bytes active
+    (and charges for them) but only allocates one page. Pages that were never written
+    read as zeros.
+
+    Pages never move or grow once allocated, so views of memory stay valid while it
+    expands. Forks share their pages with the memory they were forked from until either
+    of them writes to a page, which then gets copied.
+    """
+
+    def __init__(self, gas_meter: GasMeter = None) -> None:
+        # page index -> bytearray of PAGE_SIZE bytes
+        self.pages = {}
+
+        # indices of the pages shared with a fork, which must be copied before writing to them
+        self.shared = set()
+
+        # number of active bytes, always a whole number of 32-byte words
+        self.size = 0
+
+        self.expansion_cost = 0
+        self.gas_meter = gas_meter
+
+    def reset(self, gas_meter: GasMeter = None) -> None:
+        self.pages.clear()
+        self.shared.clear()
+        self.size = 0
+        self.expansion_cost = 0
+        self.gas_meter = gas_meter
+
+    def fork(self, gas_meter: GasMeter = None) -> "PagedMemory":
+        child = PagedMemory(gas_meter=gas_meter)
+        child.pages = dict(self.pages)
+        child.shared = set(self.pages)
+        self.shared.update(self.pages)
+        child.size = self.size
+        child.expansion_cost = self.expansion_cost
+        return child
+
+    def store(self, offset: int, value: int) -> None:
+        if offset < 0 or offset > MAX_UINT256:
+            raise InvalidMemoryAccess({"offset": offset})
+
+        if value < 0 or value > MAX_UINT8:
+            raise InvalidMemoryValue({"offset": offset, "value": value})
+
+        self._expand_if_needed(offset)
+        self._page(offset // PAGE_SIZE)[offset % PAGE_SIZE] = value
+
+    def store_word(self, offset: int, value: int) -> None:
+        _validate_offset(offset)
+        if not is_valid_uint256(value):
+            raise InvalidMemoryValue({"offset": offset, "value": value})
+
+        self._expand_if_needed(offset + 31)
+        start = offset % PAGE_SIZE
+        if start <= PAGE_SIZE - 32:
+            self._page(offset // PAGE_SIZE)[start: start + 32] = value.to_bytes(32, "big")
+        else:
+            self._write(offset, value.to_bytes(32, "big"))
+
+    def store_range(self, offset: int, data, length: int) -> None:
+        _validate_offset(offset)
+        if length == 0:
+            return
+
+        self._expand_if_needed(offset + length - 1)
+        self._write(offset, data)
+        if len(data) < length:
+            self._write(offset + len(data), bytes(length - len(data)))
+
+    def load(self, offset: int) -> int:
+        if offset < 0:
+            raise InvalidMemoryAccess({"offset": offset})
+
+        self._expand_if_needed(offset)
+        page = self.pages.get(offset // PAGE_SIZE)
+        return page[offset % PAGE_SIZE] if page is not None else 0
+
+    def load_word(self, offset: int) -> int:
+        with self.view(offset, 32) as word:
+            return int.from_bytes(word, "big")
+
+    def load_range(self, offset: int, length: int) -> bytes:
+        with self.view(offset, length) as data:
+            return bytes(data)
+
+    def view(self, offset: int, length: int) -> memoryview:
+        """
+        Same as Memory.view, without copying as long as the range is within a single page
+        """
+        if offset < 0:
+            raise InvalidMemoryAccess({"offset": offset})
+
+        if length == 0:
+            return memoryview(b"")
+
+        self._expand_if_needed(offset + length - 1)
+        start = offset % PAGE_SIZE
+        if start + length > PAGE_SIZE:
+            return memoryview(self._read(offset, length))
+
+        page = self.pages.get(offset // PAGE_SIZE)
+        if page is None:
+            return memoryview(_ZERO_PAGE)[start: start + length]
+        return memoryview(page).toreadonly()[start: start + length]
+
+    def active_words(self) -> int:
+        return self.size // 32
+
+    def _page(self, index: int) -> bytearray:
+        """the page at index, ready to be written to"""
+        page = self.pages.get(index)
+        if page is None:
+            page = self.pages[index] = bytearray(PAGE_SIZE)
+        elif index in self.shared:
+            page = self.pages[index] = bytearray(page)
+            self.shared.discard(index)
+        return page
+
+    def _read(self, offset: int, length: int) -> bytes:
+        data = bytearray()
+        end = offset + length
+        while offset < end:
+            index, start = divmod(offset, PAGE_SIZE)
+            stop = min(PAGE_SIZE, start + end - offset)
+            page = self.pages.get(index)
+            data += page[start: stop] if page is not None else _ZERO_PAGE[start: stop]
+            offset += stop - start
+        return bytes(data)
+
+    def _write(self, offset: int, data: bytes) -> None:
+        written = 0
+        while written < len(data):
+            index, start = divmod(offset + written, PAGE_SIZE)
+            chunk = data[written: written + PAGE_SIZE - start]
+            self._page(index)[start: start + len(chunk)] = chunk
+            written += len(chunk)
+
+    # same as Memory._expand_if_needed, without allocating anything
+    def _expand_if_needed(self, offset: int) -> None:
+        if offset < self.size:
+            return
+
+        active_words_after = ceildiv(offset + 1, 32)
+        expansion_cost_after = memory_expansion_cost(active_words_after)
+        if self.gas_meter is not None:
+            self.gas_meter.consume(expansion_cost_after - self.expansion_cost)
+        self.expansion_cost = expansion_cost_after
+        self.size = 32 * active_words_after
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __str__(self) -> str:
+        return self._read(0, self.size).hex()
+
+    def __repr__(self) -> str:
+        return str(self)
@@ -1,6 +1,11 @@
 from .generics import *
 from .executionContext import ExecutionContext
-from .run import run
+from .arithmetic import int_to_uint, uint_to_int
+from . import arithmetic
+from .gas import (
+    G_CALLSTIPEND, G_COLD_SLOAD, G_COPY, G_EXP_BYTE, G_SHA3_WORD, G_SSTORE_RESET, G_SSTORE_SET, G_WARM_ACCESS, word_cost
+)
+from .keccak import keccak256
 
 from typing import Sequence, Union
 
@@ -50,7 +55,68 @@ def execute_JUMPI(ctx: ExecutionContext) -> None:
 
 def execute_SUB(ctx: ExecutionContext) -> None:
     a, b = ctx.stack.pop(), ctx.stack.pop()
-    ctx.stack.push((a - b) % 2 ** 256)
+    ctx.stack.push(arithmetic.sub(a, b))
+
+
+def _binary(op: callable) -> callable:
+    return lambda ctx: ctx.stack.push(op(ctx.stack.pop(), ctx.stack.pop()))
+
+
+def _ternary(op: callable) -> callable:
+    return lambda ctx: ctx.stack.push(op(ctx.stack.pop(), ctx.stack.pop(), ctx.stack.pop()))
+
+
+def execute_EXP(ctx: ExecutionContext) -> None:
+    a, exponent = ctx.stack.pop(), ctx.stack.pop()
+    ctx.consume_gas(G_EXP_BYTE * arithmetic.exp_byte_size(exponent))
+    ctx.stack.push(arithmetic.exp(a, exponent))
+
+
+def sha3(ctx: ExecutionContext, offset: int, length: int) -> int:
+    """
+    keccak256(memory[offset:offset + length]) as a word, hashed straight from memory
+    """
+    ctx.consume_gas(word_cost(G_SHA3_WORD, length))
+    with ctx.memory.view(offset, length) as data:
+        return int.from_bytes(keccak256(data), "big")
+
+
+def calldatacopy(ctx: ExecutionContext, dest_offset: int, offset: int, length: int) -> None:
+    ctx.consume_gas(word_cost(G_COPY, length))
+    ctx.calldata.copy_to(ctx.memory, dest_offset, offset, length)
+
+
+def sload(ctx: ExecutionContext, slot: int) -> int:
+    storage = ctx.storage
+    value = storage.get(slot)
+    if not storage.access(slot):
+        # STATIC_GAS only covers a warm access
+        ctx.consume_gas(G_COLD_SLOAD - G_WARM_ACCESS)
+    return value
+
+
+def sstore(ctx: ExecutionContext, slot: int, value: int) -> None:
+    """
+    Writes slot, charging its whole cost as per EIP-2200 with the EIP-2929 access costs
+    (gas refunds are not tracked)
+    """
+    gas_meter = ctx.gas_meter
+    if gas_meter is not None and gas_meter.gas_left <= G_CALLSTIPEND:
+        raise OutOfGas({"required": G_CALLSTIPEND + 1, "available": gas_meter.gas_left})
+
+    storage = ctx.storage
+    cost = 0 if storage.access(slot) else G_COLD_SLOAD
+    current = storage.get(slot)
+    if current == value:
+        ctx.consume_gas(cost + G_WARM_ACCESS)
+        return
+
+    if storage.original_value(slot) == current:
+        cost += G_SSTORE_SET if current == 0 else G_SSTORE_RESET
+    else:
+        cost += G_WARM_ACCESS
+    ctx.consume_gas(cost)
+    storage.put(slot, value)
 
 STOP = instruction(
     0x00,
@@ -61,18 +127,46 @@ STOP = instruction(
 ADD = instruction(
     0x01,
     "ADD",
-    (lambda ctx: ctx.stack.push((ctx.stack.pop() + ctx.stack.pop()) % 2 ** 256)),
+    _binary(arithmetic.add),
 )
 MUL = instruction(
     0x02,
     "MUL",
-    (lambda ctx: ctx.stack.push((ctx.stack.pop() * ctx.stack.pop()) % 2 ** 256)),
+    _binary(arithmetic.mul),
 )
 SUB = instruction(
     0x03,
     "SUB",
     execute_SUB,
 )
+DIV = instruction(0x04, "DIV", _binary(arithmetic.div))
+SDIV = instruction(0x05, "SDIV", _binary(arithmetic.sdiv))
+MOD = instruction(0x06, "MOD", _binary(arithmetic.mod))
+SMOD = instruction(0x07, "SMOD", _binary(arithmetic.smod))
+ADDMOD = instruction(0x08, "ADDMOD", _ternary(arithmetic.addmod))
+MULMOD = instruction(0x09, "MULMOD", _ternary(arithmetic.mulmod))
+EXP = instruction(0x0A, "EXP", execute_EXP)
+SIGNEXTEND = instruction(0x0B, "SIGNEXTEND", _binary(arithmetic.signextend))
+SHA3 = instruction(
+    0x20,
+    "SHA3",
+    (lambda ctx: ctx.stack.push(sha3(ctx, ctx.stack.pop(), ctx.stack.pop()))),
+)
+CALLDATALOAD = instruction(
+    0x35,
+    "CALLDATALOAD",
+    (lambda ctx: ctx.stack.push(ctx.calldata.load_word(ctx.stack.pop()))),
+)
+CALLDATASIZE = instruction(
+    0x36,
+    "CALLDATASIZE",
+    (lambda ctx: ctx.stack.push(len(ctx.calldata))),
+)
+CALLDATACOPY = instruction(
+    0x37,
+    "CALLDATACOPY",
+    (lambda ctx: calldatacopy(ctx, ctx.stack.pop(), ctx.stack.pop(), ctx.stack.pop())),
+)
 MLOAD = instruction(
     0x51,
     "MLOAD",
@@ -88,6 +182,16 @@ MSTORE8 = instruction(
     "MSTORE8",
     (lambda ctx: ctx.memory.store(ctx.stack.pop(), ctx.stack.pop() % 256)),
 )
+SLOAD = instruction(
+    0x54,
+    "SLOAD",
+    (lambda ctx: ctx.stack.push(sload(ctx, ctx.stack.pop()))),
+)
+SSTORE = instruction(
+    0x55,
+    "SSTORE",
+    (lambda ctx: sstore(ctx, ctx.stack.pop(), ctx.stack.pop())),
+)
 RETURN = instruction(
     0xF3,
     "RETURN",
@@ -187,6 +291,31 @@ SWAP14 = instruction(0x9D, "SWAP14", lambda ctx: ctx.stack.swap(14))
 SWAP15 = instruction(0x9E, "SWAP15", lambda ctx: ctx.stack.swap(15))
 SWAP16 = instruction(0x9F, "SWAP16", lambda ctx: ctx.stack.swap(16))
 
+# the mnemonic of every opcode of the EVM, including the ones not implemented here
+OPCODE_NAMES = {
+    0x00: "STOP", 0x01: "ADD", 0x02: "MUL", 0x03: "SUB", 0x04: "DIV", 0x05: "SDIV", 0x06: "MOD", 0x07: "SMOD",
+    0x08: "ADDMOD", 0x09: "MULMOD", 0x0A: "EXP", 0x0B: "SIGNEXTEND",
+    0x10: "LT", 0x11: "GT", 0x12: "SLT", 0x13: "SGT", 0x14: "EQ", 0x15: "ISZERO", 0x16: "AND", 0x17: "OR",
+    0x18: "XOR", 0x19: "NOT", 0x1A: "BYTE", 0x1B: "SHL", 0x1C: "SHR", 0x1D: "SAR",
+    0x20: "SHA3",
+    0x30: "ADDRESS", 0x31: "BALANCE", 0x32: "ORIGIN", 0x33: "CALLER", 0x34: "CALLVALUE", 0x35: "CALLDATALOAD",
+    0x36: "CALLDATASIZE", 0x37: "CALLDATACOPY", 0x38: "CODESIZE", 0x39: "CODECOPY", 0x3A: "GASPRICE",
+    0x3B: "EXTCODESIZE", 0x3C: "EXTCODECOPY", 0x3D: "RETURNDATASIZE", 0x3E: "RETURNDATACOPY", 0x3F: "EXTCODEHASH",
+    0x40: "BLOCKHASH", 0x41: "COINBASE", 0x42: "TIMESTAMP", 0x43: "NUMBER", 0x44: "PREVRANDAO", 0x45: "GASLIMIT",
+    0x46: "CHAINID", 0x47: "SELFBALANCE", 0x48: "BASEFEE",
+    0x50: "POP", 0x51: "MLOAD", 0x52: "MSTORE", 0x53: "MSTORE8", 0x54: "SLOAD", 0x55: "SSTORE", 0x56: "JUMP",
+    0x57: "JUMPI", 0x58: "PC", 0x59: "MSIZE", 0x5A: "GAS", 0x5B: "JUMPDEST", 0x5F: "PUSH0",
+    **{0x60 + i: f"PUSH{i + 1}" for i in range(32)},
+    **{0x80 + i: f"DUP{i + 1}" for i in range(16)},
+    **{0x90 + i: f"SWAP{i + 1}" for i in range(16)},
+    **{0xA0 + topics: f"LOG{topics}" for topics in range(5)},
+    0xF0: "CREATE", 0xF1: "CALL", 0xF2: "CALLCODE", 0xF3: "RETURN", 0xF4: "DELEGATECALL", 0xF5: "CREATE2",
+    0xFA: "STATICCALL", 0xFD: "REVERT", 0xFE: "INVALID", 0xFF: "SELFDESTRUCT",
+}
+
+OPCODES_BY_NAME = {name: opcode for opcode, name in OPCODE_NAMES.items()}
+
+
 def decode_opcode(context: ExecutionContext) -> Instruction:
     if context.pc < 0: # or context.pc >= len(context.code):
         raise InvalidCodeOffset({"code": context.code, "pc": context.pc})
@@ -203,22 +332,77 @@ def decode_opcode(context: ExecutionContext) -> Instruction:
     
     return instruction
 
-def assemble(instructions: Sequence[Union[Instruction, int]], print_bin=True) -> bytes:
-    result = bytes()
+def assemble(instructions: Union[str, Sequence[Union[Instruction, int, str]]], print_bin=True) -> bytes:
+    """
+    Builds bytecode from Instructions, ints (emitted as their big-endian bytes) and lines of
+    disassembly text (see disasm), e.g. assemble(disassemble(code)) == code. A str is
+    split into lines.
+    """
+    if isinstance(instructions, str):
+        instructions = instructions.splitlines()
+
+    result = bytearray()
     for item in instructions:
         if isinstance(item, Instruction):
-            result += bytes([item.opcode])
+            result.append(item.opcode)
         elif isinstance(item, int):
             result += int_to_bytes(item)
+        elif isinstance(item, str):
+            _assemble_line(item, result)
         else:
             raise TypeError(f"Unexpected {type(item)} in {instructions}")
 
+    result = bytes(result)
     if print_bin:
         print(result.hex())
 
     return result
 
 
+def _assemble_line(line: str, result: bytearray) -> None:
+    """
+    Appends the bytecode of a disassembly line, "[offset:] MNEMONIC [0xARGUMENT] [# comment]"
+    """
+    text, _, comment = line.partition("#")
+    fields = text.split()
+    if fields and fields[0].endswith(":"):
+        fields = fields[1:]
+    if not fields:
+        return
+
+    mnemonic, arguments = fields[0].upper(), fields[1:]
+    if len(arguments) > 1:
+        raise ValueError(f"too many arguments in {line!r}")
+
+    if mnemonic in ("DATA", "UNKNOWN") or PUSH1.opcode <= OPCODES_BY_NAME.get(mnemonic, 0) <= PUSH32.opcode:
+        if not arguments or not arguments[0].startswith("0x"):
+            raise ValueError(f"expected a 0x argument in {line!r}")
+        digits = arguments[0][2:]
+        argument = bytes.fromhex("0" + digits if len(digits) % 2 else digits)
+    elif arguments:
+        raise ValueError(f"{mnemonic} takes no argument in {line!r}")
+
+    if mnemonic == "DATA":
+        result += argument
+    elif mnemonic == "UNKNOWN":
+        if len(argument) != 1:
+            raise ValueError(f"expected a single byte in {line!r}")
+        result += argument
+    elif mnemonic in OPCODES_BY_NAME:
+        opcode = OPCODES_BY_NAME[mnemonic]
+        result.append(opcode)
+        if PUSH1.opcode <= opcode <= PUSH32.opcode:
+            num_bytes = opcode - PUSH1.opcode + 1
+            if len(argument) > num_bytes:
+                raise ValueError(f"argument too large for {mnemonic} in {line!r}")
+            # a truncated PUSH is the last thing in the code, its argument is as short as it is
+            if "truncated" not in comment:
+                argument = argument.rjust(num_bytes, b"\0")
+            result += argument
+    else:
+        raise ValueError(f"unknown mnemonic {mnemonic} in {line!r}")
+
+
 # thanks, https://stackoverflow.com/questions/21017698/converting-int-to-bytes-in-python-3
 def int_to_bytes(x: int) -> bytes:
     return x.to_bytes(max(1, (x.bit_length() + 7) // 8), "big")
\ No newline at end of file
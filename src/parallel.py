@@ -0,0 +1,292 @@
+"""
+Runs independent (code, calldata) jobs in parallel worker processes.
+
+Jobs are sent to the workers in chunks, referring to their code by hash: the bytecode
+itself is sent to a worker only the first time one of its chunks needs it. Each worker
+keeps its analyzed programs and a pooled context around for its whole lifetime and
+sends back compact (return data, stack, error) tuples per job. With a cache_dir, the
+workers share their analyzed programs through an analysisCache.AnalysisCache there.
+
+    with ParallelRunner(processes=32) as runner:
+        for result in runner.map(jobs):
+            ...
+    print(runner.stats)
+"""
+import multiprocessing
+import queue
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from .analysis import analyze, set_disk_cache
+from .analysisCache import AnalysisCache, code_hash
+from .batch import EXECUTION_ERRORS
+from .executionContext import ContextPool
+from .gas import GasMeter
+from .generics import EVMException, ExecutionLimitReached, WorkerDied
+from .run import ENGINES, execute
+from . import compiler
+
+
+# codes a worker keeps (and the runner remembers having sent to it) before starting over
+MAX_CODES = 1024
+
+# how long to wait for a result before checking that the workers are still alive
+POLL_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class JobResult:
+    # position of the job in the jobs
+    index: int
+    return_data: bytes
+    # the stack when execution stopped (top last), only when the runner has return_stack set
+    stack: Optional[tuple]
+    # None when the execution succeeded
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class WorkerStats:
+    worker_id: int
+    jobs: int
+    # time spent executing jobs, not waiting for them
+    busy_seconds: float
+
+    @property
+    def jobs_per_second(self) -> float:
+        return self.jobs / self.busy_seconds if self.busy_seconds > 0 else 0.0
+
+
+def _run_job(code: bytes, calldata: bytes, pool: ContextPool, engine: str, max_steps: int,
+             gas_limit: int, return_stack: bool) -> tuple:
+    program = analyze(code)
+    gas_meter = GasMeter(gas_limit) if gas_limit > 0 else None
+    context = pool.acquire(code=code, jumpdests=program.jumpdests, gas_meter=gas_meter, calldata=calldata)
+    try:
+        execute(context, program, max_steps=max_steps, engine=engine)
+    except EXECUTION_ERRORS as error:
+        if isinstance(error, (EVMException, ExecutionLimitReached)):
+            # the context stays in the worker, only the error itself is sent back
+            error.context = None
+        return bytes(), None, error
+
+    stack = tuple(context.stack.stack) if return_stack else None
+    pool.release(context)
+    return context.return_data, stack, None
+
+
+def _worker(worker_id: int, tasks, results, engine: str, max_steps: int, gas_limit: int, return_stack: bool,
+            cache_dir: Optional[str]) -> None:
+    if cache_dir is not None:
+        set_disk_cache(AnalysisCache(cache_dir))
+
+    codes = {}
+    pool = ContextPool(max_size=1)
+    jobs, busy_seconds = 0, 0.0
+
+    while True:
+        message = tasks.get()
+        if message is None:
+            results.put(("stats", WorkerStats(worker_id=worker_id, jobs=jobs, busy_seconds=busy_seconds)))
+            return
+
+        if message[0] == "forget":
+            codes.clear()
+            continue
+
+        if message[0] == "code":
+            _, digest, code = message
+            codes[digest] = code
+            analyze(code)
+            if engine == "compiled":
+                compiler.compiled(code)
+            continue
+
+        _, chunk_id, chunk = message
+        start = time.perf_counter()
+        try:
+            outcomes = [
+                _run_job(codes[digest], calldata, pool, engine, max_steps, gas_limit, return_stack)
+                for digest, calldata in chunk
+            ]
+        except Exception as error:
+            results.put(("failed", worker_id, chunk_id, error))
+            continue
+        busy_seconds += time.perf_counter() - start
+        jobs += len(chunk)
+        results.put(("done", worker_id, chunk_id, outcomes))
+
+
+class ParallelRunner:
+    """
+    A set of worker processes executing (code, calldata) jobs, see the module docstring.
+
+    processes=None starts one worker per CPU. Once the runner is closed, stats holds the
+    throughput of every worker that did not die. map() raises WorkerDied when a worker
+    died, as the chunks it was given will never come back.
+    """
+
+    def __init__(self, processes: Optional[int] = None, engine="fast", max_steps=0, gas_limit=0,
+                 return_stack=False, chunksize=64, cache_dir: Optional[str] = None) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+
+        self.chunksize = chunksize
+        self.stats: list[WorkerStats] = []
+        self._hashes = {}
+        self._results = multiprocessing.Queue()
+        self._tasks = []
+        self._sent = []
+        self._processes = []
+
+        for worker_id in range(processes or multiprocessing.cpu_count()):
+            tasks = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(worker_id, tasks, self._results, engine, max_steps, gas_limit, return_stack, cache_dir),
+                daemon=True,
+            )
+            process.start()
+            self._tasks.append(tasks)
+            self._sent.append(set())
+            self._processes.append(process)
+
+        # chunks sent to each worker that did not come back yet
+        self._in_flight = [0] * len(self._processes)
+        self._next_chunk_id = 0
+
+    def _hash(self, code: bytes) -> bytes:
+        digest = self._hashes.get(code)
+        if digest is None:
+            if len(self._hashes) >= MAX_CODES:
+                self._hashes.clear()
+            digest = self._hashes[code] = code_hash(code)
+        return digest
+
+    def _send(self, chunk_id: int, jobs: list) -> None:
+        # the least busy worker gets the chunk
+        worker_id = min(range(len(self._processes)), key=self._in_flight.__getitem__)
+        tasks, sent = self._tasks[worker_id], self._sent[worker_id]
+
+        chunk = []
+        for code, calldata in jobs:
+            digest = self._hash(code)
+            if digest not in sent:
+                if len(sent) >= MAX_CODES:
+                    # the worker handles its tasks in order, the chunks already sent keep their codes
+                    tasks.put(("forget",))
+                    sent.clear()
+                tasks.put(("code", digest, code))
+                sent.add(digest)
+            chunk.append((digest, calldata))
+
+        tasks.put(("chunk", chunk_id, chunk))
+        self._in_flight[worker_id] += 1
+
+    def _get_result(self) -> tuple:
+        while True:
+            try:
+                return self._results.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                # a dead worker never sends back the chunks it was given
+                for worker_id, process in enumerate(self._processes):
+                    if not process.is_alive():
+                        raise WorkerDied({"worker_id": worker_id, "exitcode": process.exitcode})
+
+    def _receive(self, first_chunk_id: int) -> tuple:
+        """
+        Returns the (chunk_id, outcomes) of the next chunk of the map() call whose first
+        chunk is first_chunk_id, dropping the chunks left over from earlier calls
+        """
+        while True:
+            status, worker_id, chunk_id, payload = self._get_result()
+            self._in_flight[worker_id] -= 1
+            if chunk_id < first_chunk_id:
+                continue
+            if status == "failed":
+                raise payload
+            return chunk_id, payload
+
+    def map(self, jobs: Iterable[tuple[bytes, bytes]]) -> Iterator[JobResult]:
+        """
+        Executes every (code, calldata) job, yielding a JobResult per job in the order of
+        jobs. At most two chunks per worker are in flight, so jobs can be any iterable,
+        including one that is too large to fit in memory.
+        """
+        max_in_flight = 2 * len(self._processes)
+        pending = {}
+        # chunk ids keep counting across calls, so that results of an earlier map() that was
+        # not consumed until the end can be told apart and dropped
+        first_chunk_id = next_result_chunk_id = self._next_chunk_id
+        index = 0
+
+        jobs = iter(jobs)
+        exhausted = False
+        while True:
+            while not exhausted and self._next_chunk_id - next_result_chunk_id - len(pending) < max_in_flight:
+                chunk = [(bytes(code), bytes(calldata)) for code, calldata in _take(jobs, self.chunksize)]
+                if not chunk:
+                    exhausted = True
+                    break
+                self._send(self._next_chunk_id, chunk)
+                self._next_chunk_id += 1
+
+            if next_result_chunk_id == self._next_chunk_id:
+                return
+
+            chunk_id, outcomes = self._receive(first_chunk_id)
+            pending[chunk_id] = outcomes
+
+            # chunks come back in any order, results are yielded in the order of jobs
+            while next_result_chunk_id in pending:
+                for return_data, stack, error in pending.pop(next_result_chunk_id):
+                    yield JobResult(index=index, return_data=return_data, stack=stack, error=error)
+                    index += 1
+                next_result_chunk_id += 1
+
+    def close(self) -> None:
+        if not self._processes:
+            return
+
+        for tasks in self._tasks:
+            tasks.put(None)
+
+        stats = []
+        while len(stats) < len(self._processes):
+            try:
+                message = self._results.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                reported = {worker_stats.worker_id for worker_stats in stats}
+                if not any(process.is_alive() for worker_id, process in enumerate(self._processes)
+                           if worker_id not in reported):
+                    # the workers that did not report died, there is nothing left to wait for
+                    break
+                continue
+            if message[0] == "stats":
+                stats.append(message[1])
+
+        for process in self._processes:
+            process.join()
+
+        self.stats = sorted(stats, key=lambda worker_stats: worker_stats.worker_id)
+        self._processes = []
+
+    def __enter__(self) -> "ParallelRunner":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _take(iterator: Iterator, n: int) -> list:
+    chunk = []
+    for item in iterator:
+        chunk.append(item)
+        if len(chunk) == n:
+            break
+    return chunk
@@ -0,0 +1,127 @@
+"""
+Counts and times the instructions of executions, per opcode, per pc and per basic block.
+
+    profiler = Profiler()
+    run(code, engine="fast", hooks=profiler.hooks)
+    print(profiler.report())
+    profiler.write_collapsed("profile.folded")  # for flamegraph.pl / speedscope
+
+Times are wall-clock time between the pre and the post hook of each instruction, so
+they include the cost of dispatching to the hooked handler, but not the hooks of other
+instructions. A profiler accumulates over every run it is used with, as long as they
+all run the same code.
+"""
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from .analysis import analyze
+from .executionContext import ExecutionContext
+from .hooks import Hooks, instruction_pc
+from .opcodesInstructions import Instruction
+
+
+@dataclass
+class ProfileEntry:
+    count: int = 0
+    total_ns: int = 0
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.count if self.count else 0.0
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.code: Optional[bytes] = None
+        # by pc, the instruction there and its entry
+        self.by_pc: dict[int, tuple[Instruction, ProfileEntry]] = {}
+
+        self.hooks = Hooks()
+        self.hooks.add_prehook(self._before)
+        self.hooks.add_posthook(self._after)
+
+        self._pc = 0
+        self._start = 0
+
+    def _before(self, context: ExecutionContext, instruction: Instruction) -> None:
+        if self.code is None:
+            self.code = bytes(context.code)
+        self._pc = instruction_pc(context, instruction)
+        self._start = time.perf_counter_ns()
+
+    def _after(self, context: ExecutionContext, instruction: Instruction) -> None:
+        elapsed = time.perf_counter_ns() - self._start
+        profiled = self.by_pc.get(self._pc)
+        if profiled is None:
+            profiled = self.by_pc[self._pc] = (instruction, ProfileEntry())
+
+        entry = profiled[1]
+        entry.count += 1
+        entry.total_ns += elapsed
+
+    def by_opcode(self) -> dict[str, ProfileEntry]:
+        """entries by instruction name"""
+        result = {}
+        for instruction, entry in self.by_pc.values():
+            total = result.setdefault(instruction.name, ProfileEntry())
+            total.count += entry.count
+            total.total_ns += entry.total_ns
+        return result
+
+    def _block_starts(self) -> dict[int, int]:
+        """the start pc of the basic block of every pc"""
+        block_starts = {}
+        if self.code is not None:
+            for block in analyze(self.code).blocks:
+                for pc in block.pcs:
+                    block_starts[pc] = block.start
+        return block_starts
+
+    def by_block(self) -> dict[int, ProfileEntry]:
+        """entries by start pc of the basic block the instructions belong to"""
+        block_start = self._block_starts()
+        result = {}
+        for pc, (_, entry) in self.by_pc.items():
+            total = result.setdefault(block_start.get(pc, pc), ProfileEntry())
+            total.count += entry.count
+            total.total_ns += entry.total_ns
+        return result
+
+    def report(self, limit=20) -> str:
+        """
+        A text report of the opcodes, pcs and blocks taking the most time, limit lines each
+        """
+        total_ns = sum(entry.total_ns for _, entry in self.by_pc.values()) or 1
+        lines = []
+
+        def section(title: str, rows: list) -> None:
+            lines.append(f"{title:<24} {'count':>10} {'total ms':>10} {'mean ns':>10} {'%':>6}")
+            rows.sort(key=lambda row: row[1].total_ns, reverse=True)
+            for label, entry in rows[:limit]:
+                lines.append(
+                    f"{label:<24} {entry.count:>10} {entry.total_ns / 1e6:>10.3f} "
+                    f"{entry.mean_ns:>10.0f} {100 * entry.total_ns / total_ns:>6.1f}"
+                )
+            lines.append("")
+
+        section("opcode", list(self.by_opcode().items()))
+        section("pc", [(f"{pc:#06x} {instruction}", entry) for pc, (instruction, entry) in self.by_pc.items()])
+        section("block", [(f"{start:#06x}", entry) for start, entry in self.by_block().items()])
+        return "\n".join(lines)
+
+    def collapsed(self) -> list[str]:
+        """
+        The profile as collapsed stacks ("block;instruction nanoseconds" lines), the input
+        format of flamegraph.pl and speedscope
+        """
+        block_of = self._block_starts()
+        return [
+            f"block_{block_of.get(pc, pc):#06x};{instruction}_{pc:#06x} {entry.total_ns}"
+            for pc, (instruction, entry) in sorted(self.by_pc.items())
+        ]
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w") as file:
+            for line in self.collapsed():
+                file.write(line + "\n")
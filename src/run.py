@@ -1,23 +1,203 @@
-from dataclasses import dataclass
+import asyncio
+from contextlib import contextmanager
 
-from .executionContext import ExecutionContext
-from .opcodesInstructions import decode_opcode
+from .analysis import Program, analyze
+from .executionContext import ContextPool, ExecutionContext
+from .memory import PagedMemory
+from .gas import GasMeter
+from .hooks import Hook, Hooks
+from .generics import ExecutionLimitReached
+from .opcodesInstructions import decode_opcode, UnknownOpcode
+from .storage import Storage
+from . import compiler, fastEngine
 
-@dataclass
-class ExecutionLimitReached(Exception):
-    context: ExecutionContext
+ENGINES = ("reference", "fast", "compiled")
 
-def run(code: bytes, verbose=False, max_steps=0) -> None:
+def run(code: bytes, verbose=False, max_steps=0, engine="reference", gas_limit=0, pool: ContextPool = None, calldata=bytes(),
+        hooks: Hooks = None, prehook: Hook = None, storage: Storage = None, paged_memory=False) -> bytes:
     """
     Executes code in a fresh context.
+
+    When gas_limit is set, execution is metered and OutOfGas is raised once it is
+    exhausted: the static gas of each basic block is charged when entering it, memory
+    expansion as memory grows and other dynamic costs by the instructions themselves.
+
+    engine="reference" steps through Instruction.execute, engine="fast" dispatches
+    through the handler table in fastEngine and engine="compiled" runs basic blocks
+    compiled to Python functions by compiler (verbose output is only supported by
+    the reference engine).
+
+    When pool is set, the context is taken from it (reset) and given back once the run
+    is over, instead of allocating a new stack and memory for every run.
+    paged_memory runs with a PagedMemory, which only allocates the parts of memory that
+    are written to (with a pool, the pool's paged_memory setting must match).
+    To run the same code over many calldata inputs, see batch.run_batch, and to run it
+    from a coroutine without blocking the event loop, see run_async.
+
+    hooks are run around the instructions they are registered for by the reference and
+    fast engines (see hooks.Hooks), prehook(context, instruction) is a shorthand for a
+    prehook run before every instruction.
+
+    Each run is a transaction on storage (a fresh, empty one by default): when it raises,
+    every write it made is undone, and when it completes, its writes are kept and all
+    slots become cold again.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+
+    if engine != "reference" and verbose:
+        raise ValueError("verbose output is only supported by the reference engine")
+
+    if prehook is not None:
+        hooks = hooks.copy() if hooks is not None else Hooks()
+        hooks.add_prehook(prehook)
+
+    if engine == "compiled" and hooks:
+        raise ValueError("hooks are not supported by the compiled engine")
+
+    _check_pool(pool, paged_memory)
+    program = analyze(code)
+    gas_meter = GasMeter(gas_limit) if gas_limit > 0 else None
+    storage = storage if storage is not None else Storage()
+
+    if pool is None:
+        context = ExecutionContext(code=code, memory=_memory(paged_memory, gas_meter), jumpdests=program.jumpdests,
+                                   gas_meter=gas_meter, calldata=calldata, storage=storage)
+        with _transaction(storage):
+            execute(context, program, verbose=verbose, max_steps=max_steps, engine=engine, hooks=hooks)
+        return context.return_data
+
+    with pool.context(code=code, jumpdests=program.jumpdests, gas_meter=gas_meter, calldata=calldata,
+                      storage=storage) as context:
+        with _transaction(storage):
+            execute(context, program, verbose=verbose, max_steps=max_steps, engine=engine, hooks=hooks)
+        return context.return_data
+
+
+async def run_async(code: bytes, yield_every=1000, max_steps=0, engine="fast", gas_limit=0,
+                    pool: ContextPool = None, calldata=bytes(), timeout: float = None, storage: Storage = None,
+                    paged_memory=False) -> bytes:
+    """
+    Same as run, but gives control back to the event loop every yield_every instructions
+    or so, so that long executions do not stall the other tasks.
+
+    Cancelling the task and timeout (in seconds, raising TimeoutError) take effect at
+    those yield points. A context from pool is only given back when the run completes.
     """
-    context = ExecutionContext(code=code)
+    if engine not in ENGINES:
+        raise ValueError(f"unknown engine {engine!r}, expected one of {ENGINES}")
+
+    if yield_every <= 0:
+        raise ValueError(f"yield_every must be positive, got {yield_every}")
+
+    _check_pool(pool, paged_memory)
+    program = analyze(code)
+    gas_meter = GasMeter(gas_limit) if gas_limit > 0 else None
+    storage = storage if storage is not None else Storage()
+    if pool is None:
+        context = ExecutionContext(code=code, memory=_memory(paged_memory, gas_meter), jumpdests=program.jumpdests,
+                                   gas_meter=gas_meter, calldata=calldata, storage=storage)
+    else:
+        context = pool.acquire(code=code, jumpdests=program.jumpdests, gas_meter=gas_meter, calldata=calldata,
+                               storage=storage)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout is not None else None
+
+    with _transaction(storage):
+        # the engines raise ExecutionLimitReached once they executed one step more than their
+        # max_steps, with context.pc set to where execution can be resumed
+        steps_left = max_steps
+        while True:
+            last_slice = max_steps > 0 and steps_left <= yield_every + 1
+            try:
+                execute(context, program, max_steps=steps_left if last_slice else yield_every, engine=engine)
+                break
+            except ExecutionLimitReached:
+                if last_slice:
+                    raise
+                if context.stopped:
+                    # the step over the slice's limit was the one stopping
+                    break
+
+            steps_left -= yield_every + 1
+            await asyncio.sleep(0)
+            if deadline is not None and loop.time() >= deadline:
+                raise TimeoutError(f"execution did not complete within {timeout} seconds")
+
+    if pool is not None:
+        pool.release(context)
+
+    return context.return_data
+
+
+def execute(context: ExecutionContext, program: Program, verbose=False, max_steps=0, engine="reference",
+            hooks: Hooks = None) -> None:
+    """
+    Runs an already set up context (e.g. one from a ContextPool) with the given engine.
+    """
+    if engine == "fast":
+        fastEngine.execute(context, program, max_steps=max_steps, hooks=hooks)
+    elif engine == "compiled":
+        compiler.execute(context, compiler.compiled(program.code), max_steps=max_steps)
+    elif hooks:
+        _execute_reference_hooked(context, program, hooks, verbose=verbose, max_steps=max_steps)
+    else:
+        _execute_reference(context, program, verbose=verbose, max_steps=max_steps)
+
+    if verbose:
+        print(f"Output: 0x{context.return_data.hex()}")
+
+
+def _check_pool(pool: ContextPool, paged_memory: bool) -> None:
+    if pool is not None and pool.paged_memory != paged_memory:
+        raise ValueError(f"paged_memory={paged_memory} does not match the pool's paged_memory={pool.paged_memory}")
+
+
+def _memory(paged_memory: bool, gas_meter: GasMeter):
+    # None lets ExecutionContext create its default Memory
+    return PagedMemory(gas_meter=gas_meter) if paged_memory else None
+
+
+@contextmanager
+def _transaction(storage: Storage):
+    snapshot = storage.snapshot()
+    try:
+        yield
+    except BaseException:
+        storage.restore(snapshot)
+        raise
+    storage.commit(snapshot)
+
+
+def _execute_reference(context: ExecutionContext, program: Program, verbose=False, max_steps=0) -> None:
+    code = program.code
+    instructions, immediates, next_pcs = program.instructions, program.immediates, program.next_pcs
+    code_size = len(program)
+    gas_meter = context.gas_meter
+    block_gas = program.block_gas if gas_meter is not None else None
     num_steps = 0
 
     while not context.stopped:
         pc_before = context.pc
-        instruction = decode_opcode(context)
-        instruction.execute(context)
+        if 0 <= pc_before < code_size:
+            if block_gas is not None and block_gas[pc_before]:
+                gas_meter.consume(block_gas[pc_before])
+
+            instruction = instructions[pc_before]
+            context.pc = next_pcs[pc_before]
+            if instruction is None:
+                raise UnknownOpcode({"opcode": code[pc_before]})
+
+            immediate = immediates[pc_before]
+            if immediate is None:
+                instruction.execute(context)
+            else:
+                context.stack.push(immediate)
+        else:
+            # negative offsets are invalid, offsets past the end of the code are STOP
+            instruction = decode_opcode(context)
+            instruction.execute(context)
 
         num_steps += 1
         if max_steps > 0 and num_steps > max_steps:
@@ -28,7 +208,52 @@ def run(code: bytes, verbose=False, max_steps=0) -> None:
             print(context)
             print()
 
-    if verbose:
-        print(f"Output: 0x{context.returndata.hex()}")
 
-    return context.returndata
\ No newline at end of file
+def _execute_reference_hooked(context: ExecutionContext, program: Program, hooks: Hooks, verbose=False, max_steps=0) -> None:
+    """
+    _execute_reference, running hooks around the instructions they are registered for
+    """
+    code = program.code
+    instructions, immediates, next_pcs = program.instructions, program.immediates, program.next_pcs
+    code_size = len(program)
+    gas_meter = context.gas_meter
+    block_gas = program.block_gas if gas_meter is not None else None
+    prehooks, posthooks = hooks.prehooks, hooks.posthooks
+    num_steps = 0
+
+    while not context.stopped:
+        pc_before = context.pc
+        if 0 <= pc_before < code_size:
+            if block_gas is not None and block_gas[pc_before]:
+                gas_meter.consume(block_gas[pc_before])
+
+            instruction = instructions[pc_before]
+            context.pc = next_pcs[pc_before]
+            if instruction is None:
+                raise UnknownOpcode({"opcode": code[pc_before]})
+
+            for hook in prehooks.get(instruction.opcode, ()):
+                hook(context, instruction)
+
+            immediate = immediates[pc_before]
+            if immediate is None:
+                instruction.execute(context)
+            else:
+                context.stack.push(immediate)
+
+            for hook in posthooks.get(instruction.opcode, ()):
+                hook(context, instruction)
+        else:
+            # negative offsets are invalid, offsets past the end of the code are STOP
+            instruction = decode_opcode(context)
+            instruction.execute(context)
+
+        num_steps += 1
+        if max_steps > 0 and num_steps > max_steps:
+            raise ExecutionLimitReached(context=context)
+
+        if verbose:
+            print(f"{instruction} @ pc={pc_before}")
+            print(context)
+            print()
+
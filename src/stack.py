@@ -1,35 +1,44 @@
 from .generics import *
 
 class Stack:
-    def __init__(self, max_depth=1024) -> None:
+    """
+    The checked stack used by Instruction.execute.
+
+    self.stack is the backing list of live items (top of the stack last). Engines that
+    verified the stack height requirements of a basic block ahead of time (see
+    analysis.BasicBlock) append to and pop from it directly, without any check.
+    """
+    __slots__ = ("stack", "max_depth")
+
+    def __init__(self, max_depth=MAX_STACK_DEPTH) -> None:
         self.stack = []
         self.max_depth = max_depth
 
     def push(self, item: int) -> None:
-        if item < 0 or MAX_UINT256:
+        if item < 0 or item > MAX_UINT256:
             raise InvalidStackItem({"item": item})
-        
-        if (len(self.stack) + 1 > self.max_depth):
+
+        if len(self.stack) >= self.max_depth:
             raise StackOverFlow()
-        
+
         self.stack.append(item)
 
     def pop(self) -> int:
-        if len(self.stack) == 0:
+        if not self.stack:
             raise StackUnderFlow()
-        
+
         return self.stack.pop()
-    
+
     def peek(self, i: int) -> int:
         """
         Returns a stack element without popping it.
         peek(0) = top element of stack , peek(1) = one after that, and so on...
         """
-        if len(self.stack) < i:
+        if len(self.stack) <= i:
             raise StackUnderFlow()
-    
+
         return self.stack[-(i+1)]
-    
+
     def swap(self, i: int) -> None:
         """
         Swaps the top of the stack with the i+1'th element
@@ -37,13 +46,23 @@ class Stack:
         if i == 0:
             return
 
-        if len(self.stack) < i:
+        if len(self.stack) <= i:
             raise StackUnderFlow()
 
-        self.stack[-1], self.stack[-(i+1)] = self.stack[-(i+1)], self.stack[-1]
+        stack = self.stack
+        stack[-1], stack[-(i+1)] = stack[-(i+1)], stack[-1]
+
+    def reset(self) -> None:
+        """
+        Empties the stack, keeping the backing list so it can be reused
+        """
+        self.stack.clear()
+
+    def __len__(self) -> int:
+        return len(self.stack)
 
     def __str__(self) -> str:
         return str(self.stack)
 
     def __repr__(self) -> str:
-        return str(self)
\ No newline at end of file
+        return str(self)
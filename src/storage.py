@@ -0,0 +1,158 @@
+"""
+The persistent storage of the executing account, as read and written by SLOAD / SSTORE.
+"""
+from .generics import InvalidStorageSlot, InvalidStorageValue, is_valid_uint256
+
+# journal entry markers: the slot had no value before the write / the slot was cold /
+# the original value of the slot was recorded
+_ABSENT = object()
+_WARMED = object()
+_ORIGINAL = object()
+
+
+class Storage:
+    """
+    Slots live in a plain dict (slots that were never written read as 0). Every change
+    (a write, or a slot becoming warm) is appended to an undo journal, so that going back
+    to a snapshot only undoes the changes made since, instead of copying the whole map:
+
+        snapshot = storage.snapshot()
+        try:
+            ...
+        except Exception:
+            storage.restore(snapshot)
+            raise
+
+    Snapshots nest (e.g. one per call frame), restoring one discards the ones taken
+    after it. commit(snapshot) ends the transaction started at snapshot: it keeps the
+    current values, forgets the journal since snapshot, makes the slots accessed since
+    cold again (EIP-2929) and forgets their original values (EIP-2200).
+
+    fork() layers a new Storage on top of this one, e.g. for a speculative execution:
+    slots the fork did not write are read from its parent, so forking costs nothing
+    whatever the size of the parent. The parent must not be written to while a fork is
+    in use. To keep what the fork wrote, merge() it into its parent, otherwise simply
+    drop it.
+    """
+    __slots__ = ("slots", "journal", "warm_slots", "original_values", "parent")
+
+    def __init__(self, slots: dict = None, parent: "Storage" = None) -> None:
+        # the slots written to this storage, shadowing the ones of parent
+        self.slots = dict(slots) if slots is not None else {}
+        self.parent = parent
+        # (slot, previous value or _ABSENT) for writes, (slot, _WARMED) for accesses and
+        # (slot, _ORIGINAL) when original_values[slot] is recorded, oldest first
+        self.journal = []
+        # slots accessed during the current transaction
+        self.warm_slots = set()
+        # values of the slots written during the current transaction, as they were before
+        self.original_values = {}
+
+    def get(self, slot: int) -> int:
+        if not is_valid_uint256(slot):
+            raise InvalidStorageSlot(slot)
+
+        return self._read(slot)
+
+    def _read(self, slot: int) -> int:
+        storage = self
+        while storage is not None:
+            value = storage.slots.get(slot)
+            if value is not None:
+                return value
+            storage = storage.parent
+        return 0
+
+    def put(self, slot: int, value: int) -> None:
+        if not is_valid_uint256(slot):
+            raise InvalidStorageSlot(slot)
+
+        if not is_valid_uint256(value):
+            raise InvalidStorageValue(value)
+
+        slots = self.slots
+        if slot not in self.original_values:
+            self.original_values[slot] = self.original_value(slot)
+            self.journal.append((slot, _ORIGINAL))
+        self.journal.append((slot, slots.get(slot, _ABSENT)))
+        slots[slot] = value
+
+    def original_value(self, slot: int) -> int:
+        """
+        The value slot had at the start of the transaction (EIP-2200)
+        """
+        original = self.original_values.get(slot)
+        if original is not None:
+            return original
+        return self.parent.original_value(slot) if self.parent is not None else self._read(slot)
+
+    def access(self, slot: int) -> bool:
+        """
+        Marks slot as warm, returns whether it already was (EIP-2929)
+        """
+        storage = self
+        while storage is not None:
+            if slot in storage.warm_slots:
+                return True
+            storage = storage.parent
+
+        self.warm_slots.add(slot)
+        self.journal.append((slot, _WARMED))
+        return False
+
+    def snapshot(self) -> int:
+        return len(self.journal)
+
+    def restore(self, snapshot: int) -> None:
+        """
+        Undoes every change made since snapshot was taken
+        """
+        journal, slots = self.journal, self.slots
+        while len(journal) > snapshot:
+            slot, previous = journal.pop()
+            if previous is _WARMED:
+                self.warm_slots.discard(slot)
+            elif previous is _ORIGINAL:
+                del self.original_values[slot]
+            elif previous is _ABSENT:
+                del slots[slot]
+            else:
+                slots[slot] = previous
+
+    def fork(self) -> "Storage":
+        return Storage(parent=self)
+
+    def merge(self) -> None:
+        """
+        Applies the writes and accesses of this fork to its parent, through the parent's
+        journal so that they can still be undone there.
+        """
+        parent = self.parent
+        for slot in self.warm_slots:
+            parent.access(slot)
+        for slot, value in self.slots.items():
+            parent.put(slot, value)
+
+        self.slots = {}
+        self.commit()
+
+    def commit(self, snapshot: int = 0) -> None:
+        """
+        Keeps every change made since snapshot was taken, see the class docstring
+        """
+        journal = self.journal
+        while len(journal) > snapshot:
+            slot, previous = journal.pop()
+            if previous is _WARMED:
+                self.warm_slots.discard(slot)
+            elif previous is _ORIGINAL:
+                del self.original_values[slot]
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __str__(self) -> str:
+        return str(self.slots)
+
+    def __repr__(self) -> str:
+        return str(self)
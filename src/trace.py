@@ -0,0 +1,277 @@
+"""
+Records execution traces as compact binary records, and reads them back.
+
+    with TraceRecorder.to_file("trace.bin") as recorder:
+        run(code, engine="fast", gas_limit=gas_limit, hooks=recorder.hooks)
+
+    for line in to_eip3155(read_trace("trace.bin")):
+        print(line)
+
+Each executed instruction is one record (see RECORD), followed by the values it left on
+the stack (32 bytes each). The full stack is never written: the reader rebuilds it
+from these deltas. Records go either to a buffered file, or to a ring buffer keeping
+only the last ring_size of them.
+
+Gas is charged per basic block by the engines; the recorder reports the gas of each
+instruction as if it was charged one instruction at a time (its static gas plus
+whatever it consumed while executing), which is what EIP-3155 traces show.
+"""
+import json
+import struct
+from collections import deque
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+from .analysis import STACK_EFFECTS
+from .executionContext import ExecutionContext
+from .gas import STATIC_GAS
+from .hooks import Hooks, instruction_pc
+from .opcodesInstructions import INSTRUCTION_BY_OPCODE, Instruction, CALLDATACOPY, DUP1, DUP16, MSTORE, MSTORE8
+
+MAGIC = b"PYEVMTR1"
+
+# pc, opcode, flags, gas before, gas cost, items popped, items pushed, memory size after,
+# offset and length of the memory written (length 0 when nothing was written)
+RECORD = struct.Struct("<IBBQQBBQQI")
+
+# the instruction raised instead of completing, it popped and pushed nothing
+FLAG_FAILED = 1
+
+# values that do not fit their RECORD field (e.g. a gas limit over 2**64) are clamped
+_MAX_UINT32 = 2 ** 32 - 1
+_MAX_UINT64 = 2 ** 64 - 1
+
+# where an instruction writes to memory, from the stack before it executes (top last), by opcode
+MEMORY_WRITES = {
+    CALLDATACOPY.opcode: lambda stack: (stack[-1], stack[-3]),
+    MSTORE.opcode: lambda stack: (stack[-1], 32),
+    MSTORE8.opcode: lambda stack: (stack[-1], 1),
+}
+
+# DUPn only adds an item on top, record it as such rather than as n items replaced by n + 1
+_POPPED = {
+    opcode: 0 if DUP1.opcode <= opcode <= DUP16.opcode else items_read
+    for opcode, (items_read, _) in STACK_EFFECTS.items()
+}
+
+
+@dataclass(frozen=True)
+class TraceRecord:
+    pc: int
+    opcode: int
+    failed: bool
+    gas: int
+    gas_cost: int
+    # how many items the instruction popped, and the items it pushed in their place (top last)
+    popped: int
+    pushed: tuple[int, ...]
+    memory_size: int
+    # (offset, length) of the memory the instruction wrote, None if it did not
+    memory_write: Optional[tuple[int, int]]
+
+
+class TraceRecorder:
+    """
+    Writes a record for every instruction executed with its hooks, see the module docstring.
+
+    The records of an execution are relative to where it started (e.g. the gas reported
+    per instruction), so a recorder traces one execution at a time. It notices a new
+    execution by its context, call begin() before reusing the same context (e.g. one
+    from a ContextPool) for another execution.
+    """
+
+    def __init__(self, file: BinaryIO = None, ring_size: int = None) -> None:
+        if (file is None) == (ring_size is None):
+            raise ValueError("a trace goes either to a file or to a ring buffer")
+
+        self.file = file
+        self.ring = deque(maxlen=ring_size) if ring_size is not None else None
+        if file is not None:
+            file.write(MAGIC)
+
+        self.hooks = Hooks()
+        self.hooks.add_prehook(self._before)
+        self.hooks.add_posthook(self._after)
+
+        # what _before saw, until _after completes the record
+        self._pending = None
+        # the per-instruction gas left, see the module docstring
+        self._gas = None
+        # the context of the execution being traced
+        self._context = None
+
+    @classmethod
+    def to_file(cls, path: str, buffer_size=1 << 20) -> "TraceRecorder":
+        return cls(file=open(path, "wb", buffering=buffer_size))
+
+    def _write(self, record: bytes) -> None:
+        if self.ring is not None:
+            self.ring.append(record)
+        else:
+            self.file.write(record)
+
+    def begin(self) -> None:
+        """
+        Starts tracing a new execution, after writing the record of the instruction the
+        previous one raised at, if any
+        """
+        self._write_failed()
+        self._gas = None
+        self._context = None
+
+    def _write_failed(self) -> None:
+        if self._pending is not None:
+            pc, opcode, _, _, _ = self._pending
+            self._write(RECORD.pack(pc, opcode, FLAG_FAILED, min(self._gas or 0, _MAX_UINT64), 0, 0, 0, 0, 0, 0))
+            self._pending = None
+
+    def _before(self, context: ExecutionContext, instruction: Instruction) -> None:
+        if context is not self._context:
+            self.begin()
+            self._context = context
+
+        opcode = instruction.opcode
+        pc = instruction_pc(context, instruction)
+
+        gas_meter = context.gas_meter
+        gas_left = gas_meter.gas_left if gas_meter is not None else 0
+        if self._gas is None:
+            # the first block's gas was charged already
+            self._gas = gas_meter.gas_limit if gas_meter is not None else 0
+
+        stack = context.stack.stack
+        write = MEMORY_WRITES.get(opcode)
+        # an instruction missing stack items raises StackUnderFlow itself, and writes nothing
+        if write is not None and len(stack) >= STACK_EFFECTS[opcode][0]:
+            memory_write = write(stack)
+        else:
+            memory_write = None
+        self._pending = (pc, opcode, gas_left, len(stack), memory_write)
+
+    def _after(self, context: ExecutionContext, instruction: Instruction) -> None:
+        pc, opcode, gas_left_before, height_before, memory_write = self._pending
+        self._pending = None
+
+        gas_meter = context.gas_meter
+        gas_cost = STATIC_GAS[opcode]
+        if gas_meter is not None:
+            # dynamic costs, e.g. memory expansion
+            gas_cost += gas_left_before - gas_meter.gas_left
+
+        stack = context.stack.stack
+        popped = _POPPED[opcode]
+        pushed = stack[height_before - popped:]
+        # a write of 0 bytes does not touch memory, whatever its offset
+        offset, length = memory_write if memory_write is not None and memory_write[1] else (0, 0)
+
+        self._write(
+            RECORD.pack(
+                pc, opcode, 0, min(self._gas, _MAX_UINT64), min(gas_cost, _MAX_UINT64), popped, len(pushed),
+                min(len(context.memory), _MAX_UINT64), min(offset, _MAX_UINT64), min(length, _MAX_UINT32),
+            )
+            + b"".join(item.to_bytes(32, "big") for item in pushed)
+        )
+        if gas_meter is not None:
+            self._gas -= gas_cost
+
+    def close(self) -> None:
+        """
+        Writes the record of the instruction that raised, if any, and flushes the file
+        """
+        self._write_failed()
+
+        if self.file is not None:
+            self.file.close()
+
+    def records(self) -> Iterator[TraceRecord]:
+        """
+        The records in the ring buffer, oldest first
+        """
+        if self.ring is None:
+            raise ValueError("only a ring buffer trace can be read back from the recorder, use read_trace")
+
+        for record in self.ring:
+            yield _decode(record)
+
+    def __enter__(self) -> "TraceRecorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _decode(record: bytes) -> TraceRecord:
+    return _decode_from(record, *RECORD.unpack_from(record))
+
+
+def _decode_from(values: bytes, pc, opcode, flags, gas, gas_cost, popped, num_pushed, memory_size, offset, length) -> TraceRecord:
+    start = RECORD.size
+    pushed = tuple(
+        int.from_bytes(values[start + 32 * i: start + 32 * (i + 1)], "big")
+        for i in range(num_pushed)
+    )
+    return TraceRecord(
+        pc=pc,
+        opcode=opcode,
+        failed=bool(flags & FLAG_FAILED),
+        gas=gas,
+        gas_cost=gas_cost,
+        popped=popped,
+        pushed=pushed,
+        memory_size=memory_size,
+        memory_write=(offset, length) if length else None,
+    )
+
+
+def read_trace(source: Union[str, BinaryIO], buffer_size=1 << 20) -> Iterator[TraceRecord]:
+    """
+    Streams the records of a trace file (a path or a binary file object), one at a time
+    """
+    if isinstance(source, str):
+        with open(source, "rb", buffering=buffer_size) as file:
+            yield from read_trace(file)
+        return
+
+    if source.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a trace file")
+
+    while header := source.read(RECORD.size):
+        if len(header) < RECORD.size:
+            raise ValueError("truncated trace record")
+
+        values = RECORD.unpack(header)
+        num_pushed = values[6]
+        yield _decode_from(header + source.read(32 * num_pushed), *values)
+
+
+def to_eip3155(records: Iterable[TraceRecord]) -> Iterator[str]:
+    """
+    Converts records to EIP-3155 JSON lines, one per instruction, rebuilding the stack
+    and memory size before each instruction from the previous records.
+
+    The trace has to start at the beginning of the execution: a ring buffer that
+    dropped records can not be converted.
+    """
+    stack = []
+    memory_size = 0
+    for record in records:
+        instruction = INSTRUCTION_BY_OPCODE.get(record.opcode)
+        line = {
+            "pc": record.pc,
+            "op": record.opcode,
+            "gas": hex(record.gas),
+            "gasCost": hex(record.gas_cost),
+            "memSize": memory_size,
+            "stack": [hex(item) for item in stack],
+            "depth": 1,
+            "refund": 0,
+            "opName": instruction.name if instruction is not None else f"0x{record.opcode:02x}",
+        }
+        if record.failed:
+            line["error"] = "execution failed"
+        yield json.dumps(line)
+
+        if record.popped:
+            del stack[-record.popped:]
+        stack.extend(record.pushed)
+        memory_size = record.memory_size if not record.failed else memory_size
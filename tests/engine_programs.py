@@ -0,0 +1,48 @@
+"""
+Programs every engine must execute the same way, and what an execution leaves behind to
+compare them by, see tests/test_engines.py
+"""
+from src.analysis import analyze
+from src.executionContext import ExecutionContext
+from src.gas import GasMeter
+from src.opcodesInstructions import *
+from src.run import execute
+from src.storage import Storage
+
+PROGRAMS = [
+    # 6006600702600053 60016000f3
+    [PUSH1, 6, PUSH1, 7, MUL, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN],
+    [PUSH1, 1, PUSH1, 2, SUB, PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN],
+    [PUSH32, 2 ** 256 - 1, PUSH1, 3, ADD, PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN],
+    [PUSH1, 16, MLOAD, MSIZE, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN],
+    [PUSH1, 1, PUSH1, 2, PUSH1, 3, SWAP2, DUP3, PC, PUSH1, 0, MSTORE8, PUSH1, 0, MSTORE8,
+     PUSH1, 1, MSTORE8, PUSH1, 2, MSTORE8, PUSH1, 4, PUSH1, 0, RETURN],
+    [PUSH1, 0, PUSH1, 42, JUMPI, PUSH1, 0x42, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN],
+    [PUSH1, 1, PUSH1, 2],
+    [PUSH2, 0x42],
+    # 4 * 4 with a loop, see tests/test_jumps.py::test_four_squared
+    [PUSH1, 4, DUP1, PUSH1, 0, JUMPDEST, DUP2, PUSH1, 18, JUMPI, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN,
+     JUMPDEST, DUP3, ADD, SWAP1, PUSH1, 1, SWAP1, SUB, SWAP1, PUSH1, 5, JUMP],
+    # the rest of the arithmetic family, with signed and zero operands
+    [PUSH1, 3, PUSH1, 7, PUSH1, 11, ADDMOD, PUSH1, 0, MSTORE, PUSH1, 2, PUSH32, 2 ** 256 - 11, SDIV, PUSH1, 32, MSTORE,
+     PUSH1, 0, PUSH1, 5, DIV, PUSH1, 64, MSTORE, PUSH1, 2, PUSH32, 2 ** 256 - 11, SMOD, PUSH1, 96, MSTORE,
+     PUSH1, 200, PUSH1, 3, EXP, PUSH1, 128, MSTORE, PUSH1, 0xF0, PUSH1, 0, SIGNEXTEND, PUSH1, 160, MSTORE,
+     PUSH1, 0, PUSH1, 9, PUSH1, 9, MULMOD, PUSH1, 3, PUSH1, 10, MOD, ADD, PUSH1, 192, MSTORE,
+     PUSH1, 224, PUSH1, 0, RETURN],
+    # keccak(key . slot) of a mapping access, then of 100 bytes of memory
+    [PUSH1, 0x2A, PUSH1, 0, MSTORE, PUSH1, 1, PUSH1, 32, MSTORE, PUSH1, 64, PUSH1, 0, SHA3, PUSH1, 64, MSTORE,
+     PUSH1, 100, PUSH1, 0, SHA3, PUSH1, 0, MSTORE, PUSH1, 0, PUSH1, 7, SHA3, PUSH1, 32, MSTORE, PUSH1, 96, PUSH1, 0, RETURN],
+    # write slot 1, read it back (warm) and read slot 2 (cold, never written)
+    [PUSH1, 0x2A, PUSH1, 1, SSTORE, PUSH1, 1, SLOAD, PUSH1, 2, SLOAD, ADD, PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN],
+]
+
+
+def final_state(code: bytes, engine: str) -> tuple:
+    """everything an execution of code leaves behind: return data, stack, memory, pc, gas left and storage"""
+    program = analyze(code)
+    context = ExecutionContext(code=code, jumpdests=program.jumpdests, gas_meter=GasMeter(1_000_000), storage=Storage())
+    execute(context, program, engine=engine)
+    return (
+        context.return_data, context.stack.stack, bytes(context.memory.memory), context.pc,
+        context.gas_meter.gas_left, context.storage.slots,
+    )
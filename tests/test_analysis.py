@@ -0,0 +1,65 @@
+from src.analysis import analyze, decode_program
+from src.generics import StackOverFlow
+from src.opcodesInstructions import *
+from src.run import run
+
+import pytest
+
+
+def test_decode_push_immediate():
+    code = assemble([PUSH2, 0x4243, ADD], print_bin=False)
+    program = decode_program(code)
+    assert program.instructions[0] is PUSH2
+    assert program.immediates[0] == 0x4243
+    assert program.next_pcs[0] == 3
+    assert program.instructions[3] is ADD
+    assert program.immediates[3] is None
+    assert program.next_pcs[3] == 4
+
+
+def test_decode_truncated_push():
+    code = assemble([PUSH2, 0x42], print_bin=False)
+    program = decode_program(code)
+    assert program.immediates[0] == 0x42
+    assert program.next_pcs[0] == 3
+
+
+def test_decode_unknown_opcode():
+    program = decode_program(bytes([0xFC]))
+    assert program.instructions[0] is None
+
+
+def test_decode_every_offset():
+    # the PUSH argument is also decoded as an instruction in its own right
+    code = assemble([PUSH1, MSIZE.opcode], print_bin=False)
+    program = decode_program(code)
+    assert program.instructions[1] is MSIZE
+
+
+def test_analyze_is_cached():
+    code = assemble([PUSH1, 1, PUSH1, 2, ADD], print_bin=False)
+    assert analyze(code) is analyze(bytes(code))
+    assert analyze(code) is analyze(bytearray(code))
+
+
+def test_run_predecoded_return():
+    code = assemble([PUSH1, 0x2A, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN], print_bin=False)
+    assert run(code) == b"\x2a"
+
+
+def test_run_unknown_opcode():
+    with pytest.raises(UnknownOpcode):
+        run(bytes([0xFC]))
+
+
+def test_block_stack_requirements():
+    code = assemble([PUSH1, 0, MSTORE8, ADD, DUP3, SWAP1, PUSH1, 1, PUSH1, 1, PUSH1, 1], print_bin=False)
+    [block] = analyze(code).blocks
+    assert block.stack_required == 5
+    assert block.stack_growth == 2
+
+
+def test_fast_engine_checks_unverified_blocks():
+    code = assemble([PUSH1, 1] + [DUP1] * 1024, print_bin=False)
+    with pytest.raises(StackOverFlow):
+        run(code, engine="fast")
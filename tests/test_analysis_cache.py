@@ -0,0 +1,130 @@
+import os
+
+from src import analysis
+from src.analysis import decode_program
+from src.analysisCache import AnalysisCache, HEADER, code_hash, deserialize, serialize
+from src.opcodesInstructions import *
+from src.run import run
+
+import pytest
+
+PROGRAMS = [
+    b"",
+    assemble([PUSH1, 42, PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN], print_bin=False),
+    # 4 * 4 with a loop, see tests/test_jumps.py::test_four_squared
+    assemble([PUSH1, 4, DUP1, PUSH1, 0, JUMPDEST, DUP2, PUSH1, 18, JUMPI, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN,
+              JUMPDEST, DUP3, ADD, SWAP1, PUSH1, 1, SWAP1, SUB, SWAP1, PUSH1, 5, JUMP], print_bin=False),
+    # unknown opcodes, a JUMPDEST inside a PUSH argument and a truncated PUSH
+    bytes([0x60, 0x5B, 0x5B, 0x0C, 0x01, 0xFE, 0x7F, 0x01, 0x02]),
+]
+
+
+def assert_same_program(program, expected):
+    assert program.code == expected.code
+    assert program.instructions == expected.instructions
+    assert program.immediates == expected.immediates
+    assert program.next_pcs == expected.next_pcs
+    assert program.blocks == expected.blocks
+    assert program.block_gas == expected.block_gas
+    assert program.block_at == expected.block_at
+    assert program.jumpdests.bitmap == expected.jumpdests.bitmap
+    assert program.jumpdests.code_size == expected.jumpdests.code_size
+
+
+@pytest.fixture
+def cache(tmp_path) -> AnalysisCache:
+    return AnalysisCache(str(tmp_path))
+
+
+@pytest.mark.parametrize("code", PROGRAMS)
+def test_round_trip(cache, code):
+    expected = decode_program(code)
+    assert cache.load(code) is None
+
+    assert_same_program(cache.get(code), expected)
+    assert_same_program(cache.load(code), expected)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cache.get(code)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_files_are_named_after_the_code_hash(cache, tmp_path):
+    cache.get(PROGRAMS[1])
+    assert os.listdir(tmp_path) == [code_hash(PROGRAMS[1]).hex() + ".program"]
+
+
+def test_other_instruction_set_is_a_miss(cache):
+    code = PROGRAMS[2]
+    data = serialize(decode_program(code), b"\0" * 16)
+    assert deserialize(code, memoryview(data), cache.fingerprint) is None
+
+    with open(cache.path(code_hash(code)), "wb") as file:
+        file.write(data)
+    cache.get(code)
+    assert cache.misses == 1
+    assert cache.load(code) is not None
+
+
+@pytest.mark.parametrize("size", [0, HEADER.size - 1, HEADER.size + 3])
+def test_truncated_file_is_a_miss(cache, size):
+    code = PROGRAMS[2]
+    cache.get(code)
+    path = cache.path(code_hash(code))
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[:size])
+
+    assert cache.load(code) is None
+
+
+@pytest.mark.parametrize("position", [HEADER.size, HEADER.size + 5, -1])
+def test_corrupted_file_is_a_miss(cache, position):
+    code = PROGRAMS[2]
+    cache.get(code)
+    path = cache.path(code_hash(code))
+    with open(path, "rb") as file:
+        data = bytearray(file.read())
+    data[position] ^= 0xFF
+    with open(path, "wb") as file:
+        file.write(data)
+
+    assert_same_program(cache.get(code), decode_program(code))
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert cache.load(code) is not None
+
+
+def test_failing_to_store_still_returns_the_program(cache, monkeypatch):
+    def mkstemp(**kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("src.analysisCache.tempfile.mkstemp", mkstemp)
+    code = PROGRAMS[1]
+    assert_same_program(cache.get(code), decode_program(code))
+    assert cache.load(code) is None
+
+
+def test_unreadable_file_is_a_miss(cache):
+    code = PROGRAMS[2]
+    os.mkdir(cache.path(code_hash(code)))
+    assert cache.load(code) is None
+
+
+def test_clear(cache, tmp_path):
+    for code in PROGRAMS:
+        cache.get(code)
+    cache.clear()
+    assert os.listdir(tmp_path) == []
+
+
+def test_analyze_uses_the_disk_cache(cache):
+    code = assemble([PUSH1, 7, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN], print_bin=False)
+    analysis.set_disk_cache(cache)
+    try:
+        assert run(code, engine="fast") == b"\x07"
+    finally:
+        analysis.set_disk_cache(None)
+
+    assert cache.misses == 1
+    assert cache.load(code) is not None
@@ -0,0 +1,63 @@
+from src import arithmetic
+from src.arithmetic import int_to_uint, uint_to_int
+from src.generics import MAX_UINT256
+
+import pytest
+
+SIGNED = [0, 1, 2, 3, 7, -1, -2, -3, -7, 2 ** 255 - 1, -2 ** 255, 12345678901234567890, -12345678901234567890]
+
+
+def spec_sdiv(a, b):
+    # yellow paper: 0 if b == 0, else sgn(a * b) * floor(|a| / |b|)
+    if b == 0:
+        return 0
+    sign = -1 if (a < 0) != (b < 0) else 1
+    return sign * (abs(a) // abs(b))
+
+
+def spec_smod(a, b):
+    # yellow paper: 0 if b == 0, else sgn(a) * (|a| mod |b|)
+    if b == 0:
+        return 0
+    return (-1 if a < 0 else 1) * (abs(a) % abs(b))
+
+
+@pytest.mark.parametrize("a", SIGNED)
+@pytest.mark.parametrize("b", SIGNED)
+def test_signed_division(a, b):
+    assert arithmetic.sdiv(int_to_uint(a), int_to_uint(b)) == int_to_uint(spec_sdiv(a, b))
+    assert arithmetic.smod(int_to_uint(a), int_to_uint(b)) == int_to_uint(spec_smod(a, b))
+
+
+def test_sdiv_overflow():
+    # -2 ** 255 / -1 does not fit, it wraps back to -2 ** 255
+    assert arithmetic.sdiv(int_to_uint(-2 ** 255), MAX_UINT256) == int_to_uint(-2 ** 255)
+
+
+@pytest.mark.parametrize("a", [0, 1, 2, 3, 10, 2 ** 128 + 1, MAX_UINT256])
+@pytest.mark.parametrize("b", [0, 1, 2, 3, 255, 256, 1000, MAX_UINT256])
+def test_exp(a, b):
+    assert arithmetic.exp(a, b) == pow(a, b, 2 ** 256)
+
+
+def test_addmod_mulmod_do_not_wrap():
+    assert arithmetic.addmod(MAX_UINT256, 2, 3) == (MAX_UINT256 + 2) % 3
+    assert arithmetic.mulmod(MAX_UINT256, MAX_UINT256, 12345) == (MAX_UINT256 * MAX_UINT256) % 12345
+    assert arithmetic.addmod(1, 2, 0) == arithmetic.mulmod(1, 2, 0) == 0
+
+
+def test_signextend():
+    assert arithmetic.signextend(0, 0xFF) == MAX_UINT256
+    assert arithmetic.signextend(0, 0x17F) == 0x7F
+    assert arithmetic.signextend(1, 0xABCD) == int_to_uint(0xABCD - 0x10000)
+    assert arithmetic.signextend(31, 0xABCD) == arithmetic.signextend(2 ** 200, 0xABCD) == 0xABCD
+
+
+def test_exp_byte_size():
+    assert [arithmetic.exp_byte_size(b) for b in [0, 1, 255, 256, MAX_UINT256]] == [0, 1, 1, 2, 32]
+
+
+def test_uint_to_int():
+    assert uint_to_int(MAX_UINT256) == -1
+    assert uint_to_int(2 ** 255) == -2 ** 255
+    assert uint_to_int(2 ** 255 - 1) == 2 ** 255 - 1
@@ -0,0 +1,51 @@
+from src.batch import run_batch, BatchResult
+from src.generics import InvalidJumpDestination, OutOfGas
+from src.opcodesInstructions import *
+from src.run import run, ENGINES
+
+import pytest
+
+RETURN_42 = assemble([PUSH1, 42, PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN], print_bin=False)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_run_batch(engine):
+    inputs = [bytes([i]) for i in range(10)]
+    results = list(run_batch(RETURN_42, inputs, engine=engine))
+    assert [result.index for result in results] == list(range(10))
+    assert all(result.ok and result.return_data == run(RETURN_42) for result in results)
+
+
+def test_run_batch_is_lazy():
+    def inputs():
+        yield b""
+        raise AssertionError("read past the first input")
+
+    results = run_batch(RETURN_42, inputs())
+    assert next(results).ok
+
+
+def test_run_batch_reports_errors():
+    code = assemble([PUSH1, 7, PUSH1, 42, JUMP], print_bin=False)
+    first, second = run_batch(code, [b"", b""])
+    assert isinstance(first.error, InvalidJumpDestination)
+    assert first.error.context.stack.stack == [7]
+    assert first.error.context is not second.error.context
+
+    result, = run_batch(RETURN_42, [b""], gas_limit=10)
+    assert isinstance(result.error, OutOfGas)
+
+
+def test_run_batch_unknown_engine():
+    with pytest.raises(ValueError):
+        run_batch(RETURN_42, [b""], engine="jit")
+
+
+def test_run_batch_in_workers():
+    results = list(run_batch(RETURN_42, [b""] * 100, processes=2, chunksize=8))
+    assert [result.index for result in results] == list(range(100))
+    assert all(result == BatchResult(index=result.index, return_data=run(RETURN_42)) for result in results)
+
+    code = assemble([PUSH1, 7, PUSH1, 42, JUMP], print_bin=False)
+    result, = run_batch(code, [b""], processes=2)
+    assert result.error == InvalidJumpDestination(context=None, target_pc=42)
@@ -0,0 +1,32 @@
+import json
+
+from benchmarks.bench import BASELINE, WORKLOADS, Result, compare, count_instructions
+from src.run import run, ENGINES
+
+import pytest
+
+
+@pytest.mark.parametrize("name", sorted(WORKLOADS))
+def test_workloads_run_the_same_on_every_engine(name):
+    code = WORKLOADS[name]()
+    results = {run(code, engine=engine) for engine in ENGINES}
+    assert len(results) == 1
+    assert count_instructions(code) > 10_000
+
+
+def test_compare():
+    baseline = {"a/fast": {"instructions_per_second": 100.0}, "b/fast": {"instructions_per_second": 100.0}}
+    results = {
+        "a/fast": Result(instructions=1, seconds=1, instructions_per_second=96.0, peak_traced_kib=0),
+        "b/fast": Result(instructions=1, seconds=1, instructions_per_second=94.0, peak_traced_kib=0),
+        "c/fast": Result(instructions=1, seconds=1, instructions_per_second=1.0, peak_traced_kib=0),
+    }
+    assert compare(results, baseline) == ["b/fast"]
+    assert compare(results, baseline, threshold=0.01) == ["a/fast", "b/fast"]
+
+
+def test_baseline_covers_every_benchmark():
+    with open(BASELINE) as file:
+        baseline = json.load(file)
+    assert set(baseline) == {f"{name}/{engine}" for name in WORKLOADS for engine in ENGINES}
+    assert all(result["instructions_per_second"] > 0 for result in baseline.values())
@@ -0,0 +1,72 @@
+import pickle
+
+from src.executionContext import Calldata, ExecutionContext
+from src.generics import MAX_UINT256, OutOfGas
+from src.memory import Memory, PagedMemory, PAGE_SIZE
+from src.opcodesInstructions import *
+from src.run import run, ENGINES
+
+import pytest
+
+
+def test_wraps_the_callers_buffer():
+    data = bytes(range(100))
+    calldata = Calldata(data)
+    assert calldata.data.obj is data
+    assert len(calldata) == 100
+    assert calldata == data
+
+
+def test_context_wraps_bytes():
+    assert isinstance(ExecutionContext(calldata=b"\x01").calldata, Calldata)
+    calldata = Calldata(b"\x01")
+    assert ExecutionContext(calldata=calldata).calldata is calldata
+
+
+def test_load_word_is_zero_padded():
+    calldata = Calldata(bytes(range(1, 41)))
+    assert calldata.load_word(0) == int.from_bytes(bytes(range(1, 33)), "big")
+    assert calldata.load_word(39) == 40 << 248
+    assert calldata.load_word(40) == 0
+    assert calldata.load_word(MAX_UINT256) == 0
+
+
+@pytest.mark.parametrize("memory", [Memory(), PagedMemory()])
+def test_copy_to_is_zero_padded(memory):
+    memory.store_word(PAGE_SIZE - 16, MAX_UINT256)
+    calldata = Calldata(b"\x11\x22\x33")
+    calldata.copy_to(memory, PAGE_SIZE - 16, 1, 32)
+    assert memory.load_range(PAGE_SIZE - 16, 32) == b"\x22\x33" + bytes(30)
+
+    calldata.copy_to(memory, 0, MAX_UINT256, 4)
+    assert memory.load_range(0, 4) == bytes(4)
+
+
+def test_pickle():
+    assert pickle.loads(pickle.dumps(Calldata(b"abc"))) == b"abc"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_calldata_instructions(engine):
+    # memory[0:64] = calldata[4:68], memory[64] = calldataload(36), return calldatasize . memory
+    code = assemble([
+        PUSH1, 64, PUSH1, 4, PUSH1, 32, CALLDATACOPY,
+        PUSH1, 36, CALLDATALOAD, PUSH1, 96, MSTORE,
+        CALLDATASIZE, PUSH1, 0, MSTORE,
+        PUSH1, 128, PUSH1, 0, RETURN,
+    ], print_bin=False)
+    calldata = bytes(range(50))
+    output = run(code, engine=engine, calldata=calldata)
+    assert output[:32] == len(calldata).to_bytes(32, "big")
+    assert output[32:96] == calldata[4:] + bytes(18)
+    assert output[96:] == calldata[36:] + bytes(18)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_calldatacopy_charges_per_word(engine):
+    # 3 * 3 + 3 static gas, + 3 for each of the 2 words copied, + 6 for expanding memory to 2 words
+    code = assemble([PUSH1, 33, PUSH1, 0, PUSH1, 0, CALLDATACOPY], print_bin=False)
+    run(code, engine=engine, gas_limit=24)
+
+    with pytest.raises(OutOfGas):
+        run(code, engine=engine, gas_limit=23)
@@ -0,0 +1,47 @@
+from src.compiler import compiled
+from src.generics import ExecutionLimitReached, InvalidJumpDestination, StackOverFlow, StackUnderFlow
+from src.opcodesInstructions import *
+from src.run import run
+
+import pytest
+
+
+def test_stack_ops_become_locals():
+    code = assemble([PUSH1, 1, PUSH1, 2, SWAP1, DUP2, ADD, PUSH1, 0, MSTORE8], print_bin=False)
+    segment = compiled(code).segments[0]
+    assert "pop()" not in segment.source
+    assert segment.stack_required == 0
+    assert segment.stack_growth == 3
+
+
+def test_stack_required_is_checked_on_entry():
+    code = assemble([PUSH1, 0, MSTORE8, ADD], print_bin=False)
+    assert compiled(code).segments[0].stack_required == 3
+
+    # the MSTORE8 still happens before the underflow, like in the reference engine
+    with pytest.raises(StackUnderFlow):
+        run(code, engine="compiled")
+
+
+def test_stack_overflow():
+    code = assemble([PUSH1, 1] + [DUP1] * 1024, print_bin=False)
+    with pytest.raises(StackOverFlow):
+        run(code, engine="compiled")
+
+
+def test_invalid_jump():
+    with pytest.raises(InvalidJumpDestination) as excinfo:
+        run(assemble([PUSH1, 42, JUMP], print_bin=False), engine="compiled")
+    assert excinfo.value.target_pc == 42
+
+
+def test_max_steps_inside_a_block():
+    code = assemble([PUSH1, 1, PUSH1, 2, ADD, PUSH1, 3, ADD], print_bin=False)
+    with pytest.raises(ExecutionLimitReached) as excinfo:
+        run(code, engine="compiled", max_steps=3)
+    assert excinfo.value.context.stack.stack == [3, 3]
+
+
+def test_compiled_is_cached():
+    code = assemble([PUSH1, 1, PUSH1, 2, ADD], print_bin=False)
+    assert compiled(code) is compiled(bytearray(code))
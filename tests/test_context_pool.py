@@ -0,0 +1,71 @@
+from src.executionContext import ContextPool, ExecutionContext
+from src.gas import GasMeter
+from src.generics import InvalidJumpDestination
+from src.opcodesInstructions import *
+from src.run import run, ENGINES
+
+import pytest
+
+
+def test_contexts_do_not_share_stack_or_memory():
+    a, b = ExecutionContext(), ExecutionContext()
+    assert a.stack is not b.stack
+    assert a.memory is not b.memory
+
+
+def test_pool_reuses_contexts():
+    pool = ContextPool()
+    with pool.context(code=bytes([STOP.opcode])) as context:
+        stack, memory = context.stack, context.memory
+    assert len(pool) == 1
+
+    with pool.context(code=bytes([STOP.opcode])) as reused:
+        assert reused is context
+        assert reused.stack is stack and reused.memory is memory
+    assert len(pool) == 1
+
+
+def test_pool_resets_contexts():
+    pool = ContextPool()
+    context = pool.acquire(code=bytes([STOP.opcode]))
+    context.stack.push(42)
+    context.memory.store_word(0, 42)
+    context.pc = 7
+    context.set_return_data(0, 32)
+    pool.release(context)
+
+    gas_meter = GasMeter(100)
+    context = pool.acquire(code=bytes([JUMPDEST.opcode]), gas_meter=gas_meter)
+    assert len(context.stack) == 0
+    assert len(context.memory) == 0 and context.memory.expansion_cost == 0
+    assert context.memory.gas_meter is gas_meter and context.gas_meter is gas_meter
+    assert context.pc == 0
+    assert not context.stopped
+    assert context.return_data == b""
+    assert 0 in context.jumpdests
+
+
+def test_pool_max_size():
+    pool = ContextPool(max_size=1)
+    contexts = [pool.acquire(), pool.acquire()]
+    for context in contexts:
+        pool.release(context)
+    assert len(pool) == 1
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_run_with_pool(engine):
+    pool = ContextPool()
+    code = assemble([PUSH1, 42, PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN], print_bin=False)
+    assert run(code, engine=engine, pool=pool) == (42).to_bytes(32, "big")
+
+    # a failed run does not give its context back, the exception may refer to it
+    with pytest.raises(InvalidJumpDestination) as excinfo:
+        run(assemble([PUSH1, 7, PUSH1, 42, JUMP], print_bin=False), engine=engine, pool=pool)
+    assert len(pool) == 0
+    run(code, engine=engine, pool=pool)
+    assert excinfo.value.context.stack.stack == [7]
+
+    # and nothing from the previous runs is left over
+    code = assemble([MSIZE, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN], print_bin=False)
+    assert run(code, engine=engine, pool=pool) == b"\x00"
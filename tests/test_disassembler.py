@@ -0,0 +1,63 @@
+import itertools
+import random
+
+from src.analysis import STACK_EFFECTS
+from src.disasm import DATA_LINE_SIZE, disassemble, iter_disassembly, main
+from src.opcodesInstructions import *
+
+import pytest
+
+
+def test_opcode_names():
+    assert set(OPCODE_NAMES) == set(STACK_EFFECTS)
+    for opcode, instruction in INSTRUCTION_BY_OPCODE.items():
+        assert OPCODE_NAMES[opcode] == instruction.name
+
+
+def test_is_lazy():
+    # would take a while to disassemble entirely
+    code = bytes([PUSH1.opcode, 1]) * 10 ** 6
+    assert list(itertools.islice(iter_disassembly(code), 2)) == ["0000: PUSH1 0x01", "0002: PUSH1 0x01"]
+
+
+def test_long_data_is_split():
+    code = bytes([STOP.opcode]) + bytes(range(1, 2 * DATA_LINE_SIZE + 2))
+    assert disassemble(code) == [
+        "0000: STOP",
+        f"0001: DATA 0x{bytes(range(1, DATA_LINE_SIZE + 1)).hex()}",
+        f"0021: DATA 0x{bytes(range(DATA_LINE_SIZE + 1, 2 * DATA_LINE_SIZE + 1)).hex()}",
+        "0041: DATA 0x41",
+    ]
+    assert assemble(disassemble(code), print_bin=False) == code
+
+
+def test_assemble_text():
+    text = """
+        # a comment
+        PUSH2 0x1         # padded to 2 bytes
+        push1 0xff
+        0010: DATA 0x0102
+        UNKNOWN 0x0c
+    """
+    assert assemble(text, print_bin=False) == bytes([0x61, 0x00, 0x01, 0x60, 0xFF, 0x01, 0x02, 0x0C])
+
+
+@pytest.mark.parametrize("line", ["NOPE", "PUSH1", "PUSH1 0x0102", "ADD 0x01", "DATA 12", "UNKNOWN 0x0102"])
+def test_assemble_invalid_text(line):
+    with pytest.raises(ValueError):
+        assemble([line], print_bin=False)
+
+
+def test_round_trip():
+    rng = random.Random(0)
+    for size in range(0, 2000, 7):
+        code = bytes(rng.randrange(256) for _ in range(size))
+        assert assemble(disassemble(code), print_bin=False) == code
+
+
+@pytest.mark.parametrize("content", [b"0x600160020100", b"600160020100\n", bytes.fromhex("600160020100")])
+def test_main(tmp_path, capsys, content):
+    path = tmp_path / "code"
+    path.write_bytes(content)
+    assert main([str(path)]) == 0
+    assert capsys.readouterr().out.splitlines() == ["0000: PUSH1 0x01", "0002: PUSH1 0x02", "0004: ADD", "0005: STOP"]
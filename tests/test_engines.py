@@ -0,0 +1,13 @@
+from src.opcodesInstructions import assemble
+from src.run import ENGINES
+
+from engine_programs import PROGRAMS, final_state
+
+import pytest
+
+
+@pytest.mark.parametrize("engine", [engine for engine in ENGINES if engine != "reference"])
+@pytest.mark.parametrize("program", PROGRAMS)
+def test_engine_matches_reference(engine, program):
+    code = assemble(program, print_bin=False)
+    assert final_state(code, engine) == final_state(code, "reference")
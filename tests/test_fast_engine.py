@@ -0,0 +1,53 @@
+from src import fastEngine
+from src.generics import ExecutionLimitReached, InvalidJumpDestination, StackUnderFlow
+from src.opcodesInstructions import *
+from src.run import run
+
+import pytest
+
+
+def test_fast_engine_underflow():
+    with pytest.raises(StackUnderFlow):
+        run(assemble([PUSH1, 1, ADD], print_bin=False), engine="fast")
+
+
+def test_fast_engine_invalid_jump():
+    with pytest.raises(InvalidJumpDestination) as excinfo:
+        run(assemble([PUSH1, 42, JUMP], print_bin=False), engine="fast")
+    assert excinfo.value.target_pc == 42
+
+
+def test_fast_engine_unknown_opcode():
+    with pytest.raises(UnknownOpcode):
+        run(bytes([0xFC]), engine="fast")
+
+
+def test_fast_engine_max_steps():
+    with pytest.raises(ExecutionLimitReached):
+        run(assemble([PUSH1, 1, PUSH1, 2, ADD], print_bin=False), engine="fast", max_steps=2)
+
+
+@pytest.mark.parametrize("engine", ["reference", "fast"])
+def test_max_steps_after_halting(engine):
+    code = assemble([PUSH1, 0, PUSH1, 0, RETURN], print_bin=False)
+    with pytest.raises(ExecutionLimitReached) as excinfo:
+        run(code, engine=engine, max_steps=2)
+    assert excinfo.value.context.pc == 5
+
+
+def test_other_index_errors_are_not_underflows(monkeypatch):
+    def broken(stack, memory, ctx, pc):
+        stack.pop()
+        return [][0]
+
+    for table in ("HANDLERS", "UNCHECKED_HANDLERS"):
+        handlers = list(getattr(fastEngine, table))
+        handlers[MSIZE.opcode] = broken
+        monkeypatch.setattr(fastEngine, table, handlers)
+    with pytest.raises(IndexError):
+        run(assemble([PUSH1, 1, PUSH1, 2, MSIZE], print_bin=False), engine="fast")
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        run(bytes(), engine="turbo")
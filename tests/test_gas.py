@@ -0,0 +1,110 @@
+from src.analysis import analyze
+from src.gas import STATIC_GAS, GasMeter, OutOfGas, word_cost, G_SHA3_WORD
+from src.memory import Memory
+from src.opcodesInstructions import *
+from src.run import run, ENGINES
+
+import pytest
+
+
+def test_every_instruction_has_a_static_cost():
+    assert set(INSTRUCTION_BY_OPCODE) <= set(STATIC_GAS)
+
+
+def test_block_static_gas():
+    code = assemble([PUSH1, 6, PUSH1, 7, MUL, PUSH1, 0, JUMP, JUMPDEST, STOP], print_bin=False)
+    program = analyze(code)
+    assert [block.static_gas for block in program.blocks] == [3 + 3 + 5 + 3 + 8, 1 + 0]
+    assert program.block_gas[0] == 22
+    assert program.block_gas[1] == 0
+
+
+def test_word_cost():
+    assert word_cost(G_SHA3_WORD, 0) == 0
+    assert word_cost(G_SHA3_WORD, 1) == 6
+    assert word_cost(G_SHA3_WORD, 33) == 12
+
+
+def test_gas_meter():
+    gas_meter = GasMeter(10)
+    gas_meter.consume(4)
+    assert gas_meter.gas_left == 6
+    assert gas_meter.gas_used == 4
+
+    with pytest.raises(OutOfGas):
+        gas_meter.consume(7)
+    assert gas_meter.gas_left == 6
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_exact_gas_limit(engine):
+    # 23 static gas + 3 for expanding memory to 1 word
+    code = assemble([PUSH1, 6, PUSH1, 7, MUL, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN], print_bin=False)
+    assert run(code, engine=engine, gas_limit=26) == bytes([42])
+
+    with pytest.raises(OutOfGas):
+        run(code, engine=engine, gas_limit=25)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_block_is_charged_on_entry(engine):
+    code = assemble([PUSH1, 1, PUSH1, 2, ADD, STOP], print_bin=False)
+    with pytest.raises(OutOfGas) as excinfo:
+        run(code, engine=engine, gas_limit=8)
+    assert excinfo.value.args[0] == {"required": 9, "available": 8}
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_exp_charges_per_exponent_byte(engine):
+    # 3 + 3 + 10 static gas, + 50 for each of the 2 bytes of the exponent
+    code = assemble([PUSH2, 0x01, 0x00, PUSH1, 2, EXP, STOP], print_bin=False)
+    run(code, engine=engine, gas_limit=116)
+
+    with pytest.raises(OutOfGas):
+        run(code, engine=engine, gas_limit=115)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_sha3_charges_per_word(engine):
+    # 3 + 3 + 30 static gas, + 6 for each of the 2 words hashed, + 6 for expanding memory to 2 words
+    code = assemble([PUSH1, 33, PUSH1, 0, SHA3, STOP], print_bin=False)
+    run(code, engine=engine, gas_limit=54)
+
+    with pytest.raises(OutOfGas):
+        run(code, engine=engine, gas_limit=53)
+
+
+def test_memory_expansion_cost_is_incremental():
+    gas_meter = GasMeter(1000)
+    memory = Memory(gas_meter=gas_meter)
+
+    memory.store(0, 1)
+    assert memory.expansion_cost == 3
+    assert gas_meter.gas_used == 3
+
+    # no new words, no charge
+    memory.store_word(0, 1)
+    assert gas_meter.gas_used == 3
+
+    # 1 -> 32 words only charges the difference
+    memory.load(32 * 32 - 1)
+    assert memory.expansion_cost == 3 * 32 + 32 * 32 // 512
+    assert gas_meter.gas_used == memory.expansion_cost
+
+
+def test_memory_expansion_out_of_gas():
+    memory = Memory(gas_meter=GasMeter(5))
+    memory.store(0, 1)
+    with pytest.raises(OutOfGas):
+        memory.store(32, 1)
+
+    # memory did not grow
+    assert memory.active_words() == 1
+    assert memory.expansion_cost == 3
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_run_memory_gas_limit(engine):
+    code = assemble([PUSH1, 0, PUSH2, 1024, MSTORE8], print_bin=False)
+    with pytest.raises(OutOfGas):
+        run(code, engine=engine, gas_limit=100)
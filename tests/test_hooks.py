@@ -0,0 +1,72 @@
+from src.hooks import Hooks
+from src.opcodesInstructions import *
+from src.run import run
+
+import pytest
+
+HOOKED_ENGINES = ["reference", "fast"]
+
+STORE_42 = assemble([PUSH1, 0x42, PUSH1, 0, MSTORE, PUSH1, 0x20, PUSH1, 0, RETURN], print_bin=False)
+
+# 4 * 4 with a loop, see tests/test_jumps.py::test_four_squared
+FOUR_SQUARED = assemble(
+    [PUSH1, 4, DUP1, PUSH1, 0, JUMPDEST, DUP2, PUSH1, 18, JUMPI, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN,
+     JUMPDEST, DUP3, ADD, SWAP1, PUSH1, 1, SWAP1, SUB, SWAP1, PUSH1, 5, JUMP],
+    print_bin=False,
+)
+
+
+@pytest.mark.parametrize("engine", HOOKED_ENGINES)
+def test_prehook_sees_every_instruction(engine):
+    trace = []
+    run(STORE_42, engine=engine, prehook=lambda ctx, instruction: trace.append((instruction, ctx.pc)))
+    assert trace == [(PUSH1, 2), (PUSH1, 4), (MSTORE, 5), (PUSH1, 7), (PUSH1, 9), (RETURN, 10)]
+
+
+@pytest.mark.parametrize("engine", HOOKED_ENGINES)
+def test_hooks_on_selected_opcodes(engine):
+    trace = []
+    hooks = Hooks()
+    hooks.add_prehook(lambda ctx, instruction: trace.append(("pre", instruction, list(ctx.stack.stack))), [ADD, SUB])
+    hooks.add_posthook(lambda ctx, instruction: trace.append(("post", instruction, list(ctx.stack.stack))), [SUB])
+
+    assert run(FOUR_SQUARED, engine=engine, hooks=hooks) == run(FOUR_SQUARED)
+    assert [entry[:2] for entry in trace] == [("pre", ADD), ("pre", SUB), ("post", SUB)] * 4
+    assert trace[:3] == [("pre", ADD, [4, 4, 0, 4]), ("pre", SUB, [4, 4, 1, 4]), ("post", SUB, [4, 4, 3])]
+
+
+@pytest.mark.parametrize("engine", HOOKED_ENGINES)
+def test_hooks_can_change_the_stack(engine):
+    def hijack(ctx, instruction):
+        offset, _ = ctx.stack.pop(), ctx.stack.pop()
+        ctx.stack.push(0xdeadbeef)
+        ctx.stack.push(offset)
+
+    hooks = Hooks()
+    hooks.add_prehook(hijack, [MSTORE])
+    assert run(STORE_42, engine=engine, hooks=hooks) == (0xdeadbeef).to_bytes(32, "big")
+    assert run(STORE_42, engine=engine) == (0x42).to_bytes(32, "big")
+
+
+@pytest.mark.parametrize("engine", HOOKED_ENGINES)
+def test_posthook_on_push_and_jump(engine):
+    trace = []
+    hooks = Hooks()
+    hooks.add_posthook(lambda ctx, instruction: trace.append((instruction, ctx.pc, ctx.stack.peek(0))), [PUSH1])
+    hooks.add_posthook(lambda ctx, instruction: trace.append((instruction, ctx.pc)), [JUMP])
+
+    run(FOUR_SQUARED, engine=engine, hooks=hooks)
+    assert trace[:4] == [(PUSH1, 2, 4), (PUSH1, 5, 0), (PUSH1, 9, 18), (PUSH1, 24, 1)]
+    assert (JUMP, 5) in trace
+
+
+def test_hooks_not_supported_by_compiled_engine():
+    with pytest.raises(ValueError):
+        run(STORE_42, engine="compiled", prehook=lambda ctx, instruction: None)
+
+
+def test_prehook_is_added_to_hooks():
+    hooks = Hooks()
+    hooks.add_posthook(lambda ctx, instruction: None, [ADD])
+    run(STORE_42, hooks=hooks, prehook=lambda ctx, instruction: None)
+    assert hooks.opcodes() == {ADD.opcode}
@@ -0,0 +1,23 @@
+from src.executionContext import ExecutionContext, valid_jump_destinations
+from src.opcodesInstructions import *
+
+
+def test_valid_jump_destinations():
+    code = assemble([PUSH1, 0x5B, JUMPDEST, PUSH2, 0x5B5B, JUMPDEST, STOP], print_bin=False)
+    jumpdests = valid_jump_destinations(code)
+    assert set(jumpdests) == {2, 6}
+    assert 2 in jumpdests
+    assert 0 not in jumpdests
+    assert 1 not in jumpdests
+    assert -1 not in jumpdests
+    assert 100 not in jumpdests
+
+
+def test_valid_jump_destinations_truncated_push():
+    code = assemble([JUMPDEST, PUSH2, 0x5B5B], print_bin=False)
+    assert set(valid_jump_destinations(code[:-1])) == {0}
+
+
+def test_jump_destinations_are_shared():
+    code = assemble([PUSH1, 3, JUMP, JUMPDEST], print_bin=False)
+    assert ExecutionContext(code=code).jumpdests is ExecutionContext(code=bytearray(code)).jumpdests
@@ -0,0 +1,49 @@
+from src import keccak
+from src.keccak import BACKENDS, MEMO_MAX_INPUT, keccak256, keccak256_python, use_backend
+
+import pytest
+
+EMPTY = bytes.fromhex("c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470")
+ABC = bytes.fromhex("4e03657aea45a94fc7d47ba826c8d667c0d1e6e33a64a036ec44f58fa12d6c45")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_known_digests(backend):
+    hash_function = BACKENDS[backend]
+    assert hash_function(b"") == EMPTY
+    assert hash_function(b"abc") == ABC
+
+
+@pytest.mark.parametrize("length", [0, 1, 31, 32, 64, 135, 136, 137, 272, 1000])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_match_pure_python(backend, length):
+    data = bytes(i * 7 % 256 for i in range(length))
+    assert BACKENDS[backend](memoryview(data)) == keccak256_python(data)
+
+
+def test_hashes_memoryview_slices():
+    data = bytearray(b"foobarbaz")
+    assert keccak256(memoryview(data)[6:9]) == keccak256(b"baz")
+    assert keccak256(memoryview(data).toreadonly()[0:3]) == keccak256_python(b"foo")
+
+
+def test_small_inputs_are_memoized():
+    keccak._memoized_keccak256.cache_clear()
+    keccak256(bytes(64))
+    keccak256(memoryview(bytearray(64)))
+    assert keccak._memoized_keccak256.cache_info().hits == 1
+
+    keccak256(bytes(MEMO_MAX_INPUT + 1))
+    assert keccak._memoized_keccak256.cache_info().currsize == 1
+
+
+def test_use_backend():
+    backend = keccak.BACKEND
+    try:
+        use_backend("python")
+        assert keccak256(b"abc") == ABC
+    finally:
+        use_backend(backend)
+
+    with pytest.raises(ValueError):
+        use_backend("nope")
@@ -0,0 +1,130 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src import fastEngine
+from src.analysis import analyze
+from src.executionContext import ExecutionContext
+from src.gas import GasMeter
+from src.generics import ExecutionLimitReached, InvalidJumpDestination, OutOfGas, StackUnderFlow, MAX_UINT256
+from src.lanesEngine import _add, _mul, _sub, from_limbs, run_lanes, to_limbs
+from src.memory import Memory
+from src.opcodesInstructions import *
+
+RETURN_TOP = [PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN]
+
+PROGRAMS = [
+    # straight-line arithmetic on the lane's input
+    [DUP1, DUP1, MUL, SWAP1, PUSH1, 7, SUB, ADD, PUSH1, 3, SWAP1, DIV, *RETURN_TOP],
+    [PUSH1, 5, DUP2, ADDMOD, PUSH1, 0, MSTORE8, MSIZE, PC, ADD, *RETURN_TOP],
+    # lanes diverge at the JUMPI: odd inputs jump
+    [PUSH1, 2, DUP2, MOD, PUSH1, 12, JUMPI, PUSH1, 1, ADD, PUSH1, 13, JUMP, JUMPDEST, JUMPDEST, *RETURN_TOP],
+    # every lane takes the loop the same number of times, the counter is the input's low byte mod 4
+    [PUSH1, 0, JUMPDEST, PUSH1, 1, ADD, DUP1, PUSH1, 4, SUB, PUSH1, 2, JUMPI, *RETURN_TOP],
+    # memory offsets depend on the input
+    [PUSH1, 3, DUP2, MOD, DUP2, SWAP1, MSTORE8, MSIZE, *RETURN_TOP],
+    [DUP1, PUSH1, 31, MSTORE8, PUSH1, 0, MLOAD, *RETURN_TOP],
+    [PUSH1, 42, JUMP],
+    [ADD],
+]
+
+
+def run_one(code, stack, gas_limit=0, max_steps=0, calldata=bytes()):
+    gas_meter = GasMeter(gas_limit) if gas_limit else None
+    context = ExecutionContext(code=code, memory=Memory(gas_meter=gas_meter), gas_meter=gas_meter, calldata=calldata)
+    context.stack.stack = list(stack)
+    try:
+        fastEngine.execute(context, analyze(code), max_steps=max_steps)
+    except (StackUnderFlow, InvalidJumpDestination, OutOfGas, ExecutionLimitReached) as error:
+        return type(error)
+    return context.return_data
+
+
+def lane_outcome(result):
+    return type(result.error) if result.error is not None else result.return_data
+
+
+VALUES = [0, 1, 2, 3, 255, 2 ** 64 - 1, 2 ** 64, 2 ** 128 + 5, 2 ** 255, MAX_UINT256]
+
+
+def test_limbs_round_trip():
+    assert from_limbs(to_limbs(VALUES)) == VALUES
+
+
+def test_limb_arithmetic():
+    pairs = [(a, b) for a in VALUES for b in VALUES] + [
+        (random.getrandbits(256), random.getrandbits(256)) for _ in range(200)
+    ]
+    a, b = to_limbs([x for x, _ in pairs]), to_limbs([y for _, y in pairs])
+    assert from_limbs(_add(a, b)) == [(x + y) & MAX_UINT256 for x, y in pairs]
+    assert from_limbs(_sub(a, b)) == [(x - y) & MAX_UINT256 for x, y in pairs]
+    assert from_limbs(_mul(a, b)) == [(x * y) & MAX_UINT256 for x, y in pairs]
+
+
+@pytest.mark.parametrize("program", PROGRAMS)
+def test_lanes_match_fast_engine(program):
+    code = assemble(program, print_bin=False)
+    stacks = [[value] for value in VALUES]
+    results = run_lanes(code, stacks=stacks)
+    assert [result.index for result in results] == list(range(len(VALUES)))
+    assert [lane_outcome(result) for result in results] == [run_one(code, stack) for stack in stacks]
+
+
+@pytest.mark.parametrize("gas_limit", [10, 30, 40, 60, 1000])
+@pytest.mark.parametrize("max_steps", [0, 1, 5, 9, 20])
+def test_lanes_gas_and_max_steps(gas_limit, max_steps):
+    code = assemble(PROGRAMS[2], print_bin=False)
+    stacks = [[value] for value in VALUES]
+    results = run_lanes(code, stacks=stacks, gas_limit=gas_limit, max_steps=max_steps)
+    assert [lane_outcome(result) for result in results] == [
+        run_one(code, stack, gas_limit=gas_limit, max_steps=max_steps) for stack in stacks
+    ]
+
+
+@pytest.mark.parametrize("program", [PROGRAMS[0], PROGRAMS[1], PROGRAMS[5]])
+def test_uniform_lanes_run_together(program, monkeypatch):
+    monkeypatch.setattr("src.lanesEngine._run_each", None)
+    code = assemble(program, print_bin=False)
+    assert len(run_lanes(code, stacks=[[value] for value in VALUES])) == len(VALUES)
+
+
+def test_lanes_keep_calldata_and_check_inputs():
+    code = assemble([PUSH1, 1, PUSH1, 1, PUSH1, 42, JUMP], print_bin=False)
+    results = run_lanes(code, inputs=[b"\x01", b"\x02"])
+    assert [result.error.context.calldata for result in results] == [b"\x01", b"\x02"]
+    assert all(result.error.context.stack.stack == [1, 1] for result in results)
+
+    with pytest.raises(ValueError):
+        run_lanes(code, stacks=[[1], [1, 2]])
+
+
+INPUTS = [b"", b"\x01", bytes(range(1, 40)), b"\xff" * 70, b"\x03" + b"\x10" * 33]
+
+CALLDATA_PROGRAMS = [
+    # the lanes run together even though their calldata sizes differ
+    [PUSH1, 0, CALLDATALOAD, CALLDATASIZE, ADD, PUSH1, 35, CALLDATALOAD, ADD, *RETURN_TOP],
+    [PUSH1, 40, PUSH1, 2, PUSH1, 1, CALLDATACOPY, PUSH1, 64, PUSH1, 0, RETURN],
+    # the offset of the second CALLDATALOAD is the first byte of calldata
+    [PUSH1, 0, CALLDATALOAD, PUSH32, 2 ** 248, SWAP1, DIV, CALLDATALOAD, *RETURN_TOP],
+    # memory offsets depend on the calldata size
+    [PUSH1, 1, CALLDATASIZE, MSTORE8, MSIZE, *RETURN_TOP],
+]
+
+
+@pytest.mark.parametrize("program", CALLDATA_PROGRAMS)
+@pytest.mark.parametrize("gas_limit", [0, 20, 60])
+def test_lanes_read_calldata(program, gas_limit):
+    code = assemble(program, print_bin=False)
+    results = run_lanes(code, inputs=INPUTS, gas_limit=gas_limit)
+    assert [lane_outcome(result) for result in results] == [
+        run_one(code, [], gas_limit=gas_limit, calldata=calldata) for calldata in INPUTS
+    ]
+
+
+@pytest.mark.parametrize("program", CALLDATA_PROGRAMS[:3])
+def test_calldata_lanes_run_together(program, monkeypatch):
+    monkeypatch.setattr("src.lanesEngine._run_each", None)
+    code = assemble(program, print_bin=False)
+    assert len(run_lanes(code, inputs=INPUTS)) == len(INPUTS)
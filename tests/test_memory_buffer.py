@@ -0,0 +1,36 @@
+from src.memory import Memory
+
+import pytest
+
+
+@pytest.fixture
+def memory() -> Memory:
+    return Memory()
+
+
+def test_store_word_is_big_endian(memory):
+    memory.store_word(0, 0xff112233445566778899aabbccddeeff)
+    assert memory.load(16) == 0xff
+    assert memory.load(31) == 0xff
+    assert memory.load(30) == 0xee
+    assert memory.load_word(0) == 0xff112233445566778899aabbccddeeff
+
+
+def test_store_word_unaligned(memory):
+    max_value = 2 ** 256 - 1
+    memory.store_word(1, max_value)
+    assert memory.active_words() == 2
+    assert memory.load(0) == 0
+    assert memory.load_word(1) == max_value
+
+
+def test_view(memory):
+    memory.store_word(0, 0x42)
+    with memory.view(0, 32) as view:
+        assert view.readonly
+        assert view[31] == 0x42
+
+
+def test_view_empty_range_does_not_expand(memory):
+    assert len(memory.view(1000, 0)) == 0
+    assert memory.active_words() == 0
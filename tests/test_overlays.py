@@ -0,0 +1,138 @@
+from src.analysis import analyze
+from src.executionContext import ExecutionContext
+from src.gas import GasMeter
+from src.memory import Memory
+from src.opcodesInstructions import *
+from src.run import execute, ENGINES
+from src.storage import Storage
+
+import pytest
+
+
+def test_storage_fork_reads_through():
+    base = Storage({1: 10, 2: 20})
+    fork = base.fork()
+    assert fork.get(1) == 10
+    assert fork.get(3) == 0
+    assert fork.slots == {}
+
+    fork.put(1, 11)
+    fork.put(2, 0)
+    assert (fork.get(1), fork.get(2)) == (11, 0)
+    assert base.slots == {1: 10, 2: 20}
+
+
+def test_storage_fork_restore_reads_through_again():
+    fork = Storage({1: 10}).fork()
+    snapshot = fork.snapshot()
+    fork.put(1, 11)
+    fork.restore(snapshot)
+    assert fork.get(1) == 10
+
+
+def test_storage_fork_original_values_and_warm_slots():
+    base = Storage({1: 10})
+    base.put(1, 11)
+    base.access(1)
+
+    fork = base.fork()
+    fork.put(1, 12)
+    assert fork.original_value(1) == 10
+    assert fork.access(1) is True
+    assert fork.access(2) is False
+    assert base.warm_slots == {1}
+
+
+def test_storage_merge():
+    base = Storage({1: 10})
+    snapshot = base.snapshot()
+    fork = base.fork()
+    fork.put(1, 11)
+    fork.put(2, 20)
+    fork.access(3)
+
+    fork.merge()
+    assert base.slots == {1: 11, 2: 20}
+    assert 3 in base.warm_slots
+    assert fork.slots == {}
+
+    # merged writes are journaled in the parent
+    base.restore(snapshot)
+    assert base.slots == {1: 10}
+
+
+def test_nested_forks():
+    base = Storage({1: 1})
+    child = base.fork()
+    child.put(2, 2)
+    grandchild = child.fork()
+    grandchild.put(3, 3)
+    assert [grandchild.get(slot) for slot in (1, 2, 3)] == [1, 2, 3]
+    assert child.get(3) == 0
+
+
+def test_memory_fork_copies_on_write():
+    memory = Memory()
+    memory.store_word(0, 42)
+    fork = memory.fork()
+    assert fork.memory is memory.memory
+
+    fork.store(0, 1)
+    assert fork.memory is not memory.memory
+    assert memory.load_word(0) == 42
+    assert fork.load(0) == 1
+
+
+def test_memory_parent_write_after_fork():
+    memory = Memory()
+    memory.store_word(0, 42)
+    fork = memory.fork()
+
+    memory.store(31, 1)
+    memory.store_word(32, 7)
+    assert fork.load_word(0) == 42
+    assert len(fork) == 32
+    assert memory.load_word(0) == 1
+
+
+def test_memory_fork_copies_on_expansion():
+    memory = Memory()
+    memory.store(0, 1)
+    fork = memory.fork()
+    fork.load_word(64)
+    assert (len(fork), len(memory)) == (96, 32)
+
+
+def test_memory_fork_reset_keeps_parent():
+    memory = Memory()
+    memory.store(0, 1)
+    fork = memory.fork()
+    fork.reset()
+    assert len(memory) == 32
+    assert len(fork) == 0
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_context_fork(engine):
+    # storage[1] = value, return storage[1]
+    code = assemble([PUSH1, 7, PUSH1, 1, SSTORE, PUSH1, 1, SLOAD, PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN],
+                    print_bin=False)
+    program = analyze(code)
+    storage = Storage({1: 5})
+    context = ExecutionContext(code=code, jumpdests=program.jumpdests, gas_meter=GasMeter(100_000), storage=storage)
+    with pytest.raises(ExecutionLimitReached):
+        # stops right before the SSTORE
+        execute(context, program, engine=engine, max_steps=1)
+
+    fork = context.fork()
+    assert fork.gas_meter.gas_left == context.gas_meter.gas_left
+    # what if the value was 9
+    fork.stack.stack[0] = 9
+    execute(fork, program, engine=engine)
+    assert fork.return_data == (9).to_bytes(32, "big")
+    assert storage.slots == {1: 5}
+    assert context.stack.stack == [7, 1]
+
+    execute(context, program, engine=engine)
+    assert context.return_data == (7).to_bytes(32, "big")
+    assert storage.slots == {1: 7}
@@ -0,0 +1,91 @@
+import random
+
+from src.gas import GasMeter
+from src.generics import InvalidMemoryAccess, OutOfGas
+from src.memory import Memory, PagedMemory, PAGE_SIZE
+from src.opcodesInstructions import *
+from src.run import run, ENGINES
+
+import pytest
+
+
+def test_matches_flat_memory():
+    rng = random.Random(0)
+    flat, paged = Memory(gas_meter=GasMeter(10 ** 9)), PagedMemory(gas_meter=GasMeter(10 ** 9))
+    for _ in range(2000):
+        offset = rng.choice([rng.randrange(3 * PAGE_SIZE), PAGE_SIZE - rng.randrange(40)])
+        operation = rng.randrange(4)
+        if operation == 0:
+            value = rng.randrange(2 ** 256)
+            flat.store_word(offset, value)
+            paged.store_word(offset, value)
+        elif operation == 1:
+            value = rng.randrange(256)
+            flat.store(offset, value)
+            paged.store(offset, value)
+        elif operation == 2:
+            assert flat.load_word(offset) == paged.load_word(offset)
+        else:
+            length = rng.randrange(100)
+            assert flat.load_range(offset, length) == paged.load_range(offset, length)
+
+        assert flat.active_words() == paged.active_words()
+        assert flat.gas_meter.gas_left == paged.gas_meter.gas_left
+
+    assert str(flat) == str(paged)
+
+
+def test_only_allocates_written_pages():
+    memory = PagedMemory()
+    memory.store(2 ** 20, 1)
+    assert memory.active_words() == 2 ** 20 // 32 + 1
+    assert list(memory.pages) == [2 ** 20 // PAGE_SIZE]
+
+    assert memory.load_word(2 ** 19) == 0
+    assert len(memory.pages) == 1
+
+
+def test_word_across_pages():
+    memory = PagedMemory()
+    memory.store_word(PAGE_SIZE - 16, 2 ** 256 - 1)
+    assert sorted(memory.pages) == [0, 1]
+    assert memory.load_word(PAGE_SIZE - 16) == 2 ** 256 - 1
+    assert memory.load_range(PAGE_SIZE - 17, 34) == bytes(1) + bytes([0xFF] * 32) + bytes(1)
+
+
+def test_invalid_offset():
+    with pytest.raises(InvalidMemoryAccess):
+        PagedMemory().load(-1)
+
+
+def test_expansion_is_charged_before_allocating():
+    memory = PagedMemory(gas_meter=GasMeter(1000))
+    with pytest.raises(OutOfGas):
+        memory.store(2 ** 32, 1)
+    assert memory.pages == {}
+    assert memory.active_words() == 0
+
+
+def test_fork_copies_written_pages_only():
+    memory = PagedMemory()
+    memory.store(0, 1)
+    memory.store(PAGE_SIZE, 2)
+    fork = memory.fork()
+
+    fork.store(1, 3)
+    assert fork.pages[0] is not memory.pages[0]
+    assert fork.pages[1] is memory.pages[1]
+    assert memory.load(1) == 0
+
+    # the parent copies shared pages as well
+    memory.store(PAGE_SIZE, 4)
+    assert fork.load(PAGE_SIZE) == 2
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_run_with_paged_memory(engine):
+    code = assemble([PUSH1, 0x2A, PUSH3, 0x10, 0x00, 0x00, MSTORE8, MSIZE, PUSH1, 0, MSTORE,
+                     PUSH1, 32, PUSH1, 0, RETURN], print_bin=False)
+    expected = run(code, engine=engine, gas_limit=3_000_000)
+    assert run(code, engine=engine, gas_limit=3_000_000, paged_memory=True) == expected
+    assert int.from_bytes(expected, "big") == 0x100020
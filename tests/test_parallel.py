@@ -0,0 +1,79 @@
+from src.generics import InvalidJumpDestination, WorkerDied
+from src.opcodesInstructions import *
+from src import parallel
+from src.parallel import ParallelRunner, JobResult
+from src.run import run, ENGINES
+
+import pytest
+
+RETURN_42 = assemble([PUSH1, 42, PUSH1, 0, MSTORE, PUSH1, 32, PUSH1, 0, RETURN], print_bin=False)
+PUSH_TWO = assemble([PUSH1, 1, PUSH1, 2], print_bin=False)
+BAD_JUMP = assemble([PUSH1, 7, PUSH1, 42, JUMP], print_bin=False)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_parallel_runner(engine):
+    jobs = [(RETURN_42, b""), (PUSH_TWO, b""), (BAD_JUMP, b"")] * 50
+    with ParallelRunner(processes=3, engine=engine, return_stack=True, chunksize=4) as runner:
+        results = list(runner.map(jobs))
+
+    assert [result.index for result in results] == list(range(150))
+    for result in results[0::3]:
+        assert result.ok and result.return_data == run(RETURN_42) and result.stack == ()
+    for result in results[1::3]:
+        assert result == JobResult(index=result.index, return_data=b"", stack=(1, 2))
+    for result in results[2::3]:
+        assert result.error == InvalidJumpDestination(context=None, target_pc=42)
+
+    assert [stats.worker_id for stats in runner.stats] == [0, 1, 2]
+    assert sum(stats.jobs for stats in runner.stats) == 150
+
+
+def test_parallel_runner_sends_code_once_per_worker():
+    with ParallelRunner(processes=2, chunksize=1) as runner:
+        results = list(runner.map([(RETURN_42, b"")] * 20))
+        assert all(result.ok for result in results)
+        assert all(len(sent) == 1 for sent in runner._sent)
+
+
+def test_parallel_runner_abandoned_map():
+    with ParallelRunner(processes=2, chunksize=1) as runner:
+        first = runner.map([(PUSH_TWO, b"")] * 20)
+        next(first)
+        results = list(runner.map([(RETURN_42, b"")] * 5))
+    assert [result.index for result in results] == list(range(5))
+    assert all(result.return_data == run(RETURN_42) for result in results)
+
+
+def test_parallel_runner_cache_dir(tmp_path):
+    with ParallelRunner(processes=2, chunksize=1, cache_dir=str(tmp_path)) as runner:
+        results = list(runner.map([(RETURN_42, b""), (PUSH_TWO, b"")] * 4))
+    assert all(result.ok for result in results)
+    assert len(list(tmp_path.glob("*.program"))) == 2
+
+
+def test_parallel_runner_drops_failures_of_earlier_maps():
+    with ParallelRunner(processes=1) as runner:
+        # what is left of a chunk of an earlier map() that failed
+        runner._results.put(("failed", 0, -1, ValueError()))
+        runner._in_flight[0] += 1
+        results = list(runner.map([(RETURN_42, b"")] * 3))
+    assert all(result.ok for result in results)
+
+
+def test_parallel_runner_forgets_codes(monkeypatch):
+    monkeypatch.setattr(parallel, "MAX_CODES", 2)
+    codes = [assemble([PUSH1, i, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN], print_bin=False) for i in range(5)]
+    with ParallelRunner(processes=1, chunksize=1) as runner:
+        results = list(runner.map([(code, b"") for code in codes] * 2))
+        assert len(runner._sent[0]) <= 2 and len(runner._hashes) <= 2
+    assert [result.return_data for result in results] == [bytes([i]) for i in range(5)] * 2
+
+
+def test_parallel_runner_dead_worker():
+    with ParallelRunner(processes=2, chunksize=1) as runner:
+        runner._processes[0].terminate()
+        runner._processes[0].join()
+        with pytest.raises(WorkerDied):
+            list(runner.map([(RETURN_42, b"")] * 20))
+    assert [stats.worker_id for stats in runner.stats] == [1]
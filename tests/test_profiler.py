@@ -0,0 +1,46 @@
+from src.opcodesInstructions import *
+from src.profiler import Profiler
+from src.run import run
+
+import pytest
+
+# 4 * 4 with a loop, see tests/test_jumps.py::test_four_squared
+FOUR_SQUARED = assemble(
+    [PUSH1, 4, DUP1, PUSH1, 0, JUMPDEST, DUP2, PUSH1, 18, JUMPI, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN,
+     JUMPDEST, DUP3, ADD, SWAP1, PUSH1, 1, SWAP1, SUB, SWAP1, PUSH1, 5, JUMP],
+    print_bin=False,
+)
+
+
+@pytest.mark.parametrize("engine", ["reference", "fast"])
+def test_profiler_counts(engine):
+    profiler = Profiler()
+    run(FOUR_SQUARED, engine=engine, hooks=profiler.hooks)
+
+    by_opcode = profiler.by_opcode()
+    assert by_opcode["ADD"].count == 4
+    assert by_opcode["JUMPI"].count == 5
+    assert by_opcode["RETURN"].count == 1
+
+    assert profiler.by_pc[20][0] is ADD and profiler.by_pc[20][1].count == 4
+
+    # the loop condition block runs 5 times, the loop body 4 times
+    by_block = profiler.by_block()
+    assert by_block[5].count == 5 * 4
+    assert by_block[18].count == 4 * 10
+    assert sum(entry.count for entry in by_block.values()) == sum(entry.count for entry in by_opcode.values())
+
+
+def test_profiler_output(tmp_path):
+    profiler = Profiler()
+    run(FOUR_SQUARED, hooks=profiler.hooks)
+
+    report = profiler.report()
+    assert "ADD" in report and "0x0014 ADD" in report
+
+    path = tmp_path / "profile.folded"
+    profiler.write_collapsed(str(path))
+    lines = path.read_text().splitlines()
+    assert len(lines) == len(profiler.by_pc)
+    assert any(line.startswith("block_0x0012;ADD_0x0014 ") for line in lines)
+    assert all(int(line.rsplit(" ", 1)[1]) >= 0 for line in lines)
@@ -0,0 +1,79 @@
+import asyncio
+
+from src.executionContext import ContextPool
+from src.generics import ExecutionLimitReached
+from src.opcodesInstructions import *
+from src.run import run, run_async, ENGINES
+
+import pytest
+
+# 4 * 4 with a loop, see tests/test_jumps.py::test_four_squared
+FOUR_SQUARED = assemble(
+    [PUSH1, 4, DUP1, PUSH1, 0, JUMPDEST, DUP2, PUSH1, 18, JUMPI, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN,
+     JUMPDEST, DUP3, ADD, SWAP1, PUSH1, 1, SWAP1, SUB, SWAP1, PUSH1, 5, JUMP],
+    print_bin=False,
+)
+INFINITE_LOOP = assemble([JUMPDEST, PUSH1, 0, JUMP], print_bin=False)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("yield_every", [1, 2, 3, 7, 1000])
+def test_run_async_matches_run(engine, yield_every):
+    result = asyncio.run(run_async(FOUR_SQUARED, yield_every=yield_every, engine=engine, gas_limit=10_000))
+    assert result == run(FOUR_SQUARED, engine=engine) == b"\x10"
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("yield_every", [1, 4, 1000])
+def test_run_async_max_steps(engine, yield_every):
+    for max_steps in range(1, 70):
+        try:
+            run(FOUR_SQUARED, engine=engine, max_steps=max_steps)
+            expected = None
+        except ExecutionLimitReached as error:
+            expected = error.context.pc
+
+        try:
+            asyncio.run(run_async(FOUR_SQUARED, yield_every=yield_every, max_steps=max_steps, engine=engine))
+            actual = None
+        except ExecutionLimitReached as error:
+            actual = error.context.pc
+
+        assert actual == expected, max_steps
+
+
+def test_run_async_yields_to_other_tasks():
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await run_async(FOUR_SQUARED, yield_every=1)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) > 10
+
+
+def test_run_async_timeout():
+    with pytest.raises(TimeoutError):
+        asyncio.run(run_async(INFINITE_LOOP, yield_every=100, timeout=0.05))
+
+
+def test_run_async_cancel():
+    pool = ContextPool()
+
+    async def main():
+        task = asyncio.create_task(run_async(INFINITE_LOOP, yield_every=100, pool=pool))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert len(pool) == 0
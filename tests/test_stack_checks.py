@@ -0,0 +1,33 @@
+from src.generics import StackOverFlow, StackUnderFlow
+from src.stack import Stack
+
+import pytest
+
+
+@pytest.fixture
+def stack() -> Stack:
+    return Stack()
+
+
+def test_swap_underflow_one_short(stack):
+    stack.push(1)
+    with pytest.raises(StackUnderFlow):
+        stack.swap(1)
+
+
+def test_peek_underflow_one_short(stack):
+    stack.push(1)
+    with pytest.raises(StackUnderFlow):
+        stack.peek(1)
+
+
+def test_overflow_at_max_depth(stack):
+    for i in range(1024):
+        stack.push(i)
+    with pytest.raises(StackOverFlow):
+        stack.push(0)
+    assert len(stack) == 1024
+
+
+def test_no_instance_dict(stack):
+    assert not hasattr(stack, "__dict__")
@@ -0,0 +1,142 @@
+from src.analysis import analyze
+from src.executionContext import ExecutionContext
+from src.gas import GasMeter, G_COLD_SLOAD, G_SSTORE_RESET, G_SSTORE_SET, G_WARM_ACCESS
+from src.generics import OutOfGas
+from src.opcodesInstructions import *
+from src.run import execute, run, ENGINES
+from src.storage import Storage
+
+import pytest
+
+
+def test_restore_undoes_writes_since_snapshot():
+    storage = Storage({1: 10})
+    snapshot = storage.snapshot()
+    storage.put(1, 11)
+    storage.put(2, 20)
+    storage.put(1, 12)
+
+    storage.restore(snapshot)
+    assert storage.slots == {1: 10}
+    assert storage.journal == []
+
+
+def test_nested_snapshots():
+    storage = Storage()
+    storage.put(1, 1)
+    outer = storage.snapshot()
+    storage.put(1, 2)
+    inner = storage.snapshot()
+    storage.put(1, 3)
+
+    storage.restore(inner)
+    assert storage.get(1) == 2
+
+    storage.restore(outer)
+    assert storage.get(1) == 1
+
+
+def test_access_is_journaled():
+    storage = Storage()
+    assert storage.access(1) is False
+    snapshot = storage.snapshot()
+    assert storage.access(1) is True
+    assert storage.access(2) is False
+
+    storage.restore(snapshot)
+    assert storage.warm_slots == {1}
+
+
+def test_original_value():
+    storage = Storage({1: 10})
+    storage.put(1, 11)
+    storage.put(1, 12)
+    assert storage.original_value(1) == 10
+    assert storage.original_value(2) == 0
+
+    storage.commit()
+    assert storage.original_value(1) == 12
+    assert storage.warm_slots == set()
+    assert storage.journal == []
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_storage_persists_across_runs(engine):
+    storage = Storage()
+    run(assemble([PUSH1, 0x2A, PUSH1, 1, SSTORE], print_bin=False), engine=engine, storage=storage)
+    assert storage.slots == {1: 0x2A}
+
+    code = assemble([PUSH1, 1, SLOAD, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN], print_bin=False)
+    assert run(code, engine=engine, storage=storage) == bytes([0x2A])
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_failed_run_reverts_storage(engine):
+    storage = Storage({1: 1})
+    code = assemble([PUSH1, 2, PUSH1, 1, SSTORE, PUSH1, 3, PUSH1, 5, SSTORE, PUSH1, 0xFF, JUMP], print_bin=False)
+    with pytest.raises(InvalidJumpDestination):
+        run(code, engine=engine, storage=storage)
+
+    assert storage.slots == {1: 1}
+    assert storage.warm_slots == set()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_runs_only_end_their_own_transaction(engine):
+    storage = Storage({1: 1})
+    # warmed by the caller before running, e.g. from an access list
+    storage.access(3)
+    failing = assemble([PUSH1, 2, PUSH1, 1, SSTORE, PUSH1, 0xFF, JUMP], print_bin=False)
+    with pytest.raises(InvalidJumpDestination):
+        run(failing, engine=engine, storage=storage)
+    assert (storage.slots, storage.original_values, storage.warm_slots) == ({1: 1}, {}, {3})
+
+    run(assemble([PUSH1, 3, PUSH1, 1, SSTORE], print_bin=False), engine=engine, storage=storage)
+    assert (storage.slots, storage.original_values, storage.warm_slots) == ({1: 3}, {}, {3})
+    assert storage.original_value(1) == 3
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_sload_cold_then_warm(engine):
+    code = assemble([PUSH1, 1, SLOAD, PUSH1, 1, SLOAD], print_bin=False)
+    gas = 3 + G_COLD_SLOAD + 3 + G_WARM_ACCESS
+    run(code, engine=engine, gas_limit=gas)
+
+    with pytest.raises(OutOfGas):
+        run(code, engine=engine, gas_limit=gas - 1)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("initial, values, cost", [
+    # cold slot set from zero, then written again (dirty)
+    ({}, [1, 2], G_COLD_SLOAD + G_SSTORE_SET + G_WARM_ACCESS),
+    # cold slot reset from non-zero, then written back to the same value
+    ({1: 5}, [6, 6], G_COLD_SLOAD + G_SSTORE_RESET + G_WARM_ACCESS),
+    # writing the current value
+    ({1: 5}, [5], G_COLD_SLOAD + G_WARM_ACCESS),
+])
+def test_sstore_cost(engine, initial, values, cost):
+    program = []
+    for value in values:
+        program += [PUSH1, value, PUSH1, 1, SSTORE]
+    code = assemble(program, print_bin=False)
+
+    program = analyze(code)
+    context = ExecutionContext(code=code, jumpdests=program.jumpdests, gas_meter=GasMeter(100_000),
+                               storage=Storage(initial))
+    execute(context, program, engine=engine)
+    assert context.gas_meter.gas_used == 6 * len(values) + cost
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_sstore_needs_more_than_the_call_stipend(engine):
+    code = assemble([PUSH1, 1, PUSH1, 1, SSTORE], print_bin=False)
+    with pytest.raises(OutOfGas):
+        run(code, engine=engine, gas_limit=6 + 2300)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_sstore_stipend_ignores_the_rest_of_the_block(engine):
+    # 6 + 2200 (cold, unchanged) + 40 * 3 = 2326 gas, with 2324 left when SSTORE runs
+    code = assemble([PUSH1, 0, PUSH1, 0, SSTORE, *[PUSH1, 0] * 40, STOP], print_bin=False)
+    run(code, engine=engine, gas_limit=2330)
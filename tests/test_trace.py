@@ -0,0 +1,124 @@
+import io
+import json
+
+from src.generics import StackUnderFlow
+from src.opcodesInstructions import *
+from src.run import run
+from src.trace import TraceRecorder, read_trace, to_eip3155
+
+import pytest
+
+STORE_42 = assemble([PUSH1, 0x42, PUSH1, 0, MSTORE, PUSH1, 0x20, PUSH1, 0, RETURN], print_bin=False)
+
+# 4 * 4 with a loop, see tests/test_jumps.py::test_four_squared
+FOUR_SQUARED = assemble(
+    [PUSH1, 4, DUP1, PUSH1, 0, JUMPDEST, DUP2, PUSH1, 18, JUMPI, PUSH1, 0, MSTORE8, PUSH1, 1, PUSH1, 0, RETURN,
+     JUMPDEST, DUP3, ADD, SWAP1, PUSH1, 1, SWAP1, SUB, SWAP1, PUSH1, 5, JUMP],
+    print_bin=False,
+)
+
+
+class KeepOpen(io.BytesIO):
+    def close(self):
+        pass
+
+
+def record(code, engine="fast", **kwargs):
+    file = KeepOpen()
+    with TraceRecorder(file=file) as recorder:
+        run(code, engine=engine, hooks=recorder.hooks, **kwargs)
+    file.seek(0)
+    return list(read_trace(file))
+
+
+@pytest.mark.parametrize("engine", ["reference", "fast"])
+def test_trace_records(engine):
+    records = record(STORE_42, engine=engine, gas_limit=1000)
+    assert [r.pc for r in records] == [0, 2, 4, 5, 7, 9]
+    assert [r.opcode for r in records] == [0x60, 0x60, 0x52, 0x60, 0x60, 0xF3]
+    # MSTORE expands memory to one word, 3 static + 3 for the expansion
+    assert [r.gas_cost for r in records] == [3, 3, 6, 3, 3, 0]
+    assert [r.gas for r in records] == [1000, 997, 994, 988, 985, 982]
+    assert records[2].memory_write == (0, 32) and records[2].memory_size == 32
+    assert records[2].popped == 2 and records[2].pushed == ()
+    assert records[0].pushed == (0x42,)
+    assert not any(r.failed for r in records)
+
+
+def test_eip3155():
+    lines = [json.loads(line) for line in to_eip3155(record(FOUR_SQUARED, gas_limit=10_000))]
+    assert lines[0] == {
+        "pc": 0, "op": 0x60, "gas": hex(10_000), "gasCost": "0x3", "memSize": 0,
+        "stack": [], "depth": 1, "refund": 0, "opName": "PUSH1",
+    }
+    assert lines[2]["opName"] == "PUSH1" and lines[2]["stack"] == ["0x4", "0x4"]
+    assert lines[-1]["opName"] == "RETURN" and lines[-1]["stack"] == ["0x4", "0x0", "0x1", "0x0"]
+    assert lines[-1]["memSize"] == 32
+
+    # the stacks rebuilt from the deltas are the ones the instructions actually saw
+    stacks = []
+    run(FOUR_SQUARED, prehook=lambda ctx, instruction: stacks.append([hex(item) for item in ctx.stack.stack]))
+    assert [line["stack"] for line in lines] == stacks
+
+
+def test_failed_instruction_is_recorded():
+    file = KeepOpen()
+    with pytest.raises(StackUnderFlow):
+        with TraceRecorder(file=file) as recorder:
+            run(assemble([PUSH1, 1, ADD], print_bin=False), engine="fast", hooks=recorder.hooks)
+    file.seek(0)
+    records = list(read_trace(file))
+    assert [(r.pc, r.failed) for r in records] == [(0, False), (2, True)]
+
+
+def test_ring_buffer(tmp_path):
+    recorder = TraceRecorder(ring_size=3)
+    run(FOUR_SQUARED, engine="fast", hooks=recorder.hooks)
+    assert [r.opcode for r in recorder.records()] == [PUSH1.opcode, PUSH1.opcode, RETURN.opcode]
+
+
+def test_trace_file(tmp_path):
+    path = str(tmp_path / "trace.bin")
+    with TraceRecorder.to_file(path) as recorder:
+        run(FOUR_SQUARED, engine="fast", hooks=recorder.hooks)
+    assert len(list(read_trace(path))) == len(record(FOUR_SQUARED))
+
+
+def test_calldatacopy_memory_write():
+    code = assemble([PUSH1, 40, PUSH1, 0, PUSH1, 8, CALLDATACOPY], print_bin=False)
+    records = record(code, calldata=bytes(range(64)))
+    assert records[3].memory_write == (8, 40) and records[3].memory_size == 64
+
+
+def test_empty_memory_write_at_a_huge_offset():
+    code = assemble([PUSH1, 0, PUSH1, 0, PUSH32, 2 ** 255, CALLDATACOPY, STOP], print_bin=False)
+    records = record(code)
+    assert records[3].opcode == CALLDATACOPY.opcode
+    assert records[3].memory_write is None and not records[3].failed
+
+
+def test_huge_gas_limit_is_clamped():
+    records = record(STORE_42, gas_limit=2 ** 70)
+    assert records[0].gas == 2 ** 64 - 1
+    assert records[2].gas_cost == 6
+
+
+@pytest.mark.parametrize("engine", ["reference", "fast"])
+@pytest.mark.parametrize("program", [[MSTORE], [PUSH1, 0, PUSH1, 0, CALLDATACOPY]])
+def test_underflowing_memory_write_is_recorded(engine, program):
+    file = KeepOpen()
+    with pytest.raises(StackUnderFlow):
+        with TraceRecorder(file=file) as recorder:
+            run(assemble(program, print_bin=False), engine=engine, hooks=recorder.hooks)
+    file.seek(0)
+    *_, last = read_trace(file)
+    assert last.failed and last.memory_write is None
+
+
+def test_recorder_reused_across_runs():
+    recorder = TraceRecorder(ring_size=100)
+    for _ in range(2):
+        run(STORE_42, engine="fast", gas_limit=1000, hooks=recorder.hooks)
+    records = list(recorder.records())
+    assert len(records) == 12
+    assert records[6].gas == records[0].gas == 1000